@@ -1,24 +1,54 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import Field , BaseModel
-from typing import  TypedDict, Optional, Dict, List, Any
+from typing import  TypedDict, Optional, Dict, List, Any, Callable
 import subprocess
 import textwrap 
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain.schema.messages import SystemMessage, HumanMessage
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import ast
 import os
+import re
+import sys
+import threading
+import time
+from Model.llm_cache import cached_invoke, remember_response
+from Model.render import (render_scheduler, run_limited, parse_progress, count_animations, compact_error,
+                          PRIORITY_INTERACTIVE, RenderQueueFull, RenderWorkspace)
+from Model.render_cache import render_cache, render_cache_key
+from Model.render_worker import RENDER_BACKEND, warm_pool
+from Model.sections import Section, split_sections, section_fingerprint, section_variant
+from Model.media import concat_videos
+from Model.validation import validate_manim_code
+from quality import PREVIEW_QUALITY
+import metrics
 
 load_dotenv()
 
 load_dotenv()
 
+# Model and temperature per pipeline stage, overridable from the environment
+STAGE_CONFIG = {
+    stage: {
+        "model": os.getenv(f"{stage.upper()}_MODEL", "gemini-2.0-flash"),
+        "temperature": float(os.getenv(f"{stage.upper()}_TEMPERATURE", "0.8")),
+    }
+    for stage in ("plan", "code", "correction")
+}
+# "grpc" (default) or "rest"; either way the client keeps its connection open between calls
+LLM_TRANSPORT = os.getenv("LLM_TRANSPORT") or None
+# Stream plan/code tokens to clients as they are generated
+LLM_STREAMING = os.getenv("LLM_STREAMING", "1") == "1"
+
 class ScenePlan(BaseModel):
     scene : str = Field(description="Detailed plan for the animation")
     scene_class_name : str = Field(description="Name of the scene class")
 
-def plan_scene(prompt:str):
-    system_prompt = """
+PLAN_SYSTEM_PROMPT = """
         You are a manim expert and an excellent teacher who can explain complex
         concepts in a clear and engaging way.
         You'll be working with a manim developer who will write a manim script
@@ -61,20 +91,19 @@ def plan_scene(prompt:str):
         BLUE, RED, GREEN, YELLOW, PURPLE, ORANGE, PINK, WHITE, BLACK, GRAY, GOLD, TEAL
 
     """
-    chat_prompt = ChatPromptTemplate([
-        ('system' , system_prompt),
-        ("human" ,"Plan the scene for the following topic: {topic}")
-    ])
-
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash", 
-        temperature=0.8
-    )
-    model = model.with_structured_output(ScenePlan)
 
-    chain = chat_prompt | model
-    
-    response = chain.invoke({"topic" : prompt})
+PLAN_PROMPT = ChatPromptTemplate([
+    ('system' , PLAN_SYSTEM_PROMPT),
+    ("human" ,"Plan the scene for the following topic: {topic}")
+])
+
+def plan_scene(prompt:str, use_cache: bool = True):
+    config = STAGE_CONFIG["plan"]
+    chain = get_chain("plan")
+
+    response = cached_invoke(config["model"], config["temperature"], PLAN_SYSTEM_PROMPT,
+                             {"topic": prompt}, ScenePlan,
+                             lambda: chain.invoke({"topic" : prompt}), bypass=not use_cache)
 
     return response
 
@@ -83,9 +112,7 @@ class ManimCodeResponse(BaseModel):
     explanation: Optional[str] = Field(None, description="Explanation of the code")
     error_fixes: Optional[List[str]] = Field(None, description="Error fixes if any")
 
-def generate_code(plan:str, scene_class_name:str) -> ManimCodeResponse:
-    """Generate a manim code from the plan"""
-    system_prompt = f"""
+CODE_SYSTEM_PROMPT = """
 You are a Python expert and a professional Manim animation developer.
 
 You will be given a detailed multi-scene visualization plan that includes:
@@ -129,80 +156,226 @@ OUTPUT: A single Python file, with one class and all scenes, ready to run in Man
 
     """
 
-    chat_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", "Generate Manim code from this animation plan:\n\n{plan}")
-    ])
-    messages = chat_prompt.format_messages(plan=plan)
+CODE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", CODE_SYSTEM_PROMPT),
+    ("human", "Generate Manim code from this animation plan:\n\n{plan}")
+])
 
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash", 
-        temperature=0.8
-    )
-    model = model.with_structured_output(ManimCodeResponse) 
+def generate_code(plan:str, scene_class_name:str, use_cache: bool = True) -> ManimCodeResponse:
+    """Generate a manim code from the plan (cached only once it renders, see remember_working_code)"""
+    config = STAGE_CONFIG["code"]
+    chain = get_chain("code")
 
-    response = model.invoke(messages)
+    response = cached_invoke(config["model"], config["temperature"], CODE_SYSTEM_PROMPT,
+                             {"plan": plan}, ManimCodeResponse,
+                             lambda: chain.invoke({"plan": plan}), bypass=not use_cache, store=False)
 
     return response
 
-import os
-import time
-import glob
-import subprocess
-from typing import Optional
-from pydantic import BaseModel, Field
-
 class ManimExecutionResponse(BaseModel):
     output: str = Field(description="Output of the execution")
     error: Optional[str] = Field(None, description="Error message")
     video_path : Optional[str] = Field(None , description="Path of the file")
 
-def execute_manim_code(code: str, scene_class_name: str) -> ManimExecutionResponse:
-    # Save code to a .py file
-    file_path = f"{scene_class_name}.py"
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(code)
+# Render `# Scene N` sections of one video as parallel Manim jobs
+RENDER_SECTIONS = os.getenv("RENDER_SECTIONS", "0") == "1"
 
-    print(f" Saved code to: {os.path.abspath(file_path)}")
-    print(f" Starting Manim rendering...")
 
+def _render_scene(file_path: str, scene_class_name: str, workspace: RenderWorkspace, output_name: str,
+                  quality_flag: str, priority: int, on_output: Callable[[str], None]):
     # Build manim command
     cmd = [
-        "python", "-m", "manim",
-        "-pql",  # Preview mode, low quality
+        sys.executable, "-m", "manim",
+        quality_flag,  # No -p: servers are headless, nothing to preview on
+        "--media_dir", workspace.media_dir,
+        "-o", output_name,
         file_path,
         scene_class_name
     ]
 
-    # Run subprocess with correct encoding
-    start_time = time.time()
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace'  # Prevent UnicodeDecodeError
-    )
-    duration = time.time() - start_time
+    # Wait for a free render slot, then run with per-job limits
+    queued_at = time.time()
+    with render_scheduler.slot(priority):
+        start_time = time.time()
+        metrics.observe("render_wait", start_time - queued_at)
+        with metrics.span("manim"):
+            if RENDER_BACKEND == "warm":
+                result = warm_pool.render(file_path, scene_class_name, workspace.media_dir, output_name,
+                                          quality_flag, cwd=workspace.path, on_output=on_output)
+            else:
+                result = run_limited(cmd, cwd=workspace.path, on_output=on_output)
+        duration = time.time() - start_time
+    return result, duration
+
+
+def _render_error(stderr: str, code: str) -> str:
+    # The correction prompt only needs the exception and the code around it,
+    # not the progress bars and log lines in front of it
+    error = compact_error(stderr, code)
+    print(f" Trimmed render error for correction from {len(stderr)} to {len(error)} characters")
+    return error
+
+
+def execute_manim_code(code: str, scene_class_name: str, workspace: RenderWorkspace,
+                       priority: int = PRIORITY_INTERACTIVE,
+                       on_progress: Optional[Callable[[float], None]] = None,
+                       quality_flag: str = PREVIEW_QUALITY) -> ManimExecutionResponse:
+    # Save code into the job's own workspace
+    file_path = workspace.write_scene(code)
+    output_name = f"{scene_class_name}-{workspace.job_id}"
+
+    print(f" Saved code to: {file_path}")
+
+    # Byte-identical code (retries, repeated topics) reuses the stored render
+    cache_key = render_cache_key(code, scene_class_name, [quality_flag])
+    video_path = workspace.video_path(output_name, quality_flag)
+    cached_output = render_cache.get(cache_key, video_path)
+    if cached_output is not None:
+        print(f" Render cache hit ({cache_key[:12]}), skipping Manim")
+        return ManimExecutionResponse(output=cached_output, video_path=video_path)
+
+    sections = split_sections(code, scene_class_name) if RENDER_SECTIONS else []
+    if sections:
+        try:
+            result = execute_manim_sections(code, scene_class_name, sections, workspace, video_path,
+                                            quality_flag, priority, on_progress)
+        except RenderQueueFull:
+            # The queue can't take one render per section right now; one
+            # render of the whole scene needs a single place in it
+            print(f" Render queue is full, rendering the {len(sections)} sections as one scene")
+        else:
+            if result.video_path:
+                render_cache.put(cache_key, video_path, result.output)
+            return result
+
+    print(f" Starting Manim rendering...")
+
+    # Turn Manim's per-animation progress bars into overall percentages
+    total_animations = count_animations(code)
+    last_percent = -1
+
+    def on_output(line: str):
+        nonlocal last_percent
+        percent = parse_progress(line, total_animations)
+        if on_progress is not None and percent is not None and int(percent) != last_percent:
+            last_percent = int(percent)
+            on_progress(percent)
+
+    result, duration = _render_scene(file_path, scene_class_name, workspace, output_name,
+                                     quality_flag, priority, on_output)
 
     # Check result
     if result.returncode == 0:
         print(f" Animation completed successfully in {duration:.1f} seconds!")
 
-        # Locate output video
-        video_files = glob.glob(f"media/videos/{scene_class_name}/480p15/*.mp4", recursive=True)
-        if video_files:
-            video_path = max(video_files, key=os.path.getctime)
-            print(f"📽️ Video saved to: {os.path.abspath(video_path)}")
-            print("🎬 Playing animation:")
-        else:
+        # Output location is fully determined by the workspace and output name
+        if not os.path.exists(video_path):
             print(" Render completed but no video file was found.")
-        return ManimExecutionResponse(output=result.stdout , video_path=os.path.abspath(video_path))
+            return ManimExecutionResponse(output=result.stdout,
+                                          error=f"Render completed but {video_path} was not written")
+        print(f"📽️ Video saved to: {video_path}")
+        render_cache.put(cache_key, video_path, result.stdout)
+        return ManimExecutionResponse(output=result.stdout , video_path=video_path)
     else:
         print(" Animation failed to render.")
         print("\n--- Stdout ---\n", result.stdout)
         print("\n--- Stderr ---\n", result.stderr)
-        return ManimExecutionResponse(output=result.stdout, error=result.stderr)
+        return ManimExecutionResponse(output=result.stdout, error=_render_error(result.stderr, code))
+
+
+def execute_manim_sections(code: str, scene_class_name: str, sections: List[Section],
+                           workspace: RenderWorkspace, video_path: str, quality_flag: str,
+                           priority: int = PRIORITY_INTERACTIVE,
+                           on_progress: Optional[Callable[[float], None]] = None) -> ManimExecutionResponse:
+    """
+    Render every section as its own Manim job (see Model/sections.py), in
+    parallel on the render slots, then join the section videos into
+    `video_path` without re-encoding. Raises RenderQueueFull when a section
+    finds the render queue full.
+    """
+    print(f" Starting Manim rendering of {len(sections)} sections in parallel...")
+
+    # Overall progress is the animation-weighted mean of the section progresses
+    counts = [count_animations(section.source) for section in sections]
+    total_animations = sum(counts) or 1
+    section_percent = [0.0] * len(sections)
+    progress_lock = threading.Lock()
+    last_percent = -1
+
+    def report_progress(i: int, percent: float):
+        nonlocal last_percent
+        with progress_lock:
+            section_percent[i] = percent
+            overall = min(sum(p * c for p, c in zip(section_percent, counts)) / total_animations, 99.0)
+            if int(overall) != last_percent:
+                last_percent = int(overall)
+                on_progress(overall)
+
+    # Section threads report their render spans into the calling job's record
+    timings = metrics.current_timings()
+
+    def render_section(i: int):
+        with metrics.job_timings(timings):
+            return _render_section(i)
+
+    def _render_section(i: int):
+        section = sections[i]
+        variant_code, variant_class = section_variant(code, scene_class_name, sections, section.index)
+        file_name = f"scene_s{section.index}.py"
+        file_path = workspace.write_scene(variant_code, file_name)
+        first_animation = sum(counts[:i])
+
+        def on_output(line: str):
+            percent = parse_progress(line, counts[i], first_animation)
+            if on_progress is not None and percent is not None:
+                report_progress(i, percent)
+
+        # Sections whose code (and everything before it) is unchanged since an
+        # earlier render, e.g. the previous correction attempt, are reused
+        section_video = workspace.video_path(variant_class, quality_flag, file_name)
+        cache_key = render_cache_key(section_fingerprint(code, sections, section.index),
+                                     variant_class, [quality_flag])
+        # Sections stay on this node's disk, so the bucket is never asked for them
+        cached_output = render_cache.get(cache_key, section_video, remote=False)
+        if cached_output is not None:
+            reused.append(section.index)
+            result = subprocess.CompletedProcess([file_path], 0, cached_output, "")
+        else:
+            result, _ = _render_scene(file_path, variant_class, workspace, variant_class,
+                                      quality_flag, priority, on_output)
+            if result.returncode == 0 and os.path.exists(section_video):
+                render_cache.put(cache_key, section_video, result.stdout, mirror=False)
+
+        if on_progress is not None and result.returncode == 0:
+            report_progress(i, 100.0)
+        return result, section_video
+
+    reused = []
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=len(sections)) as pool:
+        results = list(pool.map(render_section, range(len(sections))))
+    duration = time.time() - start_time
+    output = "\n".join(result.stdout for result, _ in results)
+    if reused:
+        print(f" Reused unchanged section(s) {', '.join(map(str, sorted(reused)))} from earlier renders")
+
+    # A broken section also breaks every later one; report the earliest
+    for section, (result, _) in zip(sections, results):
+        if result.returncode != 0:
+            print(f" Section {section.index} ({section.title}) failed to render.")
+            print("\n--- Stderr ---\n", result.stderr)
+            return ManimExecutionResponse(output=output, error=_render_error(result.stderr, code))
+
+    # A section without animations produces no movie
+    videos = [path for _, path in results if os.path.exists(path)]
+    if not videos:
+        return ManimExecutionResponse(output=output, error="Render completed but no section videos were written")
+
+    os.makedirs(os.path.dirname(video_path), exist_ok=True)
+    concat_videos(videos, video_path)
+    print(f" Animation completed successfully in {duration:.1f} seconds ({len(videos)} sections)!")
+    print(f"📽️ Video saved to: {video_path}")
+    return ManimExecutionResponse(output=output, video_path=video_path)
 
 class ManimErrorCorrectionResponse(BaseModel): 
     fixed_code: str = Field(...,description="The corrected Manim code that should resolve the errors")
@@ -210,19 +383,7 @@ class ManimErrorCorrectionResponse(BaseModel):
     changes_made: List[str] = Field(description="List of specific changes made to fix the code")
 
 
-def correct_manim_errors(code: str,error_message: str):
-    """
-    Analyze Manim errors and generate fixed code.
-
-    Args:
-        code: Original Manim code that produced errors
-        error_message: Error output from the Manim execution
-        scene_class_name: Name of the scene class
-
-    Returns:
-        ManimErrorCorrectionResponse with fixed code and explanation
-    """
-    system_prompt = """
+CORRECTION_SYSTEM_PROMPT = """
     You are an expert Manim developer and debugger. Your task is to fix errors in Manim code.
 
     ANALYZE the error message carefully to identify the root cause of the problem.
@@ -249,9 +410,9 @@ def correct_manim_errors(code: str,error_message: str):
     3. A list of specific changes you made
     """
 
-    chat_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", """Please fix the errors in this Manim code.
+CORRECTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", CORRECTION_SYSTEM_PROMPT),
+    ("human", """Please fix the errors in this Manim code.
 
 
             CODE WITH ERRORS:
@@ -265,58 +426,453 @@ def correct_manim_errors(code: str,error_message: str):
             ```
             Please provide a complete fixed version of the code, along with an explanation of what went wrong and how you fixed it.
             """
-        )
-    ])
-    messages = chat_prompt.format_messages(code = code , error_message = error_message)
-
-    model = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash", 
-        temperature=0.8
     )
-    model = model.with_structured_output(ManimErrorCorrectionResponse) 
+])
+
+def correct_manim_errors(code: str,error_message: str, use_cache: bool = True):
+    """
+    Analyze Manim errors and generate fixed code.
+
+    Args:
+        code: Original Manim code that produced errors
+        error_message: Error output from the Manim execution
+        scene_class_name: Name of the scene class
+
+    Returns:
+        ManimErrorCorrectionResponse with fixed code and explanation
+    """
+    config = STAGE_CONFIG["correction"]
+    chain = get_chain("correction")
 
-    response = model.invoke(messages)
+    response = cached_invoke(config["model"], config["temperature"], CORRECTION_SYSTEM_PROMPT,
+                             {"code": code, "error_message": error_message},
+                             ManimErrorCorrectionResponse,
+                             lambda: chain.invoke({"code": code, "error_message": error_message}),
+                             bypass=not use_cache, store=False)
+
+    return response
+
+
+def remember_working_code(stage: str, inputs: dict, response, variant: str = ""):
+    """
+    Cache a code or correction response once its code has rendered. Until
+    then it isn't cached, so a broken answer is never served again for the
+    same plan or error. `variant` is the cache variant it was fetched with.
+    """
+    config = STAGE_CONFIG[stage]
+    system_prompt = {"code": CODE_SYSTEM_PROMPT, "correction": CORRECTION_SYSTEM_PROMPT}[stage]
+    remember_response(config["model"], config["temperature"], system_prompt, inputs,
+                      _STAGE_CHAINS[stage][1], response, variant)
+
+
+# Clients and chains are built once and shared by all requests: LangChain
+# runnables are thread-safe, and reusing the client reuses its connection.
+_models = {}
+_chains = {}
+_registry_lock = threading.Lock()
+
+_STAGE_CHAINS = {
+    "plan": (PLAN_PROMPT, ScenePlan),
+    "code": (CODE_PROMPT, ManimCodeResponse),
+    "correction": (CORRECTION_PROMPT, ManimErrorCorrectionResponse),
+}
+
+# Streaming variants ask for JSON in the prompt and parse it incrementally,
+# since with_structured_output only returns once the whole response is in.
+# The prompts differ, so their answers are cached under their own keys.
+STREAM_CACHE_VARIANT = "stream"
+_STREAM_CHAINS = {
+    "plan": (ChatPromptTemplate([
+        ('system' , PLAN_SYSTEM_PROMPT),
+        ("human" ,"Plan the scene for the following topic: {topic}\n\n{format_instructions}")
+    ]), ScenePlan),
+    "code": (ChatPromptTemplate.from_messages([
+        ("system", CODE_SYSTEM_PROMPT),
+        ("human", "Generate Manim code from this animation plan:\n\n{plan}\n\n{format_instructions}")
+    ]), ManimCodeResponse),
+}
+
+class _TokenUsage(BaseCallbackHandler):
+    """Reports the token usage of every model call of a stage's chain to the metrics."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    metrics.record_tokens(self.stage, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+
+def _get_model(model_name: str, temperature: float) -> ChatGoogleGenerativeAI:
+    # Caller holds _registry_lock
+    key = (model_name, temperature)
+    if key not in _models:
+        _models[key] = ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            transport=LLM_TRANSPORT
+        )
+    return _models[key]
+
+def get_chain(stage: str, streaming: bool = False):
+    key = (stage, streaming)
+    chain = _chains.get(key)
+    if chain is not None:
+        return chain
+
+    with _registry_lock:
+        if key not in _chains:
+            config = STAGE_CONFIG[stage]
+            model = _get_model(config["model"], config["temperature"])
+            if streaming:
+                prompt, schema = _STREAM_CHAINS[stage]
+                parser = JsonOutputParser(pydantic_object=schema)
+                prompt = prompt.partial(format_instructions=parser.get_format_instructions())
+                chain = prompt | model | parser
+            else:
+                prompt, schema = _STAGE_CHAINS[stage]
+                chain = prompt | model.with_structured_output(schema)
+            _chains[key] = chain.with_config(callbacks=[_TokenUsage(stage)])
+        return _chains[key]
+
+def warm_up():
+    """Build every client and chain up front (called on app startup)."""
+    for stage in _STAGE_CHAINS:
+        get_chain(stage)
+    for stage in _STREAM_CHAINS:
+        get_chain(stage, streaming=True)
+    print(f" LLM chains ready: {len(_chains)}")
+
+
+def _stream_field(chain, inputs: dict, schema, field: str, on_delta: Callable[[str, bool], None]):
+    """
+    Stream a JSON response, calling on_delta(delta, reset=False) with each new
+    piece of `field` as it arrives, and return the validated `schema` instance
+    at the end. If the parser revises text it already sent, on_delta gets the
+    whole field with reset=True: it replaces everything sent before.
+    """
+    streamed = ""
+    final = None
+    for partial in chain.stream(inputs):
+        final = partial
+        text = (partial.get(field) or "") if isinstance(partial, dict) else ""
+        if text.startswith(streamed):
+            if len(text) > len(streamed):
+                on_delta(text[len(streamed):], False)
+        else:
+            # Parser revised earlier output (rare); start the field over
+            on_delta(text, True)
+        streamed = text
+    return schema.model_validate(final) if final else None
+
+def stream_plan_scene(prompt: str, on_delta: Callable[[str, bool], None], use_cache: bool = True) -> ScenePlan:
+    """Like plan_scene, but surfaces the plan text token by token (see _stream_field for on_delta)."""
+    config = STAGE_CONFIG["plan"]
+    chain = get_chain("plan", streaming=True)
+    streamed = False
+
+    def forward(delta: str, reset: bool):
+        nonlocal streamed
+        streamed = True
+        on_delta(delta, reset)
+
+    response = cached_invoke(config["model"], config["temperature"], PLAN_SYSTEM_PROMPT,
+                             {"topic": prompt}, ScenePlan,
+                             lambda: _stream_field(chain, {"topic": prompt}, ScenePlan, "scene", forward),
+                             bypass=not use_cache, variant=STREAM_CACHE_VARIANT)
+    if response is not None and not streamed:
+        on_delta(response.scene, False)  # Cache hit: deliver the plan in one piece
+    return response
 
+def stream_generate_code(plan: str, scene_class_name: str,
+                         on_delta: Callable[[str, bool], None], use_cache: bool = True) -> ManimCodeResponse:
+    """Like generate_code, but surfaces the code as it is written (see _stream_field for on_delta)."""
+    config = STAGE_CONFIG["code"]
+    chain = get_chain("code", streaming=True)
+    streamed = False
+
+    def forward(delta: str, reset: bool):
+        nonlocal streamed
+        streamed = True
+        on_delta(delta, reset)
+
+    response = cached_invoke(config["model"], config["temperature"], CODE_SYSTEM_PROMPT,
+                             {"plan": plan}, ManimCodeResponse,
+                             lambda: _stream_field(chain, {"plan": plan}, ManimCodeResponse, "code", forward),
+                             bypass=not use_cache, store=False, variant=STREAM_CACHE_VARIANT)
+    if response is not None and not streamed:
+        on_delta(response.code, False)
     return response
 
 
-def generate_and_execute_with_correction(prompt: str, max_correction_attempts: int = 3):
-    storyboard_response = plan_scene(prompt)
+# Lines at column 0 that continue the statement above instead of starting one
+_CONTINUATION_KEYWORDS = re.compile(r"(else|elif|except|finally)\b")
+
+
+class CodeStreamStopped(Exception):
+    """Raised from the code stream once PartialCodeChecker has found a syntax error."""
+
+    def __init__(self, syntax_error: str, partial_code: str):
+        super().__init__(syntax_error)
+        self.syntax_error = syntax_error
+        self.partial_code = partial_code
+
+
+class PartialCodeChecker:
+    """
+    Checks generated code while it is still streaming in. Every time a new
+    top-level statement starts, everything before it is complete and can be
+    syntax-checked; the scene class header is picked up as soon as it
+    appears, so a name that differs from the plan is known before rendering.
+    """
+
+    def __init__(self, scene_class_name: str):
+        self.expected_class = scene_class_name
+        self.scene_class_name = None
+        self.syntax_error = None
+        self._code = ""
+        self._checked_upto = 0
+        # State at the end of the lines scanned so far
+        self._string = None  # Delimiter of an open string literal
+        self._depth = 0  # Open brackets
+        self._continued = False  # Ends with a backslash
+        self._decorated = False  # Last top-level line was a decorator
+
+    @property
+    def code(self) -> str:
+        return self._code
+
+    def feed(self, delta: str):
+        self._code += delta
+        lines = self._code.split("\n")[:-1]  # Last line may still be incomplete
+        for lineno in range(self._checked_upto, len(lines)):
+            line = lines[lineno]
+            if self._starts_statement(line):
+                # Everything before a new top-level statement is complete,
+                # unless it is the decorator of this one
+                if lineno and not self._decorated:
+                    self._check("\n".join(lines[:lineno]))
+                self._decorated = line.startswith("@")
+            if self.scene_class_name is None and self._string is None:
+                match = re.match(r"class\s+(\w+)\s*\((.*Scene.*)\)\s*:", line)
+                if match:
+                    self.scene_class_name = match.group(1)
+            self._scan(line)
+        self._checked_upto = len(lines)
+
+    def _starts_statement(self, line: str) -> bool:
+        if self._string is not None or self._depth or self._continued:
+            return False
+        if not line[:1].strip() or line.startswith("#"):
+            return False
+        return not _CONTINUATION_KEYWORDS.match(line)
+
+    def _scan(self, line: str):
+        """Follow string literals, brackets and backslash continuations through `line`."""
+        self._continued = False
+        i = 0
+        while i < len(line):
+            char = line[i]
+            if self._string is not None:
+                if char == "\\":
+                    i += 2
+                    continue
+                if line.startswith(self._string, i):
+                    i += len(self._string)
+                    self._string = None
+                    continue
+            elif char == "#":
+                return  # A comment can't continue the line
+            elif char in "\"'":
+                self._string = char * 3 if line.startswith(char * 3, i) else char
+                i += len(self._string)
+                continue
+            elif char in "([{":
+                self._depth += 1
+            elif char in ")]}":
+                self._depth = max(self._depth - 1, 0)
+            i += 1
+        if line.endswith("\\"):
+            self._continued = True
+        elif self._string in ("'", '"'):
+            self._string = None  # Unterminated; the syntax check will report it
+
+    def _check(self, prefix: str):
+        if self.syntax_error is not None:
+            return
+        try:
+            ast.parse(prefix)
+        except SyntaxError as exc:
+            self.syntax_error = f"line {exc.lineno}: {exc.msg}"
+
+    @property
+    def class_mismatch(self) -> bool:
+        return self.scene_class_name is not None and self.scene_class_name != self.expected_class
+
+
+def _delta_payload(name: str, delta: str, reset: bool) -> dict:
+    """Progress payload for a streamed delta; reset=True tells clients to replace, not append."""
+    return {name: delta, "reset": True} if reset else {name: delta}
+
+
+def generate_and_execute_with_correction(
+    prompt: str,
+    max_correction_attempts: int = 3,
+    on_stage: Optional[Callable[[str, Optional[dict]], None]] = None,
+    job_id: Optional[str] = None,
+    plan: Optional[ScenePlan] = None,
+    stream: Optional[bool] = None,
+    use_cache: bool = True
+):
+    """
+    Plan, generate and render a video for `prompt`, feeding render errors back
+    to the LLM until the code runs.
+
+    `on_stage(stage, payload)` is called on every stage transition so callers
+    (e.g. the background job workers) can report progress. Passing an existing
+    `plan` skips the planning call. With `stream` (default: LLM_STREAMING) the
+    plan and code are reported token by token while they are generated.
+    With use_cache=False (the user asked not to reuse results) every LLM
+    call goes upstream and nothing new is cached.
+    """
+    def report(stage: str, payload: Optional[dict] = None):
+        if on_stage is not None:
+            on_stage(stage, payload)
+
+    if stream is None:
+        stream = LLM_STREAMING
+
+    if plan is not None:
+        storyboard_response = plan
+    elif stream:
+        with metrics.span("plan"):
+            storyboard_response = stream_plan_scene(
+                prompt, lambda delta, reset: report("planning", _delta_payload("plan_delta", delta, reset)),
+                use_cache=use_cache)
+    else:
+        with metrics.span("plan"):
+            storyboard_response = plan_scene(prompt, use_cache=use_cache)
     scene_class_name = storyboard_response.scene_class_name
     print(f" Scene planning complete: {scene_class_name}")
+    report("generating_code", {"scene_class_name": scene_class_name, "plan": storyboard_response.scene})
 
     # Step 2: Generate the code
-    generated_code = generate_code(storyboard_response.scene, scene_class_name)
-    current_code = generated_code.code
+    # Error of code whose generation was stopped early; it goes straight to correction
+    stream_error = None
+    if stream:
+        checker = PartialCodeChecker(scene_class_name)
+
+        def on_code_delta(delta: str, reset: bool):
+            nonlocal checker
+            if reset:
+                # The stream rewrote what it had sent; check the new text from scratch
+                checker = PartialCodeChecker(scene_class_name)
+            checker.feed(delta)
+            report("generating_code", _delta_payload("code_delta", delta, reset))
+            if checker.syntax_error:
+                # The rest of the response can't fix this; don't wait for it
+                raise CodeStreamStopped(checker.syntax_error, checker.code)
+
+        try:
+            with metrics.span("codegen"):
+                generated_code = stream_generate_code(storyboard_response.scene, scene_class_name, on_code_delta,
+                                                      use_cache=use_cache)
+            checker.feed("\n")
+        except CodeStreamStopped as stopped:
+            print(f" Syntax error spotted while streaming, stopped generating: {stopped.syntax_error}")
+            report("generating_code", {"syntax_error": stopped.syntax_error})
+            generated_code = None
+            current_code = stopped.partial_code
+            stream_error = (f"Code generation was stopped at a syntax error ({stopped.syntax_error}). "
+                            "Fix it and complete the code so it animates this plan:\n\n"
+                            + storyboard_response.scene)
+        if checker.class_mismatch:
+            # The LLM renamed the scene; render what it actually wrote
+            print(f" Generated scene class is {checker.scene_class_name}, not {scene_class_name}")
+            scene_class_name = checker.scene_class_name
+    else:
+        with metrics.span("codegen"):
+            generated_code = generate_code(storyboard_response.scene, scene_class_name, use_cache=use_cache)
+    if stream_error is None:
+        current_code = generated_code.code
+        # The LLM answer current_code came from; cached only if that code renders
+        code_source = ("code", {"plan": storyboard_response.scene}, generated_code,
+                       STREAM_CACHE_VARIANT if stream else "")
+    else:
+        code_source = None
     print(" Initial code generation complete")
 
     # Step 3: Execute with correction loop
-    for attempt in range(max_correction_attempts + 1):
-        if attempt > 0:
-            print(f"\n Correction attempt {attempt}/{max_correction_attempts}...")
-
-        # Execute current code
-        result = execute_manim_code(current_code, scene_class_name)
-
-        # Check if execution succeeded
-        if not result.error or "Animation completed successfully" in result.output:
-            print(" Animation executed successfully!")
-            break
-
-        # If we've reached max attempts, exit
-        if attempt >= max_correction_attempts:
-            print(f" Failed to fix errors after {max_correction_attempts} attempts.")
-            break
-
-        # Try to fix the errors
-        print("Errors detected, attempting to fix...")
-        correction = correct_manim_errors(current_code, result.error)
-
-        # Update the code for next attempt
-        if correction == None:
-            return None
+    workspace = None
+    rendered = False
+    try:
+        for attempt in range(max_correction_attempts + 1):
+            if attempt > 0:
+                print(f"\n Correction attempt {attempt}/{max_correction_attempts}...")
+
+            if stream_error is not None:
+                result = ManimExecutionResponse(output="", error=stream_error)
+                stream_error = None
+            else:
+                # Catch syntax errors, unknown names and a missing scene class without
+                # paying for a Manim process
+                with metrics.span("validate", attempt=attempt):
+                    problems = validate_manim_code(current_code, scene_class_name)
+                if problems:
+                    print(f" Pre-flight validation found {len(problems)} problem(s)")
+                    report("validating", {"attempt": attempt, "problems": problems})
+                    result = ManimExecutionResponse(output="", error="Pre-flight validation failed:\n" + "\n".join(problems))
+                else:
+                    report("rendering", {"attempt": attempt})
+                    # One workspace for every attempt, so Manim's partial movie cache
+                    # skips animations that did not change since the last attempt
+                    if workspace is None:
+                        workspace = RenderWorkspace(job_id)
+                    with metrics.span("render", attempt=attempt):
+                        result = execute_manim_code(
+                            current_code, scene_class_name, workspace,
+                            on_progress=lambda percent: report("rendering", {"attempt": attempt, "percent": round(percent)})
+                        )
+
+            # Check if execution succeeded
+            if not result.error or "Animation completed successfully" in result.output:
+                print(" Animation executed successfully!")
+                rendered = True
+                if use_cache and code_source is not None:
+                    remember_working_code(*code_source)
+                break
+
+            # If we've reached max attempts, exit
+            if attempt >= max_correction_attempts:
+                print(f" Failed to fix errors after {max_correction_attempts} attempts.")
+                break
+
+            # Try to fix the errors
+            print("Errors detected, attempting to fix...")
+            report("correcting", {"attempt": attempt + 1})
+            with metrics.span("correction", attempt=attempt + 1):
+                correction = correct_manim_errors(current_code, result.error, use_cache=use_cache)
+
+            # Update the code for next attempt
+            if correction == None:
+                metrics.CORRECTION_ATTEMPTS.labels("failed").observe(attempt)
+                if workspace is not None:
+                    workspace.cleanup()
+                return None
         
-        current_code = correction.fixed_code
+            code_source = ("correction", {"code": current_code, "error_message": result.error}, correction)
+            current_code = correction.fixed_code
+    except BaseException:
+        # Nobody else knows about the workspace yet; don't leave its media
+        # on disk until the next startup sweep
+        if workspace is not None:
+            workspace.cleanup()
+        raise
+
+    metrics.CORRECTION_ATTEMPTS.labels("rendered" if rendered else "failed").observe(attempt)
 
     # Return results
     return {
@@ -325,6 +881,7 @@ def generate_and_execute_with_correction(prompt: str, max_correction_attempts: i
         "plan": storyboard_response.scene,
         "execution_result": result,
         "correction_attempts": attempt,
-        "video_path" : result.video_path
+        "video_path" : result.video_path,
+        "workspace": workspace  # Caller must cleanup() once the video is uploaded
     }
 
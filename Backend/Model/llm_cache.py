@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "eduvid-llm-cache.sqlite3")
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_TTL_HOURS = int(os.getenv("LLM_CACHE_TTL_HOURS", "168"))  # 0 = never expire
+
+
+def llm_cache_key(model: str, temperature: float, system_prompt: str, inputs: dict, schema,
+                  variant: str = "") -> str:
+    # `variant` tells apart prompts that share a system prompt but word the
+    # request differently (e.g. the streaming chains' JSON instructions)
+    parts = [model, temperature, system_prompt, inputs, schema.__name__]
+    if variant:
+        parts.append(variant)
+    payload = json.dumps(parts, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache for structured LLM responses: an in-memory LRU in front of
+    a SQLite file, so identical prompts are answered locally across requests
+    and restarts. Concurrent misses on the same key are coalesced: the first
+    caller makes the upstream request and the others wait for its result.
+    """
+
+    def __init__(self, path: str, memory_entries: int, ttl_seconds: int):
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (stored_at, json value)
+        self._inflight = {}  # key -> Future of the pending upstream call
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _expired(self, stored_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - stored_at > self.ttl_seconds
+
+    def _lookup(self, key: str) -> str | None:
+        # Caller holds self._lock
+        entry = self._memory.get(key)
+        if entry is None:
+            row = self._db.execute("SELECT stored_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], row[1])
+        if self._expired(entry[0]):
+            self._memory.pop(key, None)
+            return None
+        self._remember(key, entry)
+        return entry[1]
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _store(self, key: str, value: str):
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute("INSERT OR REPLACE INTO llm_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                             (key, entry[0], value))
+            self._db.commit()
+
+    def get_or_call(self, key: str, schema, call, store: bool = True):
+        """
+        Return the cached `schema` instance for key, or run `call()` once and
+        cache its result. With store=False the result is shared with
+        concurrent callers but not cached; remember() it once it is known to
+        be good.
+        """
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                self.hits += 1
+                return schema.model_validate_json(cached)
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            response = call()
+            # Structured output can come back empty; don't pin that in the cache
+            if response is not None and store:
+                self._store(key, response.model_dump_json())
+            pending.set_result(response)
+            return response
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def remember(self, key: str, response):
+        if response is not None:
+            self._store(key, response.model_dump_json())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "memory_entries": len(self._memory),
+            }
+
+
+llm_cache = LLMCache(LLM_CACHE_PATH, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_TTL_HOURS * 3600)
+
+
+def cached_invoke(model: str, temperature: float, system_prompt: str, inputs: dict, schema, call,
+                  bypass: bool = False, store: bool = True, variant: str = ""):
+    """
+    Run a structured LLM call through the shared cache (or directly when
+    caching is disabled or `bypass` is set). With store=False a fresh
+    response is not cached; see remember_response.
+    """
+    if not LLM_CACHE_ENABLED or bypass:
+        return call()
+    key = llm_cache_key(model, temperature, system_prompt, inputs, schema, variant)
+    return llm_cache.get_or_call(key, schema, call, store=store)
+
+
+def remember_response(model: str, temperature: float, system_prompt: str, inputs: dict, schema, response,
+                      variant: str = ""):
+    """Cache a response fetched with store=False, once the caller has checked it."""
+    if LLM_CACHE_ENABLED:
+        llm_cache.remember(llm_cache_key(model, temperature, system_prompt, inputs, schema, variant), response)
@@ -0,0 +1,280 @@
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from typing import List
+import os
+import shutil
+import struct
+
+from Model.render import PRIORITY_BACKGROUND, render_scheduler, run_limited
+
+load_dotenv()
+
+# Dashboard cards show these instead of loading the video itself
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "480"))
+PREVIEW_FRAMES = int(os.getenv("PREVIEW_FRAMES", "12"))
+PREVIEW_FRAME_MS = int(os.getenv("PREVIEW_FRAME_MS", "250"))
+
+# moov atom before the media data, so playback starts after the first bytes
+VIDEO_FASTSTART = os.getenv("VIDEO_FASTSTART", "1") == "1"
+# Adaptive-bitrate HLS next to the MP4; needs the ffmpeg binary
+HLS_ENABLED = os.getenv("HLS_ENABLED", "0") == "1"
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+# height:bitrate per variant; variants taller than the source are skipped
+HLS_RENDITIONS = [
+    (int(height), bitrate)
+    for height, bitrate in (item.split(":") for item in os.getenv("HLS_RENDITIONS", "480:1000k,720:2500k,1080:5000k").split(","))
+]
+HLS_MASTER_PLAYLIST = "master.m3u8"
+
+_MP4 = dict(format="mp4", container_options={"movflags": "+faststart"})
+
+
+def _template_stream(output, stream):
+    if hasattr(output, "add_stream_from_template"):  # PyAV >= 13
+        return output.add_stream_from_template(stream)
+    return output.add_stream(template=stream)
+
+
+def concat_videos(paths: List[str], dest_path: str) -> str:
+    """
+    Join MP4s that share codec settings (e.g. section renders of one scene)
+    by copying packets, without re-encoding. Uses PyAV, which Manim already
+    depends on for writing its movies.
+    """
+    import av
+
+    with av.open(dest_path, "w", **_MP4) as output:
+        out_stream = None
+        offset = 0.0  # seconds of video already written
+
+        for path in paths:
+            with av.open(path) as source:
+                stream = source.streams.video[0]
+                if out_stream is None:
+                    out_stream = _template_stream(output, stream)
+
+                shift = round(offset / stream.time_base)
+                end = shift
+                for packet in source.demux(stream):
+                    if packet.dts is None:  # Flush packet
+                        continue
+                    packet.pts += shift
+                    packet.dts += shift
+                    end = max(end, packet.pts + packet.duration)
+                    # mux() rescales from the packet's (source) time base
+                    packet.stream = out_stream
+                    output.mux(packet)
+                offset = float(end * stream.time_base)
+
+    return dest_path
+
+
+def video_duration(path: str) -> float | None:
+    """Length of a video in seconds, from the container header."""
+    try:
+        import av
+
+        with av.open(path) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = container.streams.video[0]
+            return float(stream.duration * stream.time_base) if stream.duration else None
+    except Exception:
+        return None
+
+
+def is_faststart(path: str) -> bool:
+    """Whether the MP4's moov atom comes before its mdat (walks the top-level boxes only)."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            size, box = struct.unpack(">I4s", header)
+            if box == b"moov":
+                return True
+            if box == b"mdat" or size == 0:
+                return False
+            header_size = 8
+            if size == 1:  # 64-bit size follows
+                large = f.read(8)
+                if len(large) < 8:
+                    return False
+                size = struct.unpack(">Q", large)[0]
+                header_size = 16
+            if size < header_size:
+                # Malformed: seeking back would walk the same boxes forever
+                return False
+            f.seek(size - header_size, os.SEEK_CUR)
+
+
+def faststart(path: str) -> str:
+    """
+    Move the MP4's index to the front, in place, by remuxing every stream
+    (no re-encode). Files that are already faststart are left alone.
+    """
+    if is_faststart(path):
+        return path
+    import av
+
+    tmp = f"{path}.faststart"
+    with av.open(path) as source, av.open(tmp, "w", **_MP4) as output:
+        streams = {
+            stream.index: _template_stream(output, stream)
+            for stream in source.streams if stream.type in ("video", "audio")
+        }
+        for packet in source.demux(*(source.streams[index] for index in streams)):
+            if packet.dts is None:  # Flush packet
+                continue
+            packet.stream = streams[packet.stream.index]
+            output.mux(packet)
+    os.replace(tmp, path)
+    return path
+
+
+def package_hls(video_path: str, renditions: List[tuple] = HLS_RENDITIONS,
+                segment_seconds: int = HLS_SEGMENT_SECONDS) -> str | None:
+    """
+    Encode `video_path` into one HLS variant per rendition plus a master
+    playlist, in a directory next to it. Runs on a background render slot
+    with the render limits. Returns the directory, or None if ffmpeg is
+    missing or the encode failed.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print(" HLS packaging skipped: ffmpeg not found")
+        return None
+    import av
+
+    with av.open(video_path) as container:
+        height = container.streams.video[0].height
+        has_audio = bool(container.streams.audio)
+    variants = [r for r in renditions if r[0] <= height] or sorted(renditions)[:1]
+
+    out_dir = f"{os.path.splitext(video_path)[0]}-hls"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    for variant_height, _ in variants:
+        os.makedirs(os.path.join(out_dir, f"{variant_height}p"))
+
+    count = len(variants)
+    filters = f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count)) + ";" + ";".join(
+        f"[s{i}]scale=-2:{variant_height}[v{i}]" for i, (variant_height, _) in enumerate(variants))
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-i", video_path, "-filter_complex", filters]
+    stream_map = []
+    for i, (variant_height, bitrate) in enumerate(variants):
+        cmd += ["-map", f"[v{i}]", f"-c:v:{i}", "libx264", f"-b:v:{i}", bitrate]
+        if has_audio:
+            cmd += ["-map", "0:a:0"]
+        stream_map.append(f"v:{i},a:{i},name:{variant_height}p" if has_audio else f"v:{i},name:{variant_height}p")
+    if has_audio:
+        cmd += ["-c:a", "aac", "-b:a", "128k"]
+    cmd += [
+        "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        # Keyframe at every segment boundary, so all variants switch cleanly
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "%v", "segment_%03d.ts"),
+        "-master_pl_name", HLS_MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(out_dir, "%v", "index.m3u8"),
+    ]
+
+    with render_scheduler.slot(PRIORITY_BACKGROUND):
+        result = run_limited(cmd, fail_fast=False)
+    if result.returncode != 0:
+        print(f" HLS packaging of {video_path} failed: {result.stderr.strip()[-500:]}")
+        return None
+    return out_dir
+
+
+@dataclass
+class Thumbnails:
+    poster_path: str  # JPEG of the last frame, where Manim scenes usually end on the full picture
+    preview_path: str | None  # Looping animated WebP of PREVIEW_FRAMES evenly spaced frames
+
+
+def make_thumbnails(video_path: str, width: int = THUMBNAIL_WIDTH) -> Thumbnails | None:
+    """
+    Poster and animated preview next to `video_path`, taken from the rendered
+    file (no second Manim render). Seeks to each sample time instead of
+    decoding the whole video. None if the video can't be read; the dashboard
+    then falls back to the video element.
+    """
+    try:
+        import av
+
+        duration = video_duration(video_path) or 0
+        # Sample times for the preview, spread over the whole video
+        sample_times = [duration * i / PREVIEW_FRAMES for i in range(PREVIEW_FRAMES)] if duration else []
+
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            reader = _FrameReader(container, stream)
+            samples = [_scaled(frame, width) for frame in map(reader.frame_at, sample_times) if frame is not None]
+            last = reader.last_frame(duration)
+        if last is None:
+            return None
+
+        stem = os.path.splitext(video_path)[0]
+        poster_path = f"{stem}.jpg"
+        _scaled(last, width).save(poster_path, "JPEG", quality=85, optimize=True)
+
+        preview_path = None
+        if len(samples) > 1:
+            preview_path = f"{stem}.webp"
+            samples[0].save(preview_path, "WEBP", save_all=True, append_images=samples[1:],
+                            duration=PREVIEW_FRAME_MS, loop=0, quality=60)
+        return Thumbnails(poster_path, preview_path)
+    except Exception as exc:
+        print(f" Could not make thumbnails for {video_path}: {exc}")
+        return None
+
+
+class _FrameReader:
+    """
+    Frames of one video stream at increasing times. A target close ahead is
+    reached by decoding on; anything further away is a seek to the keyframe
+    before it, so only the frames between that keyframe and the target are
+    decoded.
+    """
+
+    SEEK_MIN_SECONDS = 2.0
+
+    def __init__(self, container, stream):
+        self.container = container
+        self.stream = stream
+        self._frames = None
+        self._last = None  # Last decoded frame
+        self._position = None  # and its time
+
+    def _seek(self, seconds: float):
+        self.container.seek(int(seconds / self.stream.time_base), stream=self.stream)
+        self._frames = self.container.decode(self.stream)
+
+    def frame_at(self, seconds: float):
+        """First frame at or after `seconds`, or None past the end."""
+        if self._frames is None or self._position is None or seconds - self._position > self.SEEK_MIN_SECONDS:
+            self._seek(seconds)
+        for frame in self._frames:
+            self._last = frame
+            if frame.time is None:
+                continue
+            self._position = frame.time
+            if frame.time >= seconds:
+                return frame
+        return None
+
+    def last_frame(self, duration: float):
+        if self._frames is None or self._position is None or duration - self._position > self.SEEK_MIN_SECONDS:
+            self._seek(max(duration - self.SEEK_MIN_SECONDS, 0))
+        for frame in self._frames:
+            self._last = frame
+        return self._last
+
+
+def _scaled(frame, width: int):
+    image = frame.to_image()  # PIL image; Pillow comes with Manim
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)))
+    return image
@@ -0,0 +1,419 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from typing import Callable
+import codecs
+import heapq
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+load_dotenv()
+
+# Lower value = scheduled first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+RENDER_MAX_QUEUE = int(os.getenv("RENDER_MAX_QUEUE", str(RENDER_WORKERS * 4)))
+RENDER_TIMEOUT_SECONDS = int(os.getenv("RENDER_TIMEOUT_SECONDS", "600"))
+RENDER_MAX_CPU_SECONDS = int(os.getenv("RENDER_MAX_CPU_SECONDS", "900"))
+RENDER_MAX_MEMORY_MB = int(os.getenv("RENDER_MAX_MEMORY_MB", "0"))  # 0 = unlimited
+RENDER_WORKSPACE_ROOT = os.getenv("RENDER_WORKSPACE_ROOT") or os.path.join(tempfile.gettempdir(), "eduvid-renders")
+
+# Manim quality flag -> directory Manim writes that quality to
+QUALITY_DIRS = {
+    "-ql": "480p15",
+    "-qm": "720p30",
+    "-qh": "1080p60",
+    "-qp": "1440p60",
+    "-qk": "2160p60",
+}
+# Manim quality flag -> config.quality value (used by in-process renders)
+QUALITY_NAMES = {
+    "-ql": "low_quality",
+    "-qm": "medium_quality",
+    "-qh": "high_quality",
+    "-qp": "production_quality",
+    "-qk": "fourk_quality",
+}
+
+
+class RenderQueueFull(Exception):
+    """Raised when a render is requested while the wait queue is at capacity."""
+
+
+class RenderScheduler:
+    """
+    Caps the number of concurrent Manim renders at `slots`. Renders beyond
+    that wait in a priority queue (FIFO within a priority); once `max_queue`
+    renders are waiting, new requests are rejected with RenderQueueFull
+    instead of piling up more processes. Background renders are never
+    rejected and don't count towards `max_queue` (their own worker pool
+    bounds them), so waiting upgrades can't turn users away.
+    """
+
+    def __init__(self, slots: int, max_queue: int):
+        self.slots = slots
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = 0
+        self._seq = itertools.count()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        with self._cond:
+            if priority < PRIORITY_BACKGROUND and self._full():
+                raise RenderQueueFull(f"Render queue is full ({self.max_queue} waiting)")
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or self._running >= self.slots:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._running += 1
+            # The next ticket in line may also fit if slots are free
+            self._cond.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def idle(self) -> bool:
+        """A slot is free and nothing is waiting for one."""
+        with self._cond:
+            return self._running < self.slots and not self._waiting
+
+    def _full(self) -> bool:
+        # Caller holds self._cond
+        waiting = sum(1 for priority, _ in self._waiting if priority < PRIORITY_BACKGROUND)
+        return self._running >= self.slots and waiting >= self.max_queue
+
+    def saturated(self) -> bool:
+        with self._cond:
+            return self._full()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queued": len(self._waiting),
+                "max_queue": self.max_queue,
+            }
+
+
+render_scheduler = RenderScheduler(RENDER_WORKERS, RENDER_MAX_QUEUE)
+
+
+def _render_limits() -> list:
+    """(resource, (soft, hard)) pairs applied to every render process."""
+    limits = []
+    if RENDER_MAX_CPU_SECONDS:
+        limits.append((resource.RLIMIT_CPU, (RENDER_MAX_CPU_SECONDS, RENDER_MAX_CPU_SECONDS)))
+    if RENDER_MAX_MEMORY_MB:
+        limit = RENDER_MAX_MEMORY_MB * 1024 * 1024
+        limits.append((resource.RLIMIT_AS, (limit, limit)))
+    return limits
+
+
+def _apply_limits(pid: int):
+    # Set from the parent once the child is running: a preexec_fn would run
+    # Python between fork and exec, which can deadlock in a threaded process
+    if resource is None or not hasattr(resource, "prlimit"):  # prlimit is Linux only
+        return
+    for limit, value in _render_limits():
+        try:
+            resource.prlimit(pid, limit, value)
+        except ProcessLookupError:
+            return  # Already exited
+
+
+class OutputLines:
+    """Splits streamed render output into lines for `on_output`."""
+
+    def __init__(self, on_output: Callable[[str], None] | None):
+        self.on_output = on_output
+        self._pending = ""
+
+    def feed(self, text: str):
+        if self.on_output is None:
+            return
+        # Progress bars redraw with \r, log lines end with \n
+        self._pending += text
+        *lines, self._pending = re.split(r"[\r\n]", self._pending)
+        for line in lines:
+            if line.strip():
+                self.on_output(line)
+
+    def flush(self):
+        if self.on_output is not None and self._pending.strip():
+            self.on_output(self._pending)
+        self._pending = ""
+
+
+def run_limited(cmd: list, timeout: int = RENDER_TIMEOUT_SECONDS,
+                on_output: Callable[[str], None] | None = None,
+                cwd: str | None = None, fail_fast: bool = True) -> subprocess.CompletedProcess:
+    """
+    Run a render process with the per-render CPU/memory limits applied (Linux)
+    and a wall-clock timeout. stderr is read as it is produced and handed to
+    `on_output` one line (or progress-bar redraw) at a time. With `fail_fast`
+    the process is killed as soon as it has printed a complete traceback.
+    A timed out render is reported as a failed process rather than raising,
+    so it flows into the normal error handling.
+    """
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        # Wide enough that rich tracebacks don't wrap file paths
+        env={**os.environ, "COLUMNS": "200"},
+    )
+    _apply_limits(proc.pid)
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    watchdog = threading.Timer(timeout, kill_on_timeout)
+    watchdog.start()
+
+    # stdout is drained on a side thread so neither pipe can fill up and block Manim
+    stdout_chunks = []
+    stdout_reader = threading.Thread(target=lambda: stdout_chunks.append(proc.stdout.read()), daemon=True)
+    stdout_reader.start()
+
+    watcher = TracebackWatcher()
+
+    def on_line(line: str):
+        if on_output is not None:
+            on_output(line)
+        if fail_fast and watcher.feed(line) and proc.poll() is None:
+            print(f" Render raised {watcher.exception_line!r}, stopping it")
+            proc.kill()
+
+    stderr_parts = []
+    lines = OutputLines(on_line)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    try:
+        while True:
+            chunk = os.read(proc.stderr.fileno(), 4096)
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            stderr_parts.append(text)
+            lines.feed(text)
+        lines.flush()
+        returncode = proc.wait()
+    finally:
+        watchdog.cancel()
+        stdout_reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+
+    stdout = b"".join(stdout_chunks).decode("utf-8", "replace")
+    stderr = "".join(stderr_parts)
+    if timed_out.is_set():
+        stderr = f"Render timed out after {timeout} seconds"
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+
+_TRACEBACK_START = "Traceback (most recent call last)"
+_BOX_CHARS = "│╭╰┃"
+# Plain: File "/x/scene.py", line 12, in construct   Rich: /x/scene.py:12 in construct
+_FRAME_RE = re.compile(r'(?:File "(?P<file>[^"]+)", line (?P<line>\d+)|(?P<rfile>[^\s│"]+\.py):(?P<rline>\d+) in )')
+_EXCEPTION_RE = re.compile(r"^(?P<type>[A-Za-z_][\w.]*)(?::\s?(?P<message>.*))?$")
+
+
+class TracebackWatcher:
+    """
+    Fed render output line by line; notices the first complete traceback
+    (Python's plain format or the boxed one Manim prints through rich) and
+    remembers its frames and exception line.
+    """
+
+    def __init__(self):
+        self.in_traceback = False
+        self.frames = []  # (file, line)
+        self.exception_line = None
+
+    @property
+    def done(self) -> bool:
+        return self.exception_line is not None
+
+    def feed(self, line: str) -> bool:
+        """Returns True once the traceback's exception line has been seen."""
+        if self.done:
+            return True
+        if _TRACEBACK_START in line:
+            self.in_traceback = True
+            return False
+        if not self.in_traceback:
+            return False
+
+        frame = _FRAME_RE.search(line)
+        if frame:
+            self.frames.append((frame.group("file") or frame.group("rfile"),
+                                int(frame.group("line") or frame.group("rline"))))
+            return False
+        # Frames and source lines are indented or boxed; the exception line is not
+        stripped = line.rstrip()
+        if stripped and not stripped[0].isspace() and stripped[0] not in _BOX_CHARS \
+                and _EXCEPTION_RE.match(stripped):
+            self.exception_line = stripped
+            return True
+        return False
+
+
+@dataclass
+class RenderError:
+    exception_type: str
+    message: str
+    line: int | None = None
+    snippet: str = ""
+
+    def format(self) -> str:
+        text = f"{self.exception_type}: {self.message}".rstrip(": ")
+        if self.line is not None:
+            text += f"\nRaised at line {self.line} of the scene code:\n{self.snippet}"
+        return text
+
+
+def code_snippet(code: str, line: int, context: int = 3) -> str:
+    """Lines around `line` (1-based) of code, numbered, with the line itself marked."""
+    lines = code.splitlines()
+    start, end = max(line - context, 1), min(line + context, len(lines))
+    return "\n".join(
+        f"{'>' if n == line else ' '} {n:4d} | {lines[n - 1]}" for n in range(start, end + 1)
+    )
+
+
+def parse_render_error(stderr: str, code: str) -> RenderError | None:
+    """
+    Structured error from the first traceback in a render's stderr. The line
+    is the deepest frame inside the generated scene file (section variants
+    keep the original line numbers), or None if the error is raised from
+    Manim's own setup.
+    """
+    watcher = TracebackWatcher()
+    for line in re.split(r"[\r\n]", stderr):
+        if watcher.feed(line):
+            break
+    if not watcher.done:
+        return None
+
+    match = _EXCEPTION_RE.match(watcher.exception_line)
+    error = RenderError(match.group("type"), (match.group("message") or "").strip())
+    scene_frames = [line for file, line in watcher.frames
+                    if re.fullmatch(r"scene(_s\d+)?\.py", os.path.basename(file))]
+    if scene_frames and scene_frames[-1] <= len(code.splitlines()):
+        error.line = scene_frames[-1]
+        error.snippet = code_snippet(code, error.line)
+    return error
+
+
+def compact_error(stderr: str, code: str, tail_lines: int = 30) -> str:
+    """
+    What the correction prompt gets instead of the raw stderr: the structured
+    error when there is a traceback, otherwise the last lines without the
+    progress bars.
+    """
+    error = parse_render_error(stderr, code)
+    if error is not None:
+        return error.format()
+    lines = [line for line in re.split(r"[\r\n]", stderr)
+             if line.strip() and not _PROGRESS_RE.search(line)]
+    return "\n".join(lines[-tail_lines:])
+
+
+_PROGRESS_RE = re.compile(r"Animation\s+(\d+)\s*:.*?(\d{1,3})%")
+
+
+def parse_progress(line: str, total_animations: int, first_animation: int = 0) -> float | None:
+    """
+    Overall render progress (0-100) from a Manim progress-bar line such as
+    'Animation 3 : Create(Circle):  45%|####  | 27/60'. Manim only reports
+    per-animation progress, so the total is an estimate from the source.
+    `first_animation` is the index of the first rendered animation when
+    earlier ones are skipped (section renders).
+    """
+    match = _PROGRESS_RE.search(line)
+    if not match:
+        return None
+    index, percent = int(match.group(1)) - first_animation, int(match.group(2))
+    overall = max(index + percent / 100, 0) / max(total_animations, 1) * 100
+    return min(overall, 99.0)
+
+
+def count_animations(code: str) -> int:
+    """Rough number of play/wait calls in a scene, used to scale progress."""
+    return len(re.findall(r"self\.(?:play|wait)\(", code))
+
+
+class RenderWorkspace:
+    """
+    Private directory for one render job: the generated scene file, Manim's
+    media dir and the output video all live here, so concurrent renders of
+    the same scene class never see each other's files.
+    """
+
+    SCENE_FILE = "scene.py"
+
+    def __init__(self, job_id: str | None = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        os.makedirs(RENDER_WORKSPACE_ROOT, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=f"{self.job_id}-", dir=RENDER_WORKSPACE_ROOT)
+        self.media_dir = os.path.join(self.path, "media")
+
+    @property
+    def scene_file(self) -> str:
+        return os.path.join(self.path, self.SCENE_FILE)
+
+    def write_scene(self, code: str, file_name: str = SCENE_FILE) -> str:
+        path = os.path.join(self.path, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        return path
+
+    def video_path(self, output_name: str, quality_flag: str = "-ql", file_name: str = SCENE_FILE) -> str:
+        # Manim writes to <media_dir>/videos/<module name>/<quality>/<output>.mp4
+        module_name = os.path.splitext(file_name)[0]
+        return os.path.join(self.media_dir, "videos", module_name,
+                            QUALITY_DIRS[quality_flag], f"{output_name}.mp4")
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+def sweep_stale_workspaces(max_age_seconds: int = 24 * 3600):
+    """Remove workspaces left behind by crashed or killed workers."""
+    if not os.path.isdir(RENDER_WORKSPACE_ROOT):
+        return
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(RENDER_WORKSPACE_ROOT):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
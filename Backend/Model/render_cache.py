@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from importlib import metadata
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import storage
+
+load_dotenv()
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "eduvid-render-cache")
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "2048"))
+# Optional second tier shared between nodes, e.g. a private Supabase bucket
+RENDER_CACHE_BUCKET = os.getenv("RENDER_CACHE_BUCKET")
+
+VIDEO_FILE = "video.mp4"
+OUTPUT_FILE = "output.txt"
+
+
+def _manim_version() -> str:
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+MANIM_VERSION = _manim_version()
+
+
+def render_cache_key(code: str, scene_class_name: str, quality_flags: list) -> str:
+    """Content address of a render: same code, scene, flags and Manim -> same video."""
+    payload = json.dumps([code, scene_class_name, sorted(quality_flags), MANIM_VERSION])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Size-bounded LRU of rendered videos on local disk, one directory per key
+    holding the MP4 and the captured Manim stdout. Entries are optionally
+    mirrored to a storage bucket so other nodes (or a restarted node with an
+    empty disk) can reuse them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, bucket: str | None = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.bucket = bucket
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                # Half-written entry from an interrupted put()
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            video = os.path.join(entry.path, VIDEO_FILE)
+            if entry.is_dir() and os.path.exists(video):
+                stat = os.stat(video)
+                entries.append((stat.st_atime, entry.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str, dest_path: str, remote: bool = True) -> str | None:
+        """
+        Copy the cached video for `key` to dest_path and return its stdout, or
+        None on a miss. remote=False for keys that are never mirrored (put with
+        mirror=False), so a local miss doesn't ask the bucket for them.
+        """
+        with self._lock:
+            local = key in self._entries
+            if local:
+                self._entries.move_to_end(key)
+
+        if not local and not (remote and self.bucket and self._fetch_remote(key)):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        entry_dir = self._entry_dir(key)
+        try:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copyfile(os.path.join(entry_dir, VIDEO_FILE), dest_path)
+            with open(os.path.join(entry_dir, OUTPUT_FILE), encoding="utf-8") as f:
+                output = f.read()
+        except OSError:
+            # Evicted by another thread between the lookup and the copy
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return output
+
+    def put(self, key: str, video_path: str, output: str, mirror: bool = True):
+        entry_dir = self._entry_dir(key)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+        shutil.copyfile(video_path, os.path.join(tmp_dir, VIDEO_FILE))
+        with open(os.path.join(tmp_dir, OUTPUT_FILE), "w", encoding="utf-8") as f:
+            f.write(output)
+
+        with self._lock:
+            if key in self._entries:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+            os.replace(tmp_dir, entry_dir)
+            size = os.path.getsize(os.path.join(entry_dir, VIDEO_FILE))
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+
+        if self.bucket and mirror:
+            threading.Thread(target=self._push_remote, args=(key,), daemon=True).start()
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _fetch_remote(self, key: str) -> bool:
+        try:
+            video = storage.download_file(self.bucket, f"{key}/{VIDEO_FILE}")
+            output = storage.download_file(self.bucket, f"{key}/{OUTPUT_FILE}")
+        except Exception:
+            return False
+
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+        video_path = os.path.join(tmp_dir, VIDEO_FILE)
+        with open(video_path, "wb") as f:
+            f.write(video)
+        self.put(key, video_path, output.decode("utf-8"), mirror=False)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        with self._lock:
+            return key in self._entries
+
+    def _push_remote(self, key: str):
+        entry_dir = self._entry_dir(key)
+        try:
+            storage.upload_file(self.bucket, f"{key}/{VIDEO_FILE}",
+                                os.path.join(entry_dir, VIDEO_FILE), "video/mp4")
+            storage.upload_file(self.bucket, f"{key}/{OUTPUT_FILE}",
+                                os.path.join(entry_dir, OUTPUT_FILE), "text/plain")
+        except Exception as exc:
+            print(f" Could not mirror render {key[:12]} to bucket {self.bucket}: {exc}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+render_cache = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB * 1024 * 1024, RENDER_CACHE_BUCKET)
@@ -0,0 +1,196 @@
+from contextlib import redirect_stdout, redirect_stderr
+from dotenv import load_dotenv
+from typing import Callable
+import importlib.util
+import io
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+import traceback
+import uuid
+
+from Model.render import (OutputLines, QUALITY_NAMES, RENDER_WORKERS, RENDER_TIMEOUT_SECONDS,
+                          RENDER_MAX_CPU_SECONDS, RENDER_MAX_MEMORY_MB, resource)
+
+load_dotenv()
+
+# "subprocess": one cold `python -m manim` per render
+# "warm": long-lived workers that imported manim once
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "subprocess")
+RENDER_WORKER_MAX_JOBS = int(os.getenv("RENDER_WORKER_MAX_JOBS", "50"))
+
+LOG_FILE = "render.log"
+
+
+# --- Worker process side ---
+
+def _worker_main(conn):
+    if resource is not None and RENDER_MAX_MEMORY_MB:
+        limit = RENDER_MAX_MEMORY_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    import manim  # The expensive import every cold render pays; done once here
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        conn.send(_render(job))
+
+
+def _limit_cpu_for_next_job():
+    # RLIMIT_CPU counts the whole process lifetime, so move the soft limit
+    # to "CPU used so far + per-job budget" before every job
+    if resource is None or not RENDER_MAX_CPU_SECONDS:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (used + RENDER_MAX_CPU_SECONDS, hard))
+
+
+def _render(job: dict) -> dict:
+    from manim import tempconfig
+
+    _limit_cpu_for_next_job()
+    os.chdir(job["cwd"])
+    stdout = io.StringIO()
+    with open(os.path.join(job["cwd"], LOG_FILE), "a", encoding="utf-8") as log, \
+            redirect_stdout(stdout), redirect_stderr(log):
+        try:
+            # Load the generated file as a brand new module so nothing leaks
+            # between jobs; it is never registered in sys.modules
+            spec = importlib.util.spec_from_file_location(f"scene_{uuid.uuid4().hex}", job["scene_file"])
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            scene_class = getattr(module, job["scene_class_name"])
+
+            with tempconfig({
+                "input_file": job["scene_file"],
+                "media_dir": job["media_dir"],
+                "output_file": job["output_name"],
+                "quality": QUALITY_NAMES[job["quality_flag"]],
+                "preview": False,
+            }):
+                scene_class().render()
+            returncode, error = 0, ""
+        except BaseException:
+            returncode, error = 1, traceback.format_exc()
+            log.write(error)
+    return {"returncode": returncode, "stdout": stdout.getvalue(), "error": error}
+
+
+# --- Server side ---
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class WarmRenderPool:
+    """
+    Pool of pre-imported Manim worker processes. A crashed or timed out
+    worker only fails its own job and is replaced; workers are also recycled
+    after RENDER_WORKER_MAX_JOBS renders to cap leaked memory.
+    """
+
+    def __init__(self, size: int, max_jobs: int):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(_Worker(self._ctx))
+            self._started = True
+        print(f" Started {self.size} warm Manim render worker(s)")
+
+    def shutdown(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().stop()
+            self._started = False
+
+    def render(self, scene_file: str, scene_class_name: str, media_dir: str, output_name: str,
+               quality_flag: str, cwd: str, timeout: int = RENDER_TIMEOUT_SECONDS,
+               on_output: Callable[[str], None] | None = None) -> subprocess.CompletedProcess:
+        """Render on an idle worker; same result shape as render.run_limited."""
+        self.start()
+        worker = self._idle.get()
+        log_path = os.path.join(cwd, LOG_FILE)
+        open(log_path, "w").close()
+        args = ["warm-worker", scene_file, scene_class_name]
+
+        try:
+            worker.conn.send({
+                "scene_file": scene_file,
+                "scene_class_name": scene_class_name,
+                "media_dir": media_dir,
+                "output_name": output_name,
+                "quality_flag": quality_flag,
+                "cwd": cwd,
+            })
+            worker.jobs += 1
+            lines = OutputLines(on_output)
+            deadline = time.time() + timeout
+
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                while not worker.conn.poll(0.25):
+                    lines.feed(log.read())
+                    if time.time() > deadline:
+                        worker.process.kill()
+                        worker.process.join()
+                        return subprocess.CompletedProcess(args, -9, "", f"Render timed out after {timeout} seconds")
+                    if not worker.process.is_alive():
+                        break
+                lines.feed(log.read())
+                lines.flush()
+
+            try:
+                result = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.process.join(timeout=1)
+                log_text = open(log_path, encoding="utf-8", errors="replace").read()
+                sigxcpu = getattr(signal, "SIGXCPU", None)
+                reason = "exceeded its CPU limit" if sigxcpu and worker.process.exitcode == -sigxcpu \
+                    else f"crashed (exit code {worker.process.exitcode})"
+                return subprocess.CompletedProcess(args, -1, "", f"{log_text}\nRender worker {reason}")
+
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                stderr = log.read()
+            return subprocess.CompletedProcess(args, result["returncode"], result["stdout"], stderr)
+        finally:
+            if not worker.process.is_alive() or worker.jobs >= self.max_jobs:
+                worker.stop()
+                worker = _Worker(self._ctx)
+            self._idle.put(worker)
+
+
+warm_pool = WarmRenderPool(RENDER_WORKERS, RENDER_WORKER_MAX_JOBS)
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import List
+import ast
+import re
+
+# The code prompt asks for one construct() with `# Scene N: Title` comments
+_MARKER_RE = re.compile(r"^(\s*)#\s*Scene\s+(\d+)\b.*$", re.IGNORECASE)
+
+
+@dataclass
+class Section:
+    index: int        # 1-based
+    title: str
+    start_line: int   # 1-based line of the `# Scene N` marker (first body line for section 1)
+    end_line: int     # last line that belongs to the section
+    source: str
+
+
+def split_sections(code: str, scene_class_name: str) -> List[Section]:
+    """
+    Split the scene's construct() at its top-level `# Scene N:` comments.
+    Returns an empty list when the code has fewer than two sections or the
+    markers cannot be located safely (e.g. they sit inside a loop).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+
+    construct = None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == scene_class_name:
+            construct = next((n for n in node.body
+                              if isinstance(n, ast.FunctionDef) and n.name == "construct"), None)
+    if construct is None or not construct.body:
+        return []
+
+    lines = code.splitlines()
+    body_indent = construct.body[0].col_offset
+    first_line = construct.body[0].lineno
+    # Decorators/docstring aside, statements own every line from lineno to end_lineno
+    spans = [(stmt.lineno, stmt.end_lineno) for stmt in construct.body]
+
+    markers = []
+    for number in range(construct.lineno + 1, construct.end_lineno + 1):
+        match = _MARKER_RE.match(lines[number - 1])
+        if not match or len(match.group(1)) != body_indent:
+            continue
+        if any(start <= number <= end for start, end in spans):
+            continue
+        markers.append((number, lines[number - 1].strip().lstrip("#").strip()))
+
+    if len(markers) < 2:
+        return []
+
+    # Anything before the first marker belongs to section 1
+    starts = [min(first_line, markers[0][0])] + [line for line, _ in markers[1:]]
+    ends = [start - 1 for start in starts[1:]] + [construct.end_lineno]
+    return [
+        Section(index=i + 1, title=markers[i][1], start_line=start, end_line=end,
+                source="\n".join(lines[start - 1:end]))
+        for i, (start, end) in enumerate(zip(starts, ends))
+    ]
+
+
+def section_fingerprint(code: str, sections: List[Section], k: int) -> str:
+    """
+    The code that determines what section k looks like: everything except
+    the sections after it. Equal fingerprints mean the section can be reused
+    from an earlier render, even if later sections changed.
+    """
+    lines = code.splitlines()
+    if k < len(sections):
+        del lines[sections[k].start_line - 1:sections[-1].end_line]
+    return "\n".join(lines)
+
+
+def section_variant(code: str, scene_class_name: str, sections: List[Section], k: int) -> tuple:
+    """
+    Source of a scene that runs sections 1..k but only renders section k.
+
+    Earlier sections still execute (later sections depend on the objects they
+    create) inside Manim sections with skip_animations, which only computes
+    their end state. Rendering stops at the marker of section k+1. Markers are
+    rewritten in place and the entry point is appended at the end, so line
+    numbers in tracebacks match the original code.
+
+    Returns (code, class name to render).
+    """
+    lines = code.splitlines()
+    for section in sections[1:]:
+        if section.index > k + 1:
+            break
+        line = lines[section.start_line - 1]
+        indent = line[:len(line) - len(line.lstrip())]
+        if section.index == k + 1:
+            statement = "return"
+        else:
+            statement = f"self.next_section({section.title!r}, skip_animations={section.index != k})"
+        lines[section.start_line - 1] = f"{indent}{statement}  {line.strip()}"
+
+    variant_class = f"{scene_class_name}Section{k}"
+    lines += [
+        "",
+        "",
+        f"class {variant_class}({scene_class_name}):",
+        "    def setup(self):",
+        "        super().setup()",
+        f"        self.next_section({sections[0].title!r}, skip_animations={k != 1})",
+        "",
+    ]
+    return "\n".join(lines), variant_class
@@ -0,0 +1,135 @@
+from functools import lru_cache
+from typing import List
+import ast
+import builtins
+import inspect
+
+# Generated scenes have no business touching the host
+DISALLOWED_MODULES = {
+    "os", "sys", "subprocess", "shutil", "socket", "ctypes", "multiprocessing",
+    "threading", "asyncio", "signal", "importlib", "pickle", "marshal", "builtins",
+    "requests", "urllib", "http", "ftplib", "smtplib", "pathlib", "glob", "tempfile",
+}
+DISALLOWED_CALLS = {"eval", "exec", "compile", "open", "__import__", "input", "breakpoint"}
+
+# Used when Manim is not importable in this process
+FALLBACK_SCENE_TYPES = {
+    "Scene", "ThreeDScene", "MovingCameraScene", "ZoomedScene", "VectorScene",
+    "LinearTransformationScene", "SpecialThreeDScene",
+}
+
+
+@lru_cache(maxsize=1)
+def manim_exports() -> tuple:
+    """(names exported by `from manim import *`, Scene subclasses among them), or (None, fallback)."""
+    try:
+        import manim
+    except Exception:
+        return None, frozenset(FALLBACK_SCENE_TYPES)
+
+    names = frozenset(getattr(manim, "__all__", None) or [n for n in dir(manim) if not n.startswith("_")])
+    scene_types = frozenset(
+        name for name in names
+        if inspect.isclass(getattr(manim, name, None)) and issubclass(getattr(manim, name), manim.Scene)
+    )
+    return names, scene_types
+
+
+def _base_name(node: ast.expr) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):  # manim.Scene
+        return node.attr
+    return None
+
+
+def _bound_names(tree: ast.Module) -> set:
+    """Every name the module binds anywhere (not scope-aware, which only makes the check more lenient)."""
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.MatchAs) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.MatchStar) and node.name:
+            bound.add(node.name)
+    return bound
+
+
+def validate_manim_code(code: str, scene_class_name: str) -> List[str]:
+    """
+    Cheap in-process checks run before spending a Manim process on the code.
+    Returns a list of problems (empty when the code looks renderable).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as exc:
+        line = (exc.text or "").strip()
+        return [f"SyntaxError: {exc.msg} (line {exc.lineno}): {line}"]
+
+    errors = []
+    exported, scene_types = manim_exports()
+
+    # Imports
+    star_imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""]
+            if any(alias.name == "*" for alias in node.names):
+                star_imports.add((node.module or "").split(".")[0])
+        else:
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DISALLOWED_CALLS:
+                errors.append(f"Disallowed call {node.func.id}() (line {node.lineno})")
+            continue
+        for module in modules:
+            if module.split(".")[0] in DISALLOWED_MODULES:
+                errors.append(f"Disallowed import '{module}' (line {node.lineno})")
+
+    # Scene class
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+
+    def is_scene(name: str, seen: set) -> bool:
+        if name in scene_types:
+            return True
+        node = classes.get(name)
+        if node is None or name in seen:
+            return False
+        return any(is_scene(_base_name(base), seen | {name}) for base in node.bases if _base_name(base))
+
+    scene_class = classes.get(scene_class_name)
+    if scene_class is None:
+        errors.append(f"Scene class '{scene_class_name}' is not defined at module level "
+                      f"(classes found: {', '.join(classes) or 'none'})")
+    else:
+        if not is_scene(scene_class_name, set()):
+            bases = ", ".join(filter(None, (_base_name(b) for b in scene_class.bases))) or "object"
+            errors.append(f"Class '{scene_class_name}' inherits from {bases}, which is not a Manim Scene type")
+        methods = {n.name for n in scene_class.body if isinstance(n, ast.FunctionDef)}
+        if "construct" not in methods:
+            errors.append(f"Class '{scene_class_name}' has no construct() method")
+
+    # Undefined names: only decidable when every star import is `from manim import *`
+    if exported is not None and star_imports <= {"manim"}:
+        known = _bound_names(tree) | set(dir(builtins)) | (exported if "manim" in star_imports else set())
+        reported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) \
+                    and node.id not in known and node.id not in reported:
+                reported.add(node.id)
+                errors.append(f"NameError: name '{node.id}' is not defined and not exported by manim "
+                              f"(line {node.lineno})")
+
+    return errors
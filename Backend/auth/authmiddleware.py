@@ -1,8 +1,15 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import os
+import threading
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .jwtToken import verify_access_token
 from auth.dbmodel import User as DBUser            # Your actual DB model
-from database import get_db
+from database import get_async_db, get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 from fastapi import Depends, HTTPException, status
@@ -11,29 +18,121 @@ from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")  # or your token URL
 
+load_dotenv()
+
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+
+class UserCache:
+    """
+    Recently authenticated users by token subject, so polling endpoints don't
+    hit the users table on every request. Entries are detached snapshots:
+    fine for reading columns, but relationships and changes need a session.
+    Call invalidate() whenever a user row changes.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # subject -> (expires_at, user)
+
+    def get(self, subject) -> DBUser | None:
+        with self._lock:
+            entry = self._users.get(subject)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._users[subject]
+                return None
+            self._users.move_to_end(subject)
+            return entry[1]
+
+    def put(self, subject, user: DBUser):
+        with self._lock:
+            self._users[subject] = (time.monotonic() + self.ttl_seconds, user)
+            self._users.move_to_end(subject)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            for subject in [s for s, (_, user) in self._users.items() if user.id == user_id]:
+                del self._users[subject]
+
+
+user_cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_subject(token: str) -> tuple:
+    payload = verify_access_token(token)
+    if payload is None:
+        raise _unauthorized("Invalid or expired token")
+
+    # Tokens carry the user id; older ones only the username
+    user_id = payload.get("uid")
+    username = payload.get("sub")
+    if user_id is not None:
+        return ("uid", user_id)
+    if username is not None:
+        return ("sub", username)
+    raise _unauthorized("Invalid token payload")
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)   # Add DB session
 ) -> DBUser:
-    payload = verify_access_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    username = payload.get("sub")
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = db.query(DBUser).filter(DBUser.username == username).first()
+    subject = _token_subject(token)
+    user = user_cache.get(subject)
+    if user is not None:
+        return user
+
+    kind, value = subject
+    if kind == "uid":
+        user = db.get(DBUser, value)
+    else:
+        user = db.query(DBUser).filter(DBUser.username == value).first()
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("User not found")
+
+    db.expunge(user)
+    user_cache.put(subject, user)
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> DBUser:
+    """get_current_user for async routes: shares their async session instead of taking a sync one."""
+    return await user_from_token_async(token, db)
+
+
+async def user_from_token_async(token: str, db: AsyncSession) -> DBUser:
+    """get_current_user on an async session, for callers that manage their own session."""
+    subject = _token_subject(token)
+    user = user_cache.get(subject)
+    if user is not None:
+        return user
+
+    kind, value = subject
+    if kind == "uid":
+        user = await db.get(DBUser, value)
+    else:
+        user = await db.scalar(select(DBUser).filter(DBUser.username == value))
+    if user is None:
+        raise _unauthorized("User not found")
+
+    db.expunge(user)
+    user_cache.put(subject, user)
     return user
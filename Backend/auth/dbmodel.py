@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Boolean, DateTime, ForeignKey, Index, JSON, LargeBinary
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from database import Base
 
@@ -11,8 +11,11 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    topic_cache_opt_out = Column(Boolean, nullable=False, default=False)
+    plan = Column(String, nullable=False, default="free")  # Caps render quality, see quality.py
 
     videos = relationship("Video", back_populates="owner")
+    jobs = relationship("GenerationJob", back_populates="owner")
 
 
 class Video(Base):
@@ -20,10 +23,53 @@ class Video(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    scene_plan = Column(String)
-    manim_code = Column(String)
+    # Kilobytes per row and only needed by the detail view: loaded on first
+    # access, or with undefer_group("content")
+    scene_plan = deferred(Column(String), group="content")
+    manim_code = deferred(Column(String), group="content")
     video_path = Column(String)
+    scene_class_name = Column(String)  # Scene class rendered from manim_code
+    topic_key = Column(String, index=True)  # Normalized title, see topic_cache.normalize_topic
+    quality = Column(String)  # Resolution of the file at video_path, e.g. "480p15"
+    # Manim quality flag of a background re-render still to be done, see jobs._upgrade_video
+    upgrade_quality = Column(String)
+    upgrade_started_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    size_bytes = Column(BigInteger)
+    thumbnail_path = Column(String)  # Storage key of the poster image
+    preview_path = Column(String)  # Storage key of the animated preview, see Model/media.make_thumbnails
+    hls_path = Column(String)  # Storage key of the HLS master playlist, when HLS is enabled
+    # Per-stage seconds and LLM tokens of the job that generated it, see metrics.JobTimings
+    timings = deferred(Column(JSON))
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="videos")
+
+    __table_args__ = (
+        # Serves the dashboard listing: one user's videos, newest first
+        Index("ix_videos_user_id_created_at", "user_id", created_at.desc()),
+    )
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    # queued -> running -> succeeded / failed
+    id = Column(String, primary_key=True, index=True)
+    topic = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)
+    stage = Column(String, default="queued")
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"))
+    # Earlier video whose plan this job reuses instead of planning from scratch
+    reused_video_id = Column(Integer, ForeignKey("videos.id"))
+    reuse = Column(String)  # topic_cache reuse mode; "none" also bypasses the LLM cache
+    owner = relationship("User", back_populates="jobs")
+    video = relationship("Video", foreign_keys=[video_id])
+    reused_video = relationship("Video", foreign_keys=[reused_video_id])
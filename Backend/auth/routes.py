@@ -1,32 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status , Body
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-from auth.authmiddleware import get_current_user
-from fastapi.responses import FileResponse
-from Model.langchain import generate_and_execute_with_correction
+from auth.authmiddleware import (get_current_user, get_current_user_async, oauth2_scheme, user_cache,
+                                 user_from_token_async)
+from auth.utils import hash_password_async, verify_and_update_async
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import json
 import os
-from auth.schemas import UserCreate, Token  , UserLogin , VideoResponse
-from auth.dbmodel import User as DBUser , Video          
-from database import get_db
+from auth.schemas import UserCreate, Token  , UserLogin , VideoDetail , VideoPage , JobResponse , UserPreferences
+from auth.dbmodel import User as DBUser , Video , GenerationJob
+from database import get_db, get_async_db, AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, undefer_group
 from auth.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 import base64
-from supabase import create_client
 from typing import List
+from sqlalchemy import and_, or_, select
+import jobs
+import storage
+import topic_cache
 
 router = APIRouter()
 
-supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
@@ -37,36 +36,43 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 # --- Signup Route ---
 
 @router.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(DBUser).filter(DBUser.email == user.email).first()
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(select(DBUser).filter(DBUser.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed_password = get_password_hash(user.password)
+    # Hashing runs on the bounded bcrypt pool, not the event loop or the shared threadpool
+    hashed_password = await hash_password_async(user.password)
     new_user = DBUser(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
 
     access_token = create_access_token(
-        data={"sub": new_user.username},
+        data={"sub": new_user.username, "uid": new_user.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(DBUser).filter(DBUser.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(DBUser).filter(DBUser.email == user.email))
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    valid, new_hash = await verify_and_update_async(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this password was hashed
+        db_user.hashed_password = new_hash
+        await db.commit()
 
     access_token = create_access_token(
-        data={"sub": db_user.username},
+        data={"sub": db_user.username, "uid": db_user.id},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -77,7 +83,48 @@ def protected_route(current_user: DBUser = Depends(get_current_user)):
     return {"message": f"Hello, {current_user.username}. Middleware is working!"}
 
 
-@router.post("/generatetopic", response_model=VideoResponse)
+@router.put("/preferences", response_model=UserPreferences)
+def update_preferences(
+    preferences: UserPreferences,
+    current_user: DBUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # current_user may be a cached, detached copy: update the row directly
+    db.query(DBUser).filter(DBUser.id == current_user.id).update(
+        {"topic_cache_opt_out": preferences.topic_cache_opt_out})
+    db.commit()
+    user_cache.invalidate(current_user.id)
+    return {"topic_cache_opt_out": preferences.topic_cache_opt_out}
+
+
+def _video_response(video: Video) -> dict:
+    urls = storage.video_urls([key for key in (video.video_path, video.thumbnail_path, video.hls_path) if key])
+    return {
+        "title": video.title,
+        "scene_plan": video.scene_plan,
+        "video_url": urls.get(video.video_path),
+        "manim_code": video.manim_code,
+        "quality": video.quality,
+        "thumbnail_url": urls.get(video.thumbnail_path),
+        "hls_url": urls.get(video.hls_path)
+    }
+
+
+def _job_response(job: GenerationJob) -> dict:
+    return {
+        "id": job.id,
+        "topic": job.topic,
+        "status": job.status,
+        "stage": job.stage,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": _video_response(job.video) if job.video is not None else None
+    }
+
+
+@router.post("/generatetopic", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 def generate_topic(
     data: dict = Body(...),
     current_user: DBUser = Depends(get_current_user),
@@ -87,58 +134,207 @@ def generate_topic(
     if not topic:
         raise HTTPException(status_code=400, detail="Missing topic in request body")
 
-    # Generate video (assuming this creates a temporary file)
-    result = generate_and_execute_with_correction(prompt=topic)
-    video_path = result.get("video_path")
-    
-    if not video_path or not os.path.exists(video_path):
-        raise HTTPException(status_code=404, detail="Generated video not found")
-
-    # Upload to Supabase Storage
-    file_key = f"users/{current_user.id}/videos/{os.path.basename(video_path)}"
-    
-    supabase.storage.from_("videos").upload(file_key, video_path,
-                                            {"content-type" : "video/mp4"})
-    # Store metadata in DB
-    video_record = Video(
-        title=topic,
-        scene_plan=result['plan'],
-        manim_code=result['final_code'],
-        video_path=file_key,  # Store path instead of binary
-        owner=current_user
-    )
-    db.add(video_record)
-    db.commit()
+    try:
+        reuse = topic_cache.resolve_mode(current_user, data.get("reuse"))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-    video_url = supabase.storage.from_("videos").get_public_url(file_key)
+    # Someone already asked for this topic: reuse their video or plan
+    cached, exact = topic_cache.lookup(db, topic) if reuse != "none" else (None, False)
+    # Only an exact topic match is served as is; a near-duplicate only lends its plan
+    if cached is not None and exact and reuse == "video":
+        return _job_response(jobs.record_reused_job(db, current_user.id, topic, cached))
 
-    return {
-        "title": topic,
-        "scene_plan": result['plan'],
-        "video_url": video_url,
-        "manim_code": result['final_code']
-    }
+    # Generation takes minutes, so hand it to the background workers and
+    # let the client poll /jobs/{id} for progress
+    try:
+        job = jobs.enqueue_job(db, current_user.id, topic,
+                               reused_video_id=cached.id if cached is not None else None,
+                               reuse=reuse)
+    except jobs.JobQueueFull as exc:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail=str(exc), headers={"Retry-After": "30"})
+    return _job_response(job)
 
 
-@router.get("/myvideos", response_model=List[VideoResponse])
-def get_user_videos(
-    current_user: DBUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+# Job responses include the video's plan and code; async sessions can't lazy-load them
+_JOB_VIDEO = selectinload(GenerationJob.video).options(undefer_group("content"))
+
+
+@router.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(
+    limit: int = 20,
+    current_user: DBUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    videos = db.query(Video).filter(Video.user_id == current_user.id).all()
-    
-    response = []
-    for video in videos:
-        # Generate signed URL (expires in 1 hour)
-        signed_url = supabase.storage.from_("videos").get_public_url(video.video_path)
-        
-        response.append({
-            "title": video.title,
-            "scene_plan": video.scene_plan,
-            "video_url": signed_url,
-            "manim_code": video.manim_code
-        })
-    
-    return response
+    user_jobs = (await db.scalars(
+        select(GenerationJob)
+        .options(_JOB_VIDEO)
+        .filter(GenerationJob.user_id == current_user.id)
+        .order_by(GenerationJob.created_at.desc())
+        .limit(max(1, min(limit, 100)))
+    )).all()
+    # URL signing may call the storage API
+    return await run_in_threadpool(lambda: [_job_response(job) for job in user_jobs])
+
 
+async def _get_user_job(db: AsyncSession, job_id: str, user_id: int) -> GenerationJob:
+    job = await db.get(GenerationJob, job_id, options=[_JOB_VIDEO])
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: DBUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    job = await _get_user_job(db, job_id, current_user.id)
+    return await run_in_threadpool(_job_response, job)
+
+
+SSE_POLL_SECONDS = 0.5
+SSE_DB_POLL_SECONDS = 3
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse(stage: str, payload: dict) -> str:
+    return f"event: {stage}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+
+async def _job_snapshot(job_id: str) -> tuple:
+    # A short session per poll: the stream can stay open for minutes and
+    # must not hold a pooled connection all that time
+    async with AsyncSessionLocal() as db:
+        job = await db.get(GenerationJob, job_id, options=[_JOB_VIDEO])
+        if job.status == "succeeded":
+            return "done", {"result": await run_in_threadpool(_video_response, job.video)}
+        if job.status == "failed":
+            return "failed", {"error": job.error}
+        return job.stage or job.status, {}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, token: str = Depends(oauth2_scheme)):
+    """Server-sent events with every stage transition and progress update of a job."""
+    # No request-scoped sessions: they would stay checked out until the
+    # stream ends. Check access on one that is closed before streaming starts.
+    async with AsyncSessionLocal() as db:
+        current_user = await user_from_token_async(token, db)
+        owner_id = await db.scalar(select(GenerationJob.user_id).filter(GenerationJob.id == job_id))
+    if owner_id is None or owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        next_seq = 0
+        last_sent = loop_time = 0.0
+        last_snapshot = None
+        while True:
+            events = jobs.events_since(job_id, next_seq)
+            if events is None:
+                # Not running in this process (finished earlier, or picked up
+                # by another worker process): follow the persisted state
+                snapshot = await _job_snapshot(job_id)
+                if snapshot != last_snapshot:
+                    last_snapshot = snapshot
+                    yield _sse(*snapshot)
+                    last_sent = loop_time
+                if snapshot[0] in jobs.TERMINAL_STAGES:
+                    return
+                if loop_time - last_sent >= SSE_KEEPALIVE_SECONDS:
+                    yield ": keep-alive\n\n"
+                    last_sent = loop_time
+                await asyncio.sleep(SSE_DB_POLL_SECONDS)
+                loop_time += SSE_DB_POLL_SECONDS
+                continue
+
+            for seq, stage, payload in events:
+                yield _sse(stage, payload)
+                last_sent = loop_time
+                if stage in jobs.TERMINAL_STAGES:
+                    return
+                next_seq = seq + 1
+
+            if loop_time - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = loop_time
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            loop_time += SSE_POLL_SECONDS
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _encode_cursor(created_at: datetime, video_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{video_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, video_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/myvideos", response_model=VideoPage)
+async def get_user_videos(
+    limit: int = 20,
+    cursor: str | None = None,
+    current_user: DBUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Newest first, one page at a time; plan and code are left to GET /videos/{id}."""
+    limit = max(1, min(limit, 100))
+    query = (
+        select(Video.id, Video.title, Video.created_at, Video.video_path, Video.quality,
+               Video.duration_seconds, Video.size_bytes, Video.thumbnail_path, Video.preview_path,
+               Video.hls_path)
+        .filter(Video.user_id == current_user.id)
+    )
+    if cursor:
+        created_at, video_id = _decode_cursor(cursor)
+        query = query.filter(or_(Video.created_at < created_at,
+                                 and_(Video.created_at == created_at, Video.id < video_id)))
+    rows = (await db.execute(
+        query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1)
+    )).all()
+
+    page = rows[:limit]
+    # One signing call for the whole page (videos and images), and usually none thanks to the URL cache
+    keys = [key for row in page
+            for key in (row.video_path, row.thumbnail_path, row.preview_path, row.hls_path) if key]
+    urls = await run_in_threadpool(storage.video_urls, keys)
+    next_cursor = _encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {
+                "id": row.id,
+                "title": row.title,
+                "created_at": row.created_at,
+                "video_url": urls.get(row.video_path),
+                "quality": row.quality,
+                "duration_seconds": row.duration_seconds,
+                "size_bytes": row.size_bytes,
+                "thumbnail_url": urls.get(row.thumbnail_path),
+                "preview_url": urls.get(row.preview_path),
+                "hls_url": urls.get(row.hls_path)
+            }
+            for row in page
+        ],
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/videos/{video_id}", response_model=VideoDetail)
+async def get_video(
+    video_id: int,
+    current_user: DBUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    video = await db.get(Video, video_id, options=[undefer_group("content")])
+    if video is None or video.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return {**await run_in_threadpool(_video_response, video), "id": video.id, "created_at": video.created_at}
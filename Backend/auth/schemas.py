@@ -17,11 +17,53 @@ class VideoCreate(VideoBase):
 class VideoResponse(VideoBase):
     """Response model with URL instead of binary data"""
     manim_code : str
-    video_url: HttpUrl  # URL to access the video
+    video_url: Optional[HttpUrl] = None  # URL to access the video (signed URLs expire, see storage.py)
+    quality: Optional[str] = None  # Starts as the preview, upgraded once the HQ render is uploaded
+    thumbnail_url: Optional[HttpUrl] = None  # Poster image (last frame)
+    hls_url: Optional[HttpUrl] = None  # Adaptive-bitrate master playlist, when HLS is enabled
     scene_plan : str
     title : str
 
 
+    class Config:
+        orm_mode = True
+
+class VideoDetail(VideoResponse):
+    """Single video with its plan and code (GET /videos/{id})"""
+    id: int
+    created_at: Optional[datetime] = None
+
+class VideoSummary(BaseModel):
+    """Lightweight list entry; plan and code come from the detail endpoint"""
+    id: int
+    title: str
+    created_at: Optional[datetime] = None
+    video_url: Optional[HttpUrl] = None
+    quality: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    size_bytes: Optional[int] = None
+    thumbnail_url: Optional[HttpUrl] = None  # Poster image; load the video only on play
+    preview_url: Optional[HttpUrl] = None  # Short looping animated WebP
+    hls_url: Optional[HttpUrl] = None
+
+class VideoPage(BaseModel):
+    items: List[VideoSummary]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+
+# --- Generation Job Schemas ---
+
+class JobResponse(BaseModel):
+    """Status of a background video generation job"""
+    id: str
+    topic: str
+    status: str  # queued, running, succeeded, failed
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[VideoResponse] = None  # Filled in once the job succeeded
+
     class Config:
         orm_mode = True
 
@@ -47,6 +89,9 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+class UserPreferences(BaseModel):
+    topic_cache_opt_out: bool = False  # Always generate fresh videos, never reuse cached ones
+
 # --- Auth Token Schemas ---
 
 class Token(BaseModel):
@@ -1,10 +1,43 @@
 # auth/utils.py
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
 from passlib.context import CryptContext
+import asyncio
+import os
+
+load_dotenv()
+
+# Each +1 doubles the cost of a hash (12 is ~0.25 s on one core)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads hash in parallel; the pool size caps
+# how many cores a login burst can take from everything else
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+
+# Pinning min/max to the configured cost makes hashes with any other cost
+# "need update", so they are rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor, hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple:
+    """(valid, new_hash): new_hash is set when the stored hash should be replaced."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,55 @@
+"""
+Login throughput (bcrypt verifications per second) per core and through the bcrypt pool.
+
+    cd Backend
+    python -m benchmarks.password_hashing --rounds 10 11 12 --seconds 3
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import time
+
+from passlib.context import CryptContext
+
+from auth.utils import PASSWORD_HASH_WORKERS
+
+PASSWORD = "correct horse battery staple"
+
+
+def verifications_per_second(context: CryptContext, hashed: str, seconds: float, workers: int) -> float:
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> int:
+        count = 0
+        while time.perf_counter() < deadline:
+            context.verify(PASSWORD, hashed)
+            count += 1
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        total = sum(pool.map(lambda _: worker(), range(workers)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}, bcrypt pool workers: {PASSWORD_HASH_WORKERS}")
+    print(f"{'rounds':>6} {'hash ms':>8} {'logins/s/core':>14} {'logins/s pool':>14}")
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+        start = time.perf_counter()
+        hashed = context.hash(PASSWORD)
+        hash_ms = (time.perf_counter() - start) * 1000
+
+        single = verifications_per_second(context, hashed, args.seconds, 1)
+        pooled = verifications_per_second(context, hashed, args.seconds, PASSWORD_HASH_WORKERS)
+        print(f"{rounds:>6} {hash_ms:>8.0f} {single:>14.1f} {pooled:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
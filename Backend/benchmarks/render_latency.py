@@ -0,0 +1,85 @@
+"""
+Cold subprocess vs warm worker render latency on a tiny scene.
+
+    cd Backend
+    python -m benchmarks.render_latency --runs 5
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from Model.render import RenderWorkspace, run_limited
+from Model.render_worker import WarmRenderPool
+
+SCENE_CLASS = "BenchScene"
+SCENE_CODE = f"""from manim import *
+
+class {SCENE_CLASS}(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))
+        self.play(circle.animate.shift(RIGHT))
+        self.wait(0.5)
+"""
+
+
+def render_cold(workspace: RenderWorkspace, output_name: str):
+    cmd = [
+        sys.executable, "-m", "manim", "-ql",
+        "--media_dir", workspace.media_dir,
+        "-o", output_name,
+        workspace.scene_file,
+        SCENE_CLASS,
+    ]
+    return run_limited(cmd, cwd=workspace.path)
+
+
+def render_warm(pool: WarmRenderPool, workspace: RenderWorkspace, output_name: str):
+    return pool.render(workspace.scene_file, SCENE_CLASS, workspace.media_dir, output_name,
+                       "-ql", cwd=workspace.path)
+
+
+def measure(label: str, runs: int, render) -> list:
+    timings = []
+    for i in range(runs):
+        with RenderWorkspace() as workspace:
+            workspace.write_scene(SCENE_CODE)
+            start = time.perf_counter()
+            result = render(workspace, f"{SCENE_CLASS}-{i}")
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                raise SystemExit(f"{label} render failed:\n{result.stderr}")
+        timings.append(elapsed)
+        print(f"  {label} run {i + 1}: {elapsed:.2f}s")
+    return timings
+
+
+def summary(label: str, timings: list):
+    print(f"{label:>5}: median {statistics.median(timings):.2f}s, "
+          f"min {min(timings):.2f}s, max {max(timings):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    cold = measure("cold", args.runs, render_cold)
+
+    pool = WarmRenderPool(size=1, max_jobs=args.runs + 1)
+    start = time.perf_counter()
+    pool.start()
+    # First render also waits for the worker to finish importing Manim
+    measure("warm-up", 1, lambda ws, name: render_warm(pool, ws, name))
+    print(f"  pool start + first render: {time.perf_counter() - start:.2f}s")
+    warm = measure("warm", args.runs, lambda ws, name: render_warm(pool, ws, name))
+    pool.shutdown()
+
+    summary("cold", cold)
+    summary("warm", warm)
+    print(f"speedup: {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
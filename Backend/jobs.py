@@ -0,0 +1,492 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import or_
+import os
+import threading
+import uuid
+
+from database import SessionLocal
+from auth.dbmodel import GenerationJob, Video
+from Model.langchain import execute_manim_code, generate_and_execute_with_correction, ScenePlan
+from Model.media import (HLS_ENABLED, HLS_MASTER_PLAYLIST, VIDEO_FASTSTART, Thumbnails, faststart,
+                         make_thumbnails, package_hls, video_duration)
+from Model.render import PRIORITY_BACKGROUND, RenderWorkspace, render_scheduler
+from quality import PREVIEW_QUALITY, quality_name, upgrade_quality
+import metrics
+import storage
+import topic_cache
+
+load_dotenv()
+
+# A couple more workers than render slots so LLM stages overlap with renders
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", str(render_scheduler.slots + 2)))
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", str(GENERATION_WORKERS * 4)))
+
+# How long the live event log of a finished job is kept for late subscribers
+JOB_EVENTS_RETENTION_SECONDS = int(os.getenv("JOB_EVENTS_RETENTION_SECONDS", "600"))
+# Events kept per job; subscribers that fall further behind skip the oldest
+JOB_EVENTS_MAX = int(os.getenv("JOB_EVENTS_MAX", "500"))
+TERMINAL_STAGES = ("done", "failed")
+
+# Jobs still "running" at startup were interrupted by a restart. With several
+# server processes on one database, set this above the longest job so a
+# starting process doesn't fail jobs another process is still working on.
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "0"))
+INTERRUPTED_JOB_ERROR = "The server restarted while this video was being generated, please try again"
+
+# Background re-renders of finished videos at their final quality
+UPGRADE_WORKERS = int(os.getenv("UPGRADE_WORKERS", "1"))
+
+# Players fetch HLS segments relative to the playlist, which per-object
+# signed URLs can't serve: HLS is only published from public buckets
+HLS_PUBLISH = HLS_ENABLED and storage.VIDEO_URL_MODE == "public"
+if HLS_ENABLED and not HLS_PUBLISH:
+    print(" HLS_ENABLED is ignored: HLS needs VIDEO_URL_MODE=public")
+
+_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="generation")
+_upgrade_executor = ThreadPoolExecutor(max_workers=UPGRADE_WORKERS, thread_name_prefix="upgrade")
+_upload_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="upload")
+_pending = 0
+_pending_lock = threading.Lock()
+metrics.track_pending_jobs(lambda: _pending)
+
+# job id -> _EventLog for jobs running in this process
+_events = {}
+_events_lock = threading.Lock()
+
+
+class JobQueueFull(Exception):
+    """Raised when too many generation jobs are already waiting."""
+
+
+class _EventLog:
+    """
+    The last JOB_EVENTS_MAX events of a job, each with a sequence number.
+    A percent update that follows one of the same stage replaces it under a
+    new number, so render and upload progress take one slot, not hundreds.
+    """
+
+    def __init__(self):
+        self.next_seq = 0
+        self.entries = deque(maxlen=JOB_EVENTS_MAX)  # (seq, stage, payload)
+
+    def append(self, stage: str, payload: dict):
+        if self.entries and "percent" in payload:
+            _, last_stage, last_payload = self.entries[-1]
+            if last_stage == stage and last_payload.keys() == payload.keys():
+                self.entries.pop()
+        self.entries.append((self.next_seq, stage, payload))
+        self.next_seq += 1
+
+    def since(self, seq: int) -> list:
+        return [entry for entry in self.entries if entry[0] >= seq]
+
+
+def queue_full() -> bool:
+    with _pending_lock:
+        return _pending >= MAX_PENDING_JOBS or render_scheduler.saturated()
+
+
+def enqueue_job(db, user_id: int, topic: str, reused_video_id: int | None = None,
+                reuse: str | None = None) -> GenerationJob:
+    """
+    Persist a new job and hand it to the worker pool. With `reused_video_id`
+    the job starts from that video's scene plan instead of planning again.
+    With reuse="none" no cached LLM answers are used either.
+    """
+    if queue_full():
+        raise JobQueueFull("Too many videos are being generated right now, try again shortly")
+
+    job = GenerationJob(id=uuid.uuid4().hex, topic=topic, user_id=user_id,
+                        status="queued", stage="queued", reused_video_id=reused_video_id, reuse=reuse)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    _submit(job.id)
+    return job
+
+
+def record_reused_job(db, user_id: int, topic: str, source: Video) -> GenerationJob:
+    """
+    Serve a topic from an existing video: the user gets their own Video row
+    pointing at the already uploaded file, and a job that is already done.
+    """
+    now = datetime.utcnow()
+    video_record = Video(
+        title=topic,
+        scene_plan=source.scene_plan,
+        manim_code=source.manim_code,
+        scene_class_name=source.scene_class_name,
+        video_path=source.video_path,
+        quality=source.quality,
+        duration_seconds=source.duration_seconds,
+        size_bytes=source.size_bytes,
+        thumbnail_path=source.thumbnail_path,
+        preview_path=source.preview_path,
+        hls_path=source.hls_path,
+        topic_key=topic_cache.normalize_topic(topic),
+        user_id=user_id
+    )
+    db.add(video_record)
+    db.flush()
+
+    job = GenerationJob(id=uuid.uuid4().hex, topic=topic, user_id=user_id,
+                        status="succeeded", stage=topic_cache.REUSED_JOB_STAGE, created_at=now,
+                        started_at=now, finished_at=now,
+                        video_id=video_record.id, reused_video_id=source.id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def resume_pending_jobs():
+    """
+    Re-submit jobs that were still queued when the server last stopped, and
+    fail the ones that were interrupted mid-run so clients stop waiting.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        interrupted = (
+            db.query(GenerationJob)
+            .filter(GenerationJob.status == "running",
+                    GenerationJob.started_at <= now - timedelta(seconds=JOB_STALE_SECONDS))
+            .update({"status": "failed", "stage": "failed", "error": INTERRUPTED_JOB_ERROR,
+                     "finished_at": now}, synchronize_session=False)
+        )
+        db.commit()
+        pending = db.query(GenerationJob.id).filter(GenerationJob.status == "queued").all()
+        upgrades = db.query(Video.id).filter(Video.upgrade_quality.isnot(None), _upgrade_claimable(now)).all()
+    finally:
+        db.close()
+
+    if interrupted:
+        print(f" Marked {interrupted} interrupted generation job(s) as failed")
+
+    for (job_id,) in pending:
+        _submit(job_id)
+    if pending:
+        print(f" Resumed {len(pending)} queued generation job(s)")
+
+    for (video_id,) in upgrades:
+        _upgrade_executor.submit(_upgrade_video, video_id)
+    if upgrades:
+        print(f" Resumed {len(upgrades)} video quality upgrade(s)")
+
+
+def shutdown():
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _upgrade_executor.shutdown(wait=False, cancel_futures=True)
+    _upload_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def publish(job_id: str, stage: str, payload: dict | None = None):
+    """Append a progress event to the job's live log (read by the SSE endpoint)."""
+    with _events_lock:
+        log = _events.get(job_id)
+        if log is None:
+            log = _events[job_id] = _EventLog()
+        log.append(stage, payload or {})
+    if stage in TERMINAL_STAGES:
+        timer = threading.Timer(JOB_EVENTS_RETENTION_SECONDS, _drop_events, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+
+def events_since(job_id: str, seq: int) -> list | None:
+    """
+    (seq, stage, payload) of the job's events numbered `seq` or later, or
+    None if this process has no live log for the job.
+    """
+    with _events_lock:
+        log = _events.get(job_id)
+        return None if log is None else log.since(seq)
+
+
+def _drop_events(job_id: str):
+    with _events_lock:
+        _events.pop(job_id, None)
+
+
+def _submit(job_id: str):
+    global _pending
+    with _pending_lock:
+        _pending += 1
+    _executor.submit(_run_job, job_id)
+
+
+def _update_job(job_id: str, **fields):
+    db = SessionLocal()
+    try:
+        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim_job(db, job_id: str) -> bool:
+    # Conditional update so a job is only ever picked up by one worker,
+    # even if it was submitted twice (e.g. resumed by another process)
+    claimed = (
+        db.query(GenerationJob)
+        .filter(GenerationJob.id == job_id, GenerationJob.status == "queued")
+        .update({"status": "running", "stage": "planning", "started_at": datetime.utcnow()})
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _run_job(job_id: str):
+    global _pending
+    try:
+        # Spans reported while the job runs on this thread end up in its record
+        with metrics.job_timings(metrics.JobTimings()):
+            _process_job(job_id)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def _process_job(job_id: str):
+    db = SessionLocal()
+    result = None
+    upload = None
+    try:
+        if not _claim_job(db, job_id):
+            return
+        job = db.get(GenerationJob, job_id)
+        timings = metrics.current_timings()
+        metrics.observe("queued", (job.started_at - job.created_at).total_seconds())
+        publish(job_id, "planning")
+        current_stage = "planning"
+
+        def on_stage(stage: str, payload: dict | None = None):
+            nonlocal current_stage
+            publish(job_id, stage, payload)
+            # Progress events repeat the same stage; only transitions hit the DB
+            if stage != current_stage:
+                current_stage = stage
+                _update_job(job_id, stage=stage)
+
+        plan = None
+        source = job.reused_video
+        if source is not None and topic_cache.scene_class_name(source):
+            plan = ScenePlan(scene=source.scene_plan,
+                             scene_class_name=topic_cache.scene_class_name(source))
+
+        result = generate_and_execute_with_correction(prompt=job.topic, on_stage=on_stage,
+                                                      job_id=job_id, plan=plan,
+                                                      use_cache=job.reuse != "none")
+        video_path = result.get("video_path") if result else None
+        if not video_path or not os.path.exists(video_path):
+            raise RuntimeError("Generated video not found")
+        if VIDEO_FASTSTART:
+            with metrics.span("faststart"):
+                faststart(video_path)
+
+        # Upload to storage in the background while the DB row and the
+        # response are prepared; nothing is committed until it has finished
+        on_stage("uploading", {"percent": 0})
+        file_key = f"users/{job.user_id}/videos/{os.path.basename(video_path)}"
+
+        def upload_video():
+            with metrics.span("upload", timings):
+                storage.upload_video(file_key, video_path,
+                                     lambda percent: on_stage("uploading", {"percent": round(percent)}))
+
+        upload = _upload_executor.submit(upload_video)
+        # Poster and preview are cut and uploaded (small) while the video uploads
+        with metrics.span("thumbnails"):
+            thumbnail_path, preview_path = _upload_thumbnails(job.user_id, make_thumbnails(video_path))
+
+        # Store metadata in DB
+        video_record = Video(
+            title=job.topic,
+            scene_plan=result['plan'],
+            manim_code=result['final_code'],
+            scene_class_name=result["scene_class_name"],
+            video_path=file_key,
+            quality=quality_name(PREVIEW_QUALITY),
+            duration_seconds=video_duration(video_path),
+            size_bytes=os.path.getsize(video_path),
+            thumbnail_path=thumbnail_path,
+            preview_path=preview_path,
+            topic_key=topic_cache.normalize_topic(job.topic),
+            upgrade_quality=upgrade_quality(job.owner),
+            user_id=job.user_id
+        )
+        db.add(video_record)
+        db.flush()
+
+        job.video_id = video_record.id
+        job.status = "succeeded"
+        job.stage = "done"
+
+        upload.result()  # Raises if the upload failed after its retries
+        # Signed URLs need the objects to exist, so only now that the video
+        # (and, above, the thumbnails) are in storage
+        done_payload = {"result": {
+            "title": video_record.title,
+            "scene_plan": video_record.scene_plan,
+            "video_url": storage.video_url(file_key),
+            "manim_code": video_record.manim_code,
+            "quality": video_record.quality,
+            "thumbnail_url": storage.video_url(thumbnail_path) if thumbnail_path else None
+        }}
+        job.finished_at = datetime.utcnow()
+        # Everything up to the commit; the commit itself is only in /metrics
+        video_record.timings = timings.record()
+        with metrics.span("db_commit"):
+            db.commit()
+        metrics.job_finished("succeeded", timings)
+        publish(job_id, "done", done_payload)
+        print(f" Job {job_id} finished: {file_key}")
+
+        if video_record.upgrade_quality:
+            _upgrade_executor.submit(_upgrade_video, video_record.id)
+        elif HLS_PUBLISH:
+            # The user already has the MP4; stream variants follow in the
+            # background, which takes over the workspace holding the file
+            _upgrade_executor.submit(_publish_hls, video_record.id, video_path, result.pop("workspace"))
+    except Exception as exc:
+        db.rollback()
+        print(f" Job {job_id} failed: {exc}")
+        _update_job(job_id, status="failed", stage="failed", error=str(exc),
+                    finished_at=datetime.utcnow())
+        metrics.job_finished("failed", metrics.current_timings())
+        publish(job_id, "failed", {"error": str(exc)})
+    finally:
+        if upload is not None:
+            wait([upload])  # Still reading the file when the DB step failed
+        if result and result.get("workspace") is not None:
+            result["workspace"].cleanup()
+        db.close()
+
+
+def _upload_thumbnails(user_id: int, thumbnails: Thumbnails | None) -> tuple:
+    """(poster key, preview key); a video without thumbnails is still a finished video."""
+    keys = []
+    for path in (thumbnails.poster_path, thumbnails.preview_path) if thumbnails else ():
+        if path is None:
+            keys.append(None)
+            continue
+        file_key = f"users/{user_id}/videos/{os.path.basename(path)}"
+        try:
+            storage.upload_asset(file_key, path)
+            keys.append(file_key)
+        except Exception as exc:
+            print(f" Thumbnail upload of {file_key} failed: {exc}")
+            keys.append(None)
+    return tuple(keys) if keys else (None, None)
+
+
+def _publish_hls(video_id: int, video_path: str, workspace: RenderWorkspace):
+    """Background task: _add_hls on its own session, then clean up the workspace it was handed."""
+    db = SessionLocal()
+    try:
+        video = db.get(Video, video_id)
+        if video is not None:
+            _add_hls(db, video, video_path)
+    finally:
+        db.close()
+        workspace.cleanup()
+
+
+def _add_hls(db, video: Video, video_path: str):
+    """Package the video as HLS, upload it under the video's prefix and point the row at the master playlist."""
+    try:
+        with metrics.span("hls"):
+            out_dir = package_hls(video_path)
+        if out_dir is None:
+            return
+        prefix = f"users/{video.user_id}/videos/{os.path.basename(out_dir)}"
+        files = [
+            (f"{prefix}/{os.path.relpath(os.path.join(root, name), out_dir).replace(os.sep, '/')}",
+             os.path.join(root, name))
+            for root, _, names in os.walk(out_dir) for name in names
+        ]
+        # Segments are small and independent; upload them side by side
+        list(_upload_executor.map(lambda item: storage.upload_asset(*item), files))
+        video.hls_path = f"{prefix}/{HLS_MASTER_PLAYLIST}"
+        db.commit()
+        print(f" Video {video.id} packaged as HLS: {video.hls_path}")
+    except Exception as exc:
+        db.rollback()
+        print(f" HLS packaging of video {video.id} failed: {exc}")
+
+
+def _upgrade_claimable(now: datetime):
+    # Upgrades that were started before JOB_STALE_SECONDS ago were
+    # interrupted, like running jobs (see resume_pending_jobs)
+    return or_(Video.upgrade_started_at.is_(None),
+               Video.upgrade_started_at <= now - timedelta(seconds=JOB_STALE_SECONDS))
+
+
+def _claim_upgrade(db, video_id: int) -> bool:
+    now = datetime.utcnow()
+    claimed = (
+        db.query(Video)
+        .filter(Video.id == video_id, Video.upgrade_quality.isnot(None), _upgrade_claimable(now))
+        .update({"upgrade_started_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _upgrade_video(video_id: int):
+    """
+    Re-render a finished video's final code at its pending `upgrade_quality`
+    and point the Video row at the new file. The render waits for a slot at
+    background priority, behind every user's preview. Pending upgrades are
+    stored on the row, so one interrupted by a restart is resumed.
+    """
+    db = SessionLocal()
+    workspace = None
+    try:
+        if not _claim_upgrade(db, video_id):
+            return
+        video = db.get(Video, video_id)
+        quality_flag = video.upgrade_quality
+        workspace = RenderWorkspace(f"video-{video_id}-{quality_name(quality_flag)}")
+
+        result = execute_manim_code(video.manim_code, topic_cache.scene_class_name(video), workspace,
+                                    priority=PRIORITY_BACKGROUND, quality_flag=quality_flag)
+        if result.error or not result.video_path:
+            print(f" Upgrade of video {video_id} to {quality_name(quality_flag)} failed: {result.error}")
+            _finish_upgrade(db, video)
+            return
+
+        if VIDEO_FASTSTART:
+            faststart(result.video_path)
+        file_key = f"users/{video.user_id}/videos/{os.path.basename(result.video_path)}"
+        storage.upload_video(file_key, result.video_path)
+        # Thumbnails cut from the sharper render; the old ones stay if that fails
+        thumbnail_path, preview_path = _upload_thumbnails(video.user_id, make_thumbnails(result.video_path))
+        # The preview file stays: topic cache reuses may still point at it
+        video.video_path = file_key
+        video.quality = quality_name(quality_flag)
+        video.size_bytes = os.path.getsize(result.video_path)
+        video.thumbnail_path = thumbnail_path or video.thumbnail_path
+        video.preview_path = preview_path or video.preview_path
+        _finish_upgrade(db, video)
+        print(f" Video {video_id} upgraded to {video.quality}: {file_key}")
+        if HLS_PUBLISH:
+            _add_hls(db, video, result.video_path)
+    except Exception as exc:
+        db.rollback()
+        print(f" Upgrade of video {video_id} failed: {exc}")
+    finally:
+        if workspace is not None:
+            workspace.cleanup()
+        db.close()
+
+
+def _finish_upgrade(db, video: Video):
+    # Also after a failed render: the same code would fail again on resume
+    video.upgrade_quality = None
+    video.upgrade_started_at = None
+    db.commit()
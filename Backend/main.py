@@ -1,6 +1,21 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from auth.routes import router as auth_router
+import jobs
+import metrics
+from database import pool_stats
+import storage
+from Model.render import render_scheduler, sweep_stale_workspaces
+from Model.render_cache import render_cache
+from Model.llm_cache import llm_cache
+from Model.langchain import warm_up
+from Model.render_worker import RENDER_BACKEND, warm_pool
+import hmac
+import os
+
+# Bearer token for /stats and /metrics; without it they are not served at all
+MONITORING_TOKEN = os.getenv("MONITORING_TOKEN")
 
 app = FastAPI()
 
@@ -14,4 +29,51 @@ app.add_middleware(
 )
 
 # Include authentication router
-app.include_router(auth_router, prefix="/auth")
\ No newline at end of file
+app.include_router(auth_router, prefix="/auth")
+
+# Serve uploads ourselves when storage is the local stand-in
+if storage.STORAGE_BACKEND == "local":
+    os.makedirs(storage.STORAGE_LOCAL_DIR, exist_ok=True)
+    app.mount("/storage", StaticFiles(directory=storage.STORAGE_LOCAL_DIR), name="storage")
+
+
+def require_monitoring_token(authorization: str | None = Header(None)):
+    if not MONITORING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {MONITORING_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid monitoring token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/stats", dependencies=[Depends(require_monitoring_token)])
+def stats():
+    """Cache hit rates and render capacity, for monitoring."""
+    return {
+        "signed_urls": storage.signed_url_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "render_cache": render_cache.stats(),
+        "render_scheduler": render_scheduler.stats(),
+        "db_pool": pool_stats(),
+    }
+
+
+@app.get("/metrics", dependencies=[Depends(require_monitoring_token)])
+def prometheus_metrics():
+    """Stage latencies, token counts, correction attempts and queue/render gauges for Prometheus."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.on_event("startup")
+def on_startup():
+    warm_up()
+    sweep_stale_workspaces()
+    if RENDER_BACKEND == "warm":
+        warm_pool.start()
+    jobs.resume_pending_jobs()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    jobs.shutdown()
+    warm_pool.shutdown()
@@ -0,0 +1,122 @@
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from typing import Callable
+import threading
+import time
+
+from Model.render import render_scheduler
+
+# Stages take from milliseconds (cache hits) to many minutes (renders)
+_SECONDS_BUCKETS = (0.05, 0.25, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+
+STAGE_SECONDS = Histogram(
+    "eduvid_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=_SECONDS_BUCKETS)
+JOB_SECONDS = Histogram(
+    "eduvid_job_seconds", "Generation job time from claim to finish", ["status"], buckets=_SECONDS_BUCKETS)
+JOBS = Counter("eduvid_jobs_total", "Finished generation jobs", ["status"])
+LLM_TOKENS = Counter("eduvid_llm_tokens_total", "LLM tokens used (cache hits use none)", ["stage", "kind"])
+# status: "rendered", or "failed" when the code never ran (attempts used up or no correction came back)
+CORRECTION_ATTEMPTS = Histogram(
+    "eduvid_correction_attempts", "Correction rounds per generation, by outcome", ["status"],
+    buckets=(0, 1, 2, 3, 4, 5))
+
+PENDING_JOBS = Gauge("eduvid_pending_jobs", "Generation jobs queued or running in this process")
+RENDERS_RUNNING = Gauge("eduvid_renders_running", "Renders holding a render slot")
+RENDERS_QUEUED = Gauge("eduvid_renders_queued", "Renders waiting for a render slot")
+RENDER_SLOTS = Gauge("eduvid_render_slots", "Concurrent render slots")
+RENDERS_RUNNING.set_function(lambda: render_scheduler.stats()["running"])
+RENDERS_QUEUED.set_function(lambda: render_scheduler.stats()["queued"])
+RENDER_SLOTS.set(render_scheduler.slots)
+
+
+class JobTimings:
+    """
+    Timing spans and LLM token counts of one generation job, in the order
+    they happened; stored with the job's Video as its `timings`.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.tokens = {}
+        self._lock = threading.Lock()  # Uploads report from other threads
+
+    def add(self, stage: str, seconds: float, start: float | None = None, **labels):
+        span = {"stage": stage, "seconds": round(seconds, 3), **labels}
+        if start is not None:
+            span["start"] = round(start - self.started, 3)
+        with self._lock:
+            self.spans.append(span)
+
+    def add_tokens(self, stage: str, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            counts = self.tokens.setdefault(stage, {"prompt": 0, "completion": 0})
+            counts["prompt"] += prompt_tokens
+            counts["completion"] += completion_tokens
+
+    def record(self) -> dict:
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 3),
+                "spans": list(self.spans),
+                "tokens": {stage: dict(counts) for stage, counts in self.tokens.items()},
+            }
+
+
+_current = threading.local()
+
+
+@contextmanager
+def job_timings(timings: JobTimings):
+    """Make `timings` the current job's record for spans and tokens reported on this thread."""
+    previous = getattr(_current, "timings", None)
+    _current.timings = timings
+    try:
+        yield timings
+    finally:
+        _current.timings = previous
+
+
+def current_timings() -> JobTimings | None:
+    return getattr(_current, "timings", None)
+
+
+def observe(stage: str, seconds: float, start: float | None = None,
+            timings: JobTimings | None = None, **labels):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = timings or current_timings()
+    if timings is not None:
+        timings.add(stage, seconds, start, **labels)
+
+
+@contextmanager
+def span(stage: str, timings: JobTimings | None = None, **labels):
+    """Time the block as `stage`: always in Prometheus, and in the job's record if there is one."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, start, timings, **labels)
+
+
+def record_tokens(stage: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.labels(stage, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(stage, "completion").inc(completion_tokens)
+    timings = current_timings()
+    if timings is not None:
+        timings.add_tokens(stage, prompt_tokens, completion_tokens)
+
+
+def job_finished(status: str, timings: JobTimings | None):
+    JOBS.labels(status).inc()
+    if timings is not None:
+        JOB_SECONDS.labels(status).observe(time.perf_counter() - timings.started)
+
+
+def track_pending_jobs(count: Callable[[], int]):
+    PENDING_JOBS.set_function(count)
+
+
+def render() -> tuple:
+    """(body, content type) of the Prometheus text exposition."""
+    return generate_latest(), CONTENT_TYPE_LATEST
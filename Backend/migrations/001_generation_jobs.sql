@@ -0,0 +1,17 @@
+-- Background generation jobs (see jobs.py)
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id VARCHAR PRIMARY KEY,
+    topic VARCHAR NOT NULL,
+    status VARCHAR NOT NULL DEFAULT 'queued',
+    stage VARCHAR DEFAULT 'queued',
+    error TEXT,
+    created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc'),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    user_id INTEGER REFERENCES users (id),
+    video_id INTEGER REFERENCES videos (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_generation_jobs_id ON generation_jobs (id);
+CREATE INDEX IF NOT EXISTS ix_generation_jobs_status ON generation_jobs (status);
+CREATE INDEX IF NOT EXISTS ix_generation_jobs_user_id ON generation_jobs (user_id);
@@ -0,0 +1,12 @@
+-- Topic-level result cache (see topic_cache.py)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS topic_key VARCHAR;
+CREATE INDEX IF NOT EXISTS ix_videos_topic_key ON videos (topic_key);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS topic_cache_opt_out BOOLEAN NOT NULL DEFAULT FALSE;
+
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS reused_video_id INTEGER REFERENCES videos (id);
+
+-- Backfill with the same normalization as topic_cache.normalize_topic
+UPDATE videos
+SET topic_key = trim(regexp_replace(regexp_replace(lower(title), '[^\w\s]', '', 'g'), '\s+', ' ', 'g'))
+WHERE topic_key IS NULL;
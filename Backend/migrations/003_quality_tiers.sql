@@ -0,0 +1,5 @@
+-- Preview-first rendering with background quality upgrades (see quality.py)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS quality VARCHAR;
+UPDATE videos SET quality = '480p15' WHERE quality IS NULL;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS plan VARCHAR NOT NULL DEFAULT 'free';
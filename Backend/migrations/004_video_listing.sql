@@ -0,0 +1,7 @@
+-- Dashboard listing: one user's videos, newest first, without scanning
+CREATE INDEX IF NOT EXISTS ix_videos_user_id_created_at ON videos (user_id, created_at DESC);
+
+-- Shown in the list without touching the file
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS duration_seconds DOUBLE PRECISION;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS size_bytes BIGINT;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnail_path VARCHAR;
@@ -0,0 +1,2 @@
+-- Animated preview shown on dashboard cards (the poster is videos.thumbnail_path)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS preview_path VARCHAR;
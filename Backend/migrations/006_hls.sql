@@ -0,0 +1,2 @@
+-- Master playlist of the optional HLS packaging (HLS_ENABLED)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS hls_path VARCHAR;
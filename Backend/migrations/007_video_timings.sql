@@ -0,0 +1,2 @@
+-- Stage timings and token counts of the generating job (metrics.JobTimings.record)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS timings JSON;
@@ -0,0 +1,2 @@
+-- Scene class rendered from videos.manim_code, so plan reuse doesn't have to guess it from the code
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS scene_class_name VARCHAR;
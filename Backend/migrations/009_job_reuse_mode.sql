@@ -0,0 +1,2 @@
+-- Reuse mode a job was requested with; "none" also skips the LLM response cache
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS reuse VARCHAR;
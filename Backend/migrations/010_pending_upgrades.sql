@@ -0,0 +1,4 @@
+-- Background quality upgrades still to be done, so they survive a restart
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS upgrade_quality VARCHAR;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS upgrade_started_at TIMESTAMP;
+CREATE INDEX IF NOT EXISTS ix_videos_pending_upgrade ON videos (id) WHERE upgrade_quality IS NOT NULL;
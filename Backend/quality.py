@@ -0,0 +1,33 @@
+from dotenv import load_dotenv
+import os
+
+from Model.render import QUALITY_DIRS
+
+load_dotenv()
+
+# Manim quality flags from lowest to highest
+QUALITY_ORDER = list(QUALITY_DIRS)
+
+# Rendered first and returned to the user as soon as it exists
+PREVIEW_QUALITY = os.getenv("PREVIEW_QUALITY", "-ql")
+# Re-rendered afterwards on idle render capacity (capped by the user's plan)
+UPGRADE_QUALITY = os.getenv("UPGRADE_QUALITY", "-qh")
+# plan -> highest quality its videos are rendered at, e.g. "free:-qm,pro:-qh"
+PLAN_MAX_QUALITY = dict(
+    item.strip().split(":", 1) for item in os.getenv("PLAN_MAX_QUALITY", "free:-qm,pro:-qh").split(",") if item.strip()
+)
+DEFAULT_PLAN = "free"
+
+
+def quality_name(quality_flag: str) -> str:
+    """What is stored on the Video row, e.g. "1080p60"."""
+    return QUALITY_DIRS[quality_flag]
+
+
+def upgrade_quality(user) -> str | None:
+    """Quality flag of the background re-render for this user's videos, or None if the preview is final."""
+    limit = PLAN_MAX_QUALITY.get(user.plan or DEFAULT_PLAN, PREVIEW_QUALITY)
+    target = min(UPGRADE_QUALITY, limit, key=QUALITY_ORDER.index)
+    if QUALITY_ORDER.index(target) <= QUALITY_ORDER.index(PREVIEW_QUALITY):
+        return None
+    return target
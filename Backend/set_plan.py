@@ -0,0 +1,41 @@
+"""
+Set a user's plan, which caps the quality their videos are upgraded to (PLAN_MAX_QUALITY).
+
+    cd Backend
+    python -m set_plan ada@example.com pro
+"""
+import argparse
+
+from auth.dbmodel import User
+from database import SessionLocal
+from quality import PLAN_MAX_QUALITY, quality_name
+
+
+def set_plan(db, email: str, plan: str) -> User:
+    if plan not in PLAN_MAX_QUALITY:
+        raise ValueError(f"Unknown plan {plan!r}, expected one of: {', '.join(PLAN_MAX_QUALITY)}")
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        raise LookupError(f"No user with email {email!r}")
+    user.plan = plan
+    db.commit()
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("email")
+    parser.add_argument("plan", choices=sorted(PLAN_MAX_QUALITY))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        set_plan(db, args.email, args.plan)
+    finally:
+        db.close()
+    # Running servers pick the change up once their user cache entry expires
+    print(f"{args.email} is now on the {args.plan} plan (videos up to {quality_name(PLAN_MAX_QUALITY[args.plan])})")
+
+
+if __name__ == "__main__":
+    main()
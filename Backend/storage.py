@@ -0,0 +1,280 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from typing import Callable, Dict, List
+from urllib.parse import quote
+import base64
+import os
+import shutil
+import threading
+import time
+
+load_dotenv()
+
+VIDEO_BUCKET = "videos"
+
+# "supabase": Supabase Storage, "local": a directory on disk (development/tests)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "storage")
+STORAGE_LOCAL_BASE_URL = os.getenv("STORAGE_LOCAL_BASE_URL", "http://localhost:8000/storage")
+
+# Files at least this big go through the resumable (TUS) endpoint in chunks.
+# Supabase requires 6 MB chunks for resumable uploads.
+UPLOAD_RESUMABLE_MIN_MB = int(os.getenv("UPLOAD_RESUMABLE_MIN_MB", "6"))
+UPLOAD_CHUNK_BYTES = 6 * 1024 * 1024
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
+
+# "signed": expiring signed URLs (cached, see SignedURLCache), "public": public bucket URLs
+VIDEO_URL_MODE = os.getenv("VIDEO_URL_MODE", "signed")
+SIGNED_URL_EXPIRES_SECONDS = int(os.getenv("SIGNED_URL_EXPIRES_SECONDS", "3600"))
+# Cached URLs with less than this left are signed again. Half the lifetime
+# by default, so every URL handed out stays valid for at least that long
+SIGNED_URL_REFRESH_MARGIN_SECONDS = int(os.getenv("SIGNED_URL_REFRESH_MARGIN_SECONDS")
+                                        or SIGNED_URL_EXPIRES_SECONDS // 2)
+SIGNED_URL_CACHE_ENTRIES = int(os.getenv("SIGNED_URL_CACHE_ENTRIES", "10000"))
+
+
+def _with_retries(action: Callable, what: str):
+    for attempt in range(UPLOAD_RETRIES + 1):
+        try:
+            return action()
+        except Exception as exc:
+            if attempt >= UPLOAD_RETRIES:
+                raise
+            delay = 2 ** attempt
+            print(f" {what} failed ({exc}), retrying in {delay}s")
+            time.sleep(delay)
+
+
+class SupabaseStorage:
+    def __init__(self):
+        from supabase import create_client
+
+        self.url = os.getenv("SUPABASE_URL")
+        self.key = os.getenv("SUPABASE_KEY")
+        self.client = create_client(self.url, self.key)
+        # Public object URLs are plain string formatting; no need to go through the client per file
+        self.public_base = f"{self.url.rstrip('/')}/storage/v1/object/public"
+
+    def upload_file(self, bucket: str, file_key: str, local_path: str, content_type: str,
+                    on_progress: Callable[[float], None] | None = None):
+        if os.path.getsize(local_path) >= UPLOAD_RESUMABLE_MIN_MB * 1024 * 1024:
+            self._upload_resumable(bucket, file_key, local_path, content_type, on_progress)
+            return
+        _with_retries(lambda: self.client.storage.from_(bucket).upload(
+            file_key, local_path, {"content-type": content_type, "upsert": "true"}), f"Upload of {file_key}")
+        if on_progress is not None:
+            on_progress(100.0)
+
+    def _upload_resumable(self, bucket: str, file_key: str, local_path: str, content_type: str,
+                          on_progress: Callable[[float], None] | None):
+        """
+        TUS upload in UPLOAD_CHUNK_BYTES chunks. A failed chunk is retried from
+        the offset the server reports, so a dropped connection only costs the
+        chunk in flight instead of the whole file.
+        """
+        import httpx
+
+        size = os.path.getsize(local_path)
+        headers = {"authorization": f"Bearer {self.key}", "apikey": self.key, "tus-resumable": "1.0.0"}
+
+        def metadata(**fields):
+            return ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in fields.items())
+
+        with httpx.Client(timeout=60) as http, open(local_path, "rb") as f:
+            def create():
+                response = http.post(
+                    f"{self.url}/storage/v1/upload/resumable",
+                    headers={**headers, "upload-length": str(size), "x-upsert": "true",
+                             "upload-metadata": metadata(bucketName=bucket, objectName=file_key,
+                                                         contentType=content_type)})
+                response.raise_for_status()
+                return response.headers["location"]
+
+            upload_url = _with_retries(create, f"Creating upload of {file_key}")
+            state = {"offset": 0, "resync": False}
+
+            def send_chunk():
+                if state["resync"]:
+                    # Ask the server how much it got before resending
+                    head = http.head(upload_url, headers=headers)
+                    head.raise_for_status()
+                    state["offset"] = int(head.headers["upload-offset"])
+                    state["resync"] = False
+                f.seek(state["offset"])
+                try:
+                    response = http.patch(
+                        upload_url, content=f.read(UPLOAD_CHUNK_BYTES),
+                        headers={**headers, "upload-offset": str(state["offset"]),
+                                 "content-type": "application/offset+octet-stream"})
+                    response.raise_for_status()
+                except Exception:
+                    state["resync"] = True
+                    raise
+                state["offset"] = int(response.headers["upload-offset"])
+
+            while state["offset"] < size:
+                _with_retries(send_chunk, f"Upload of {file_key} at byte {state['offset']}")
+                if on_progress is not None:
+                    on_progress(state["offset"] / size * 100)
+
+    def download_file(self, bucket: str, file_key: str) -> bytes:
+        return self.client.storage.from_(bucket).download(file_key)
+
+    def public_url(self, bucket: str, file_key: str) -> str:
+        return f"{self.public_base}/{bucket}/{quote(file_key)}"
+
+    def signed_urls(self, bucket: str, file_keys: List[str], expires_in: int) -> Dict[str, str]:
+        """Sign many objects with one API call."""
+        signed = self.client.storage.from_(bucket).create_signed_urls(file_keys, expires_in)
+        urls = {}
+        for item in signed:
+            url = item.get("signedURL") or item.get("signedUrl")
+            if url and item.get("path"):
+                urls[item["path"]] = url
+        return urls
+
+
+class LocalStorage:
+    """Buckets are directories under `root`; for development and tests without Supabase."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, bucket: str, file_key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, bucket, file_key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"Invalid storage key: {file_key}")
+        return path
+
+    def upload_file(self, bucket: str, file_key: str, local_path: str, content_type: str,
+                    on_progress: Callable[[float], None] | None = None):
+        dest = self._path(bucket, file_key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.part"
+        shutil.copyfile(local_path, tmp)
+        os.replace(tmp, dest)
+        if on_progress is not None:
+            on_progress(100.0)
+
+    def download_file(self, bucket: str, file_key: str) -> bytes:
+        with open(self._path(bucket, file_key), "rb") as f:
+            return f.read()
+
+    def public_url(self, bucket: str, file_key: str) -> str:
+        return f"{self.base_url}/{bucket}/{quote(file_key)}"
+
+    def signed_urls(self, bucket: str, file_keys: List[str], expires_in: int) -> Dict[str, str]:
+        # Nothing to sign locally; the expiry only exercises the cache
+        return {key: f"{self.public_url(bucket, key)}?expires={int(time.time()) + expires_in}" for key in file_keys}
+
+
+class SignedURLCache:
+    """
+    Signed URLs by object key with their expiry. A URL is reused until it is
+    within `refresh_margin` seconds of expiring; all misses of a lookup are
+    signed together in one backend call.
+    """
+
+    def __init__(self, bucket: str, expires_in: int, refresh_margin: int, max_entries: int):
+        self.bucket = bucket
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.sign_calls = 0
+        self._lock = threading.Lock()
+        self._urls = OrderedDict()  # key -> (expires_at, url)
+
+    def get_many(self, file_keys: List[str]) -> Dict[str, str]:
+        now = time.time()
+        urls, missing = {}, []
+        with self._lock:
+            for key in dict.fromkeys(file_keys):
+                entry = self._urls.get(key)
+                if entry is not None and entry[0] - now > self.refresh_margin:
+                    self._urls.move_to_end(key)
+                    urls[key] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    self.misses += 1
+
+        if missing:
+            signed = backend.signed_urls(self.bucket, missing, self.expires_in)
+            expires_at = now + self.expires_in
+            with self._lock:
+                self.sign_calls += 1
+                for key, url in signed.items():
+                    self._urls[key] = (expires_at, url)
+                    self._urls.move_to_end(key)
+                while len(self._urls) > self.max_entries:
+                    self._urls.popitem(last=False)
+            urls.update(signed)
+        return urls
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "sign_calls": self.sign_calls,
+                "entries": len(self._urls),
+            }
+
+
+if STORAGE_BACKEND == "local":
+    backend = LocalStorage(STORAGE_LOCAL_DIR, STORAGE_LOCAL_BASE_URL)
+else:
+    backend = SupabaseStorage()
+
+
+def upload_file(bucket: str, file_key: str, local_path: str, content_type: str,
+                on_progress: Callable[[float], None] | None = None):
+    backend.upload_file(bucket, file_key, local_path, content_type, on_progress)
+
+
+def download_file(bucket: str, file_key: str) -> bytes:
+    return backend.download_file(bucket, file_key)
+
+
+def upload_video(file_key: str, local_path: str, on_progress: Callable[[float], None] | None = None):
+    backend.upload_file(VIDEO_BUCKET, file_key, local_path, "video/mp4", on_progress)
+
+
+ASSET_CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+def upload_asset(file_key: str, local_path: str):
+    """Posters, previews and HLS files live next to their video, so they share its URL signing."""
+    content_type = ASSET_CONTENT_TYPES.get(os.path.splitext(local_path)[1].lower(), "application/octet-stream")
+    backend.upload_file(VIDEO_BUCKET, file_key, local_path, content_type)
+
+
+def public_url(file_key: str) -> str:
+    return backend.public_url(VIDEO_BUCKET, file_key)
+
+
+signed_url_cache = SignedURLCache(VIDEO_BUCKET, SIGNED_URL_EXPIRES_SECONDS,
+                                  SIGNED_URL_REFRESH_MARGIN_SECONDS, SIGNED_URL_CACHE_ENTRIES)
+
+
+def video_urls(file_keys: List[str]) -> Dict[str, str]:
+    """URLs the client can play, by key, for many videos at once."""
+    if VIDEO_URL_MODE == "public":
+        return {key: public_url(key) for key in file_keys}
+    return signed_url_cache.get_many(file_keys)
+
+
+def video_url(file_key: str) -> str | None:
+    return video_urls([file_key]).get(file_key)
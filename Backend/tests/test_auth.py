@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from auth import authmiddleware
+from auth.authmiddleware import UserCache, user_from_token_async
+from auth.dbmodel import User
+from auth.jwtToken import create_access_token
+
+
+class _AsyncSession:
+    """The parts of AsyncSession the token lookup uses."""
+
+    def __init__(self, users):
+        self.users = {user.id: user for user in users}
+        self.queries = 0
+
+    async def get(self, model, user_id):
+        self.queries += 1
+        return self.users.get(user_id)
+
+    async def scalar(self, statement):
+        self.queries += 1
+        username = statement.whereclause.right.value
+        return next((u for u in self.users.values() if u.username == username), None)
+
+    def expunge(self, user):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache(monkeypatch):
+    monkeypatch.setattr(authmiddleware, "user_cache", UserCache(ttl_seconds=60, max_entries=10))
+
+
+def _lookup(token, db):
+    return asyncio.run(user_from_token_async(token, db))
+
+
+def test_async_lookup_by_user_id_is_cached():
+    db = _AsyncSession([User(id=1, username="ada")])
+    token = create_access_token({"sub": "ada", "uid": 1})
+
+    assert _lookup(token, db).username == "ada"
+    assert _lookup(token, db).username == "ada"
+    assert db.queries == 1
+
+
+def test_async_lookup_of_tokens_without_a_user_id():
+    db = _AsyncSession([User(id=1, username="ada")])
+    assert _lookup(create_access_token({"sub": "ada"}), db).id == 1
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-jwt",
+    create_access_token({"uid": 2}),
+    create_access_token({"role": "x"}),
+])
+def test_async_lookup_rejects_bad_tokens_and_unknown_users(token):
+    with pytest.raises(HTTPException) as raised:
+        _lookup(token, _AsyncSession([User(id=1, username="ada")]))
+    assert raised.value.status_code == 401
+
+
+def test_user_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(authmiddleware.time, "monotonic", lambda: now[0])
+    cache = UserCache(ttl_seconds=60, max_entries=10)
+    cache.put(("uid", 1), User(id=1, username="ada"))
+
+    now[0] += 59
+    assert cache.get(("uid", 1)).username == "ada"
+    now[0] += 2
+    assert cache.get(("uid", 1)) is None
+
+
+def test_user_cache_drops_the_least_recently_used():
+    cache = UserCache(ttl_seconds=60, max_entries=2)
+    cache.put(("uid", 1), User(id=1))
+    cache.put(("uid", 2), User(id=2))
+    cache.get(("uid", 1))
+    cache.put(("uid", 3), User(id=3))
+
+    assert cache.get(("uid", 2)) is None
+    assert cache.get(("uid", 1)).id == 1 and cache.get(("uid", 3)).id == 3
+
+
+def test_user_cache_invalidates_every_subject_of_a_user():
+    cache = UserCache(ttl_seconds=60, max_entries=10)
+    ada = User(id=1, username="ada")
+    cache.put(("uid", 1), ada)
+    cache.put(("sub", "ada"), ada)
+    cache.put(("uid", 2), User(id=2))
+
+    cache.invalidate(1)
+
+    assert cache.get(("uid", 1)) is None and cache.get(("sub", "ada")) is None
+    assert cache.get(("uid", 2)).id == 2
+
+
+def test_sync_lookup_caches_a_detached_user(db):
+    db.add(User(id=1, username="ada", email="ada@example.com", hashed_password="x"))
+    db.commit()
+    token = create_access_token({"sub": "ada", "uid": 1})
+
+    user = authmiddleware.get_current_user(token, db)
+    db.query(User).delete()
+    db.commit()
+
+    assert authmiddleware.get_current_user(token, db) is user
+    assert user.username == "ada"
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from Model import langchain as model
+
+
+def test_get_chain_builds_each_chain_once():
+    chain = model.get_chain("plan")
+    assert model.get_chain("plan") is chain
+    assert model.get_chain("plan", streaming=True) is not chain
+    assert model.get_chain("plan", streaming=True) is model.get_chain("plan", streaming=True)
+
+
+def test_concurrent_first_calls_share_one_chain(monkeypatch):
+    monkeypatch.setattr(model, "_chains", {})
+    monkeypatch.setattr(model, "_models", {})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        chains = list(pool.map(lambda _: model.get_chain("code"), range(16)))
+
+    assert all(chain is chains[0] for chain in chains)
+    assert len(model._models) == 1
+
+
+def test_warm_up_builds_every_chain(monkeypatch):
+    monkeypatch.setattr(model, "_chains", {})
+    model.warm_up()
+    assert set(model._chains) == ({(stage, False) for stage in model._STAGE_CHAINS}
+                                  | {(stage, True) for stage in model._STREAM_CHAINS})
@@ -0,0 +1,30 @@
+import base64
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from auth.routes import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trips():
+    created_at = datetime(2026, 3, 1, 12, 30, 45, 123456)
+    cursor = _encode_cursor(created_at, 42)
+
+    assert _decode_cursor(cursor) == (created_at, 42)
+    # Safe to put in a query string as is
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"2026-03-01T12:30:45").decode(),
+    base64.urlsafe_b64encode(b"yesterday|42").decode(),
+    base64.urlsafe_b64encode(b"2026-03-01T12:30:45|forty-two").decode(),
+    base64.urlsafe_b64encode(b"2026-03-01T12:30:45|4|2").decode(),
+])
+def test_malformed_cursors_are_a_client_error(cursor):
+    with pytest.raises(HTTPException) as raised:
+        _decode_cursor(cursor)
+    assert raised.value.status_code == 400
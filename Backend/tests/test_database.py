@@ -0,0 +1,28 @@
+import pytest
+
+from database import _async_url
+
+
+@pytest.mark.parametrize("url", [
+    "postgresql://u:p@db:5432/app",
+    "postgres://u:p@db:5432/app",
+    "postgresql+psycopg2://u:p@db:5432/app",
+])
+def test_postgres_urls_are_rewritten_to_asyncpg(url):
+    async_url, connect_args = _async_url(url)
+    assert async_url.drivername == "postgresql+asyncpg"
+    assert (async_url.host, async_url.port, async_url.database) == ("db", 5432, "app")
+    assert connect_args == {}
+
+
+def test_sslmode_becomes_a_connect_argument():
+    async_url, connect_args = _async_url("postgresql://u:p@db/app?sslmode=require&application_name=api")
+    assert dict(async_url.query) == {"application_name": "api"}
+    assert connect_args == {"ssl": "require"}
+    assert _async_url("postgresql://u:p@db/app?sslmode=disable")[1] == {}
+
+
+@pytest.mark.parametrize("url", ["sqlite:///app.db", "mysql://u:p@db/app"])
+def test_other_databases_are_rejected(url):
+    with pytest.raises(ValueError, match="PostgreSQL"):
+        _async_url(url)
@@ -0,0 +1,213 @@
+from datetime import datetime, timedelta
+import os
+import time
+
+import pytest
+
+from auth.dbmodel import GenerationJob, User, Video
+from Model.langchain import ManimExecutionResponse
+from Model.media import Thumbnails
+import jobs
+
+
+@pytest.fixture
+def job_db(db, monkeypatch):
+    db.add(User(id=1, username="ada", email="ada@example.com", hashed_password="x"))
+    db.commit()
+    monkeypatch.setattr(jobs, "SessionLocal", lambda: db)
+    monkeypatch.setattr(db, "close", lambda: None)
+    submitted = []
+    monkeypatch.setattr(jobs, "_submit", submitted.append)
+    return db, submitted
+
+
+def _job(db, job_id, status, started_minutes_ago=None):
+    started_at = datetime.utcnow() - timedelta(minutes=started_minutes_ago) if started_minutes_ago is not None else None
+    db.add(GenerationJob(id=job_id, topic="t", user_id=1, status=status, stage=status, started_at=started_at))
+    db.commit()
+
+
+def test_resume_requeues_queued_and_fails_interrupted_jobs(job_db):
+    db, submitted = job_db
+    _job(db, "queued-1", "queued")
+    _job(db, "running-1", "running", started_minutes_ago=5)
+    _job(db, "done-1", "succeeded", started_minutes_ago=5)
+
+    jobs.resume_pending_jobs()
+
+    assert submitted == ["queued-1"]
+    interrupted = db.get(GenerationJob, "running-1")
+    db.refresh(interrupted)
+    assert interrupted.status == "failed"
+    assert interrupted.stage == "failed"
+    assert interrupted.error == jobs.INTERRUPTED_JOB_ERROR
+    assert interrupted.finished_at is not None
+    assert db.get(GenerationJob, "done-1").status == "succeeded"
+
+
+def test_resume_leaves_recent_running_jobs_to_other_processes(job_db, monkeypatch):
+    db, _ = job_db
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 3600)
+    _job(db, "recent", "running", started_minutes_ago=5)
+    _job(db, "stale", "running", started_minutes_ago=120)
+
+    jobs.resume_pending_jobs()
+
+    db.expire_all()
+    assert db.get(GenerationJob, "recent").status == "running"
+    assert db.get(GenerationJob, "stale").status == "failed"
+
+
+
+def _pending_upgrade(db, video_id, started_minutes_ago=None):
+    started_at = datetime.utcnow() - timedelta(minutes=started_minutes_ago) if started_minutes_ago is not None else None
+    db.add(Video(id=video_id, title="t", user_id=1, video_path=f"users/1/videos/{video_id}.mp4", quality="480p15",
+                 manim_code="code", scene_class_name="Demo", upgrade_quality="-qh", upgrade_started_at=started_at,
+                 thumbnail_path=f"users/1/videos/{video_id}.jpg", preview_path=f"users/1/videos/{video_id}.webp"))
+    db.commit()
+
+
+class _Executor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+def test_resume_picks_up_pending_upgrades(job_db, monkeypatch):
+    db, _ = job_db
+    executor = _Executor()
+    monkeypatch.setattr(jobs, "_upgrade_executor", executor)
+    monkeypatch.setattr(jobs, "JOB_STALE_SECONDS", 3600)
+    _pending_upgrade(db, 1)
+    _pending_upgrade(db, 2, started_minutes_ago=120)
+    _pending_upgrade(db, 3, started_minutes_ago=5)  # Another process is on it
+
+    jobs.resume_pending_jobs()
+
+    assert sorted(args for _, args in executor.submitted) == [(1,), (2,)]
+
+
+def test_upgrade_replaces_the_video_and_clears_the_pending_upgrade(job_db, monkeypatch, tmp_path):
+    db, _ = job_db
+    _pending_upgrade(db, 1)
+    rendered = tmp_path / "Demo-hq.mp4"
+    rendered.write_bytes(b"mp4" * 10)
+    renders, uploads = [], []
+
+    def fake_render(code, scene_class_name, workspace, priority, quality_flag):
+        renders.append((scene_class_name, priority, quality_flag))
+        return ManimExecutionResponse(output="", video_path=str(rendered))
+
+    monkeypatch.setattr(jobs, "execute_manim_code", fake_render)
+    monkeypatch.setattr(jobs, "VIDEO_FASTSTART", False)
+    monkeypatch.setattr(jobs, "HLS_PUBLISH", False)
+    monkeypatch.setattr(jobs.storage, "upload_video", lambda key, path: uploads.append(key))
+    monkeypatch.setattr(jobs, "make_thumbnails", lambda path: Thumbnails(str(tmp_path / "Demo-hq.jpg"), None))
+    monkeypatch.setattr(jobs.storage, "upload_asset", lambda key, path: uploads.append(key))
+
+    jobs._upgrade_video(1)
+    jobs._upgrade_video(1)  # Already done: nothing to claim
+
+    video = db.get(Video, 1)
+    db.refresh(video)
+    assert renders == [("Demo", jobs.PRIORITY_BACKGROUND, "-qh")]
+    assert uploads == ["users/1/videos/Demo-hq.mp4", "users/1/videos/Demo-hq.jpg"]
+    assert (video.video_path, video.quality, video.size_bytes) == ("users/1/videos/Demo-hq.mp4", "1080p60", 30)
+    assert video.upgrade_quality is None and video.upgrade_started_at is None
+    # A new poster; the old preview stays since none was made
+    assert (video.thumbnail_path, video.preview_path) == ("users/1/videos/Demo-hq.jpg", "users/1/videos/1.webp")
+
+
+def test_failed_upgrade_is_not_retried(job_db, monkeypatch):
+    db, _ = job_db
+    _pending_upgrade(db, 1)
+    monkeypatch.setattr(jobs, "execute_manim_code",
+                        lambda *args, **kwargs: ManimExecutionResponse(output="", error="boom"))
+
+    jobs._upgrade_video(1)
+
+    video = db.get(Video, 1)
+    db.refresh(video)
+    assert video.quality == "480p15" and video.upgrade_quality is None
+
+
+def test_event_log_coalesces_progress_and_keeps_deltas():
+    log = jobs._EventLog()
+    log.append("planning", {"plan_delta": "a"})
+    log.append("planning", {"plan_delta": "b"})
+    log.append("rendering", {"attempt": 1})
+    for percent in (10, 50, 90):
+        log.append("rendering", {"attempt": 1, "percent": percent})
+
+    assert [(stage, payload) for _, stage, payload in log.since(0)] == [
+        ("planning", {"plan_delta": "a"}),
+        ("planning", {"plan_delta": "b"}),
+        ("rendering", {"attempt": 1}),
+        ("rendering", {"attempt": 1, "percent": 90}),
+    ]
+    # A subscriber that already saw an older percent gets the newest one
+    assert [payload for _, _, payload in log.since(4)] == [{"attempt": 1, "percent": 90}]
+
+
+def test_event_log_keeps_only_the_newest_events(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_EVENTS_MAX", 3)
+    log = jobs._EventLog()
+    for i in range(5):
+        log.append("generating_code", {"code_delta": str(i)})
+
+    assert [seq for seq, _, _ in log.since(0)] == [2, 3, 4]
+    assert log.since(5) == []
+
+
+def test_hls_runs_in_the_background_and_cleans_up_the_workspace(job_db, monkeypatch, tmp_path):
+    db, _ = job_db
+    _pending_upgrade(db, 1)
+    out_dir = tmp_path / "Demo-hls"
+    (out_dir / "480p").mkdir(parents=True)
+    (out_dir / "master.m3u8").write_text("#EXTM3U")
+    (out_dir / "480p" / "index.m3u8").write_text("#EXTM3U")
+    uploads = []
+    monkeypatch.setattr(jobs, "package_hls", lambda path: str(out_dir))
+    monkeypatch.setattr(jobs.storage, "upload_asset", lambda key, path: uploads.append(key))
+    workspace = jobs.RenderWorkspace("hls-test")
+
+    jobs._publish_hls(1, str(tmp_path / "Demo.mp4"), workspace)
+
+    video = db.get(Video, 1)
+    db.refresh(video)
+    assert video.hls_path == "users/1/videos/Demo-hls/master.m3u8"
+    assert sorted(uploads) == ["users/1/videos/Demo-hls/480p/index.m3u8", "users/1/videos/Demo-hls/master.m3u8"]
+    assert not os.path.exists(workspace.path)
+
+
+def test_done_event_is_built_once_the_video_is_in_storage(job_db, monkeypatch, tmp_path):
+    db, _ = job_db
+    _job(db, "job-1", "queued")
+    video_path = tmp_path / "Demo.mp4"
+    video_path.write_bytes(b"video")
+    uploaded = set()
+
+    def upload_video(key, path, on_progress):
+        time.sleep(0.05)
+        uploaded.add(key)
+
+    # Like signed URLs, there is no URL for an object that isn't stored yet
+    monkeypatch.setattr(jobs.storage, "upload_video", upload_video)
+    monkeypatch.setattr(jobs.storage, "video_url", lambda key: key if key in uploaded else None)
+    monkeypatch.setattr(jobs, "generate_and_execute_with_correction", lambda **kwargs: {
+        "video_path": str(video_path), "plan": "plan", "final_code": "code", "scene_class_name": "Demo",
+        "workspace": jobs.RenderWorkspace("done-test")})
+    monkeypatch.setattr(jobs, "VIDEO_FASTSTART", False)
+    monkeypatch.setattr(jobs, "make_thumbnails", lambda path: None)
+    monkeypatch.setattr(jobs, "video_duration", lambda path: 1.0)
+    monkeypatch.setattr(jobs, "upgrade_quality", lambda user: None)
+    monkeypatch.setattr(jobs, "HLS_PUBLISH", False)
+
+    with jobs.metrics.job_timings(jobs.metrics.JobTimings()):
+        jobs._process_job("job-1")
+
+    _, stage, payload = jobs.events_since("job-1", 0)[-1]
+    assert stage == "done"
+    assert payload["result"]["video_url"] == "users/1/videos/Demo.mp4"
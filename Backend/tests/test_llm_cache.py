@@ -0,0 +1,115 @@
+import threading
+import time
+
+from pydantic import BaseModel
+
+from Model import llm_cache as llm_cache_module
+from Model.llm_cache import LLMCache, cached_invoke, llm_cache_key, remember_response
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def _cache(tmp_path, memory_entries=8, ttl_seconds=0):
+    return LLMCache(str(tmp_path / "llm.sqlite3"), memory_entries, ttl_seconds)
+
+
+def test_key_depends_on_every_part_of_the_request():
+    key = llm_cache_key("m", 0.0, "sys", {"a": 1, "b": 2}, Answer)
+    assert key == llm_cache_key("m", 0.0, "sys", {"b": 2, "a": 1}, Answer)
+    assert key != llm_cache_key("m2", 0.0, "sys", {"a": 1, "b": 2}, Answer)
+    assert key != llm_cache_key("m", 0.5, "sys", {"a": 1, "b": 2}, Answer)
+    assert key != llm_cache_key("m", 0.0, "sys2", {"a": 1, "b": 2}, Answer)
+    assert key != llm_cache_key("m", 0.0, "sys", {"a": 1, "b": 3}, Answer)
+
+
+def test_second_call_is_a_hit_and_survives_a_restart(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    def call():
+        calls.append(1)
+        return Answer(text="hi")
+
+    assert cache.get_or_call("k", Answer, call).text == "hi"
+    assert cache.get_or_call("k", Answer, call).text == "hi"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    reopened = _cache(tmp_path)
+    assert reopened.get_or_call("k", Answer, call).text == "hi"
+    assert len(calls) == 1
+
+
+def test_memory_tier_keeps_only_the_most_recent_entries(tmp_path):
+    cache = _cache(tmp_path, memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_call(key, Answer, lambda key=key: Answer(text=key))
+
+    assert cache.stats()["memory_entries"] == 2
+    assert list(cache._memory) == ["b", "c"]
+    # Evicted from memory, still answered from SQLite
+    assert cache.get_or_call("a", Answer, lambda: Answer(text="fresh")).text == "a"
+
+
+def test_expired_entries_are_fetched_again(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, ttl_seconds=60)
+    cache.get_or_call("k", Answer, lambda: Answer(text="old"))
+
+    now = time.time()
+    monkeypatch.setattr(llm_cache_module.time, "time", lambda: now + 61)
+    assert cache.get_or_call("k", Answer, lambda: Answer(text="new")).text == "new"
+
+
+def test_empty_responses_are_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get_or_call("k", Answer, lambda: None) is None
+    assert cache.get_or_call("k", Answer, lambda: Answer(text="ok")).text == "ok"
+
+
+def test_concurrent_misses_make_one_upstream_call(tmp_path):
+    cache = _cache(tmp_path)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return Answer(text="shared")
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_call("k", Answer, slow_call)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_call("k", Answer, slow_call)))
+    waiter.start()
+    while cache.stats()["coalesced"] == 0:
+        time.sleep(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert len(calls) == 1
+    assert [r.text for r in results] == ["shared", "shared"]
+
+
+def test_store_false_is_only_cached_once_remembered(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.get_or_call("k", Answer, lambda: Answer(text="unchecked"), store=False).text == "unchecked"
+    assert cache.get_or_call("k", Answer, lambda: Answer(text="again"), store=False).text == "again"
+
+    cache.remember("k", Answer(text="works"))
+    assert cache.get_or_call("k", Answer, lambda: Answer(text="unused")).text == "works"
+
+
+def test_cached_invoke_bypass_neither_reads_nor_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "llm_cache", _cache(tmp_path))
+    monkeypatch.setattr(llm_cache_module, "LLM_CACHE_ENABLED", True)
+    request = ("m", 0.0, "sys", {"topic": "x"}, Answer)
+
+    remember_response(*request, Answer(text="cached"))
+    assert cached_invoke(*request, lambda: Answer(text="live"), bypass=True).text == "live"
+    assert cached_invoke(*request, lambda: Answer(text="live")).text == "cached"
@@ -0,0 +1,116 @@
+import struct
+
+import av
+import numpy as np
+import pytest
+from PIL import Image
+
+from Model import media
+
+FPS = 15
+SECONDS = 20
+
+
+@pytest.fixture(scope="module")
+def ramp_video(tmp_path_factory):
+    """H.264 video whose frames get brighter over time, with a keyframe every second."""
+    path = tmp_path_factory.mktemp("media") / "ramp.mp4"
+    frames = FPS * SECONDS
+    with av.open(str(path), "w") as output:
+        stream = output.add_stream("libx264", rate=FPS)
+        stream.width, stream.height, stream.pix_fmt = 320, 240, "yuv420p"
+        stream.codec_context.gop_size = FPS
+        for i in range(frames):
+            image = np.full((240, 320, 3), i * 255 // (frames - 1), dtype=np.uint8)
+            for packet in stream.encode(av.VideoFrame.from_ndarray(image, format="rgb24")):
+                output.mux(packet)
+        for packet in stream.encode():
+            output.mux(packet)
+    return str(path)
+
+
+def _brightness(image):
+    return image.convert("RGB").getpixel((5, 5))[0]
+
+
+def test_thumbnails_are_the_last_frame_and_evenly_spaced_samples(ramp_video, monkeypatch):
+    monkeypatch.setattr(media, "PREVIEW_FRAMES", 5)
+    thumbnails = media.make_thumbnails(ramp_video, width=160)
+
+    poster = Image.open(thumbnails.poster_path)
+    assert poster.width == 160 and _brightness(poster) >= 250
+
+    preview = Image.open(thumbnails.preview_path)
+    levels = []
+    for i in range(preview.n_frames):
+        preview.seek(i)
+        levels.append(_brightness(preview))
+    assert len(levels) == 5
+    for level, expected in zip(levels, (0, 51, 102, 153, 204)):
+        assert abs(level - expected) <= 8
+
+
+def test_frame_reader_only_decodes_around_the_targets(ramp_video):
+    decoded = []
+
+    class CountingContainer:
+        def __init__(self, container):
+            self.container = container
+
+        def seek(self, *args, **kwargs):
+            self.container.seek(*args, **kwargs)
+
+        def decode(self, stream):
+            for frame in self.container.decode(stream):
+                decoded.append(frame.time)
+                yield frame
+
+    with av.open(ramp_video) as container:
+        reader = media._FrameReader(CountingContainer(container), container.streams.video[0])
+        times = [reader.frame_at(t).time for t in (0, 5, 10, 15)]
+        last = reader.last_frame(SECONDS)
+
+    assert times == pytest.approx([0, 5, 10, 15], abs=1 / FPS)
+    assert last.time == pytest.approx(SECONDS - 1 / FPS, abs=1 / FPS)
+    assert len(decoded) < FPS * SECONDS / 3
+
+
+def test_unreadable_video_has_no_thumbnails(tmp_path):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    assert media.make_thumbnails(str(broken)) is None
+
+
+def _box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+@pytest.mark.parametrize("data, expected", [
+    (_box(b"ftyp", b"isom") + _box(b"moov", b"x" * 16) + _box(b"mdat", b"x" * 64), True),
+    (_box(b"ftyp", b"isom") + _box(b"mdat", b"x" * 64) + _box(b"moov", b"x" * 16), False),
+    # 64-bit box size
+    (_box(b"ftyp") + struct.pack(">I4sQ", 1, b"free", 24) + b"x" * 8 + _box(b"moov"), True),
+    # Size 0: the box runs to the end of the file
+    (_box(b"ftyp") + struct.pack(">I4s", 0, b"free") + _box(b"moov"), False),
+    # Malformed sizes would seek backwards or stand still
+    (_box(b"ftyp") + struct.pack(">I4s", 4, b"free") + _box(b"moov"), False),
+    (_box(b"ftyp") + struct.pack(">I4sQ", 1, b"free", 8) + _box(b"moov"), False),
+    (_box(b"ftyp") + struct.pack(">I4s", 1, b"free") + b"\x00\x00", False),
+    (b"", False),
+])
+def test_is_faststart_walks_top_level_boxes(tmp_path, data, expected):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(data)
+    assert media.is_faststart(str(path)) is expected
+
+
+def test_faststart_moves_the_index_to_the_front(ramp_video, tmp_path):
+    moved = tmp_path / "moved.mp4"
+    moved.write_bytes(open(ramp_video, "rb").read())
+    if media.is_faststart(str(moved)):
+        pytest.skip("encoder already wrote a faststart file")
+
+    media.faststart(str(moved))
+
+    assert media.is_faststart(str(moved))
+    assert media.video_duration(str(moved)) == pytest.approx(media.video_duration(ramp_video), abs=0.1)
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+from prometheus_client import REGISTRY
+
+from Model import langchain as model
+from Model.langchain import ManimCodeResponse, ManimErrorCorrectionResponse, ManimExecutionResponse, ScenePlan
+
+
+def _attempts(status):
+    labels = {"status": status}
+    return (REGISTRY.get_sample_value("eduvid_correction_attempts_count", labels) or 0,
+            REGISTRY.get_sample_value("eduvid_correction_attempts_sum", labels) or 0)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """generate_and_execute_with_correction with the LLM and Manim replaced; set the render outcomes."""
+    outcomes = []
+    monkeypatch.setattr(model, "generate_code", lambda plan, scene, use_cache=True: ManimCodeResponse(code="v0"))
+    monkeypatch.setattr(model, "validate_manim_code", lambda code, scene: [])
+    monkeypatch.setattr(model, "execute_manim_code", lambda code, *args, **kwargs: outcomes.pop(0))
+    monkeypatch.setattr(model, "remember_working_code", lambda *source: None)
+    monkeypatch.setattr(model, "correct_manim_errors", lambda code, error, use_cache=True:
+                        ManimErrorCorrectionResponse(fixed_code=code + "+", explanation="", changes_made=[]))
+
+    def run(**kwargs):
+        result = model.generate_and_execute_with_correction(
+            "topic", plan=ScenePlan(scene="plan", scene_class_name="Demo"), stream=False, **kwargs)
+        if result is not None:
+            result["workspace"].cleanup()
+        return result
+
+    run.outcomes = outcomes
+    return run
+
+
+def test_correction_attempts_are_labelled_by_outcome(pipeline):
+    failed = ManimExecutionResponse(output="", error="NameError")
+    ok = ManimExecutionResponse(output="", video_path="video.mp4")
+    rendered_before, failed_before = _attempts("rendered"), _attempts("failed")
+
+    pipeline.outcomes[:] = [failed, ok]
+    pipeline()
+    pipeline.outcomes[:] = [failed, failed]
+    pipeline(max_correction_attempts=1)
+
+    assert _attempts("rendered") == (rendered_before[0] + 1, rendered_before[1] + 1)
+    assert _attempts("failed") == (failed_before[0] + 1, failed_before[1] + 1)
+
+
+def test_missing_correction_counts_as_failed(pipeline, monkeypatch):
+    monkeypatch.setattr(model, "correct_manim_errors", lambda code, error, use_cache=True: None)
+    before = _attempts("failed")
+
+    pipeline.outcomes[:] = [ManimExecutionResponse(output="", error="NameError")]
+    assert pipeline() is None
+
+    assert _attempts("failed") == (before[0] + 1, before[1])
+
+
+def test_workspace_is_removed_when_the_correction_loop_raises(pipeline, monkeypatch):
+    workspaces = []
+
+    def execute(code, scene, workspace, **kwargs):
+        workspaces.append(workspace)
+        return ManimExecutionResponse(output="", error="NameError")
+
+    def correct(code, error, use_cache=True):
+        raise RuntimeError("LLM unavailable")
+
+    monkeypatch.setattr(model, "execute_manim_code", execute)
+    monkeypatch.setattr(model, "correct_manim_errors", correct)
+
+    with pytest.raises(RuntimeError):
+        pipeline()
+
+    assert not os.path.exists(workspaces[0].path)
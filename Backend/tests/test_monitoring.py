@@ -0,0 +1,23 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", ["/stats", "/metrics"])
+def test_monitoring_endpoints_are_off_without_a_token(client, monkeypatch, path):
+    monkeypatch.setattr(main, "MONITORING_TOKEN", None)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/stats", "/metrics"])
+def test_monitoring_endpoints_need_the_token(client, monkeypatch, path):
+    monkeypatch.setattr(main, "MONITORING_TOKEN", "s3cret")
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
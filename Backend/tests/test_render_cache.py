@@ -0,0 +1,70 @@
+import os
+
+from Model.render_cache import RenderCache, render_cache_key
+import storage
+
+
+def _video(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"v" * size)
+    return str(path)
+
+
+def test_key_depends_on_code_scene_and_flags_but_not_flag_order():
+    key = render_cache_key("code", "Scene1", ["-ql", "--fps=15"])
+    assert key == render_cache_key("code", "Scene1", ["--fps=15", "-ql"])
+    assert key != render_cache_key("code ", "Scene1", ["-ql", "--fps=15"])
+    assert key != render_cache_key("code", "Scene2", ["-ql", "--fps=15"])
+    assert key != render_cache_key("code", "Scene1", ["-qh", "--fps=15"])
+
+
+def test_get_copies_the_video_and_returns_the_output(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1000)
+    cache.put("k1", _video(tmp_path, "a.mp4", 10), "stdout of k1")
+
+    dest = tmp_path / "out" / "copy.mp4"
+    assert cache.get("k1", str(dest)) == "stdout of k1"
+    assert dest.read_bytes() == b"v" * 10
+    assert cache.get("missing", str(tmp_path / "x.mp4")) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_limit(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put("old", _video(tmp_path, "a.mp4", 100), "")
+    cache.put("used", _video(tmp_path, "b.mp4", 100), "")
+    cache.get("old", str(tmp_path / "touch.mp4"))  # "used" is now the least recently used
+    cache.put("new", _video(tmp_path, "c.mp4", 100), "")
+
+    assert cache.get("used", str(tmp_path / "d.mp4")) is None
+    assert cache.get("old", str(tmp_path / "e.mp4")) is not None
+    assert cache.get("new", str(tmp_path / "f.mp4")) is not None
+    assert cache.stats()["size_bytes"] == 200
+    assert not os.path.exists(tmp_path / "cache" / "used")
+
+
+def test_entries_survive_a_restart_and_partial_entries_are_dropped(tmp_path):
+    directory = tmp_path / "cache"
+    RenderCache(str(directory), max_bytes=1000).put("k1", _video(tmp_path, "a.mp4", 10), "out")
+    (directory / ".k2-partial").mkdir()
+
+    reloaded = RenderCache(str(directory), max_bytes=1000)
+    assert reloaded.stats()["entries"] == 1
+    assert reloaded.get("k1", str(tmp_path / "b.mp4")) == "out"
+    assert not (directory / ".k2-partial").exists()
+
+
+def test_local_only_keys_never_go_to_the_bucket(tmp_path, monkeypatch):
+    downloads = []
+
+    def download_file(bucket, path):
+        downloads.append(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(storage, "download_file", download_file)
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1000, bucket="renders")
+
+    assert cache.get("section", str(tmp_path / "a.mp4"), remote=False) is None
+    assert downloads == []
+    assert cache.get("scene", str(tmp_path / "b.mp4")) is None
+    assert downloads == ["scene/video.mp4"]
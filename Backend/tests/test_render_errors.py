@@ -0,0 +1,120 @@
+import sys
+
+import pytest
+
+from Model import langchain as model
+from Model import render
+from Model.render import TracebackWatcher, compact_error, parse_render_error
+
+CODE = "\n".join([
+    "from manim import *",
+    "",
+    "class Demo(Scene):",
+    "    def construct(self):",
+    "        circle = Circle()",
+    "        self.play(Create(circle))",
+    "        square = Square()",
+    "        self.play(Craete(square))",
+    "        self.wait()",
+])
+
+PROGRESS = "Animation 0 : Create(Circle):  45%|####      | 27/60 [00:01<00:01, 20.0it/s]"
+
+PLAIN = f"""{PROGRESS}
+Traceback (most recent call last):
+  File "/usr/lib/python3/site-packages/manim/scene/scene.py", line 229, in render
+    self.construct()
+  File "/tmp/renders/job-1/scene.py", line 8, in construct
+    self.play(Craete(square))
+NameError: name 'Craete' is not defined
+Exception ignored in: <function Scene.__del__>
+"""
+
+RICH = f"""{PROGRESS}
+╭──────────────────── Traceback (most recent call last) ────────────────────╮
+│ /usr/lib/python3/site-packages/manim/cli/render/commands.py:115 in render │
+│                                                                           │
+│ /tmp/renders/job-1/scene_s2.py:8 in construct                             │
+│                                                                           │
+│    7 │   │   square = Square()                                            │
+│ ❱  8 │   │   self.play(Craete(square))                                    │
+╰───────────────────────────────────────────────────────────────────────────╯
+NameError: name 'Craete' is not defined
+"""
+
+
+def _watch(text):
+    watcher = TracebackWatcher()
+    for line in text.splitlines():
+        if watcher.feed(line):
+            break
+    return watcher
+
+
+def test_watcher_reads_plain_tracebacks():
+    watcher = _watch(PLAIN)
+    assert watcher.done
+    assert watcher.exception_line == "NameError: name 'Craete' is not defined"
+    assert watcher.frames == [("/usr/lib/python3/site-packages/manim/scene/scene.py", 229),
+                              ("/tmp/renders/job-1/scene.py", 8)]
+
+
+def test_watcher_reads_rich_tracebacks():
+    watcher = _watch(RICH)
+    assert watcher.exception_line == "NameError: name 'Craete' is not defined"
+    assert watcher.frames[-1] == ("/tmp/renders/job-1/scene_s2.py", 8)
+
+
+def test_watcher_ignores_output_before_a_traceback():
+    watcher = TracebackWatcher()
+    assert not watcher.feed("ValueError: logged, not raised")
+    assert not watcher.feed(PROGRESS)
+    assert not watcher.done
+
+
+def test_parse_render_error_points_at_the_scene_line():
+    for stderr in (PLAIN, RICH):
+        error = parse_render_error(stderr, CODE)
+        assert (error.exception_type, error.message, error.line) == (
+            "NameError", "name 'Craete' is not defined", 8)
+        assert ">    8 |         self.play(Craete(square))" in error.snippet
+        assert "     5 |" in error.snippet and "     9 |" in error.snippet
+
+
+def test_parse_render_error_without_a_scene_frame():
+    stderr = PLAIN.replace("/tmp/renders/job-1/scene.py", "/usr/lib/python3/site-packages/manim/utils.py")
+    error = parse_render_error(stderr, CODE)
+    assert error.line is None and error.snippet == ""
+    # A frame past the end of the code isn't this code's either
+    assert parse_render_error(PLAIN.replace("line 8,", "line 80,"), CODE).line is None
+    assert parse_render_error(PROGRESS + "\nsegfault\n", CODE) is None
+
+
+def test_compact_error_keeps_only_the_exception_and_nearby_code():
+    error = compact_error(PLAIN, CODE)
+    assert error.startswith("NameError: name 'Craete' is not defined\nRaised at line 8 of the scene code:")
+    assert "Traceback" not in error and "Animation 0" not in error
+    assert model._render_error(PLAIN, CODE) == error
+
+
+def test_compact_error_without_a_traceback_keeps_the_last_lines():
+    stderr = "\n".join([PROGRESS] + [f"log line {i}" for i in range(40)] + [PROGRESS, ""])
+    error = compact_error(stderr, CODE, tail_lines=3)
+    assert error == "log line 37\nlog line 38\nlog line 39"
+
+
+@pytest.mark.skipif(not hasattr(render.resource, "prlimit"), reason="prlimit is Linux only")
+def test_run_limited_applies_the_render_limits(monkeypatch):
+    monkeypatch.setattr(render, "RENDER_MAX_CPU_SECONDS", 123)
+    monkeypatch.setattr(render, "RENDER_MAX_MEMORY_MB", 4096)
+    # The limits are set from outside once the child runs; give them a moment to land
+    child = ("import resource, time\n"
+             "deadline = time.time() + 5\n"
+             "while resource.getrlimit(resource.RLIMIT_CPU)[0] != 123 and time.time() < deadline:\n"
+             "    time.sleep(0.01)\n"
+             "print(resource.getrlimit(resource.RLIMIT_CPU), resource.getrlimit(resource.RLIMIT_AS))\n")
+
+    result = render.run_limited([sys.executable, "-c", child], timeout=10)
+
+    assert result.returncode == 0
+    assert result.stdout.strip() == f"(123, 123) ({4096 * 1024 * 1024}, {4096 * 1024 * 1024})"
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from Model.render import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RenderQueueFull, RenderScheduler
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+def test_slots_cap_concurrency_and_report_idle():
+    scheduler = RenderScheduler(slots=2, max_queue=4)
+    assert scheduler.idle()
+    with scheduler.slot():
+        assert scheduler.idle()
+        with scheduler.slot():
+            assert not scheduler.idle()
+            assert scheduler.stats()["running"] == 2
+    assert scheduler.stats() == {"slots": 2, "running": 0, "queued": 0, "max_queue": 4}
+
+
+def test_waiting_renders_run_by_priority_then_fifo():
+    scheduler = RenderScheduler(slots=1, max_queue=10)
+    order = []
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot():
+            release.wait()
+
+    def render(name, priority):
+        with scheduler.slot(priority):
+            order.append(name)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    _wait_for(lambda: scheduler.stats()["running"] == 1)
+
+    threads = []
+    for name, priority in [("bg-1", PRIORITY_BACKGROUND), ("ui-1", PRIORITY_INTERACTIVE),
+                           ("bg-2", PRIORITY_BACKGROUND), ("ui-2", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=render, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda: scheduler.stats()["queued"] == len(threads))
+
+    release.set()
+    for thread in [holder, *threads]:
+        thread.join(timeout=2)
+    assert order == ["ui-1", "ui-2", "bg-1", "bg-2"]
+
+
+def test_full_queue_rejects_new_renders():
+    scheduler = RenderScheduler(slots=1, max_queue=1)
+    release = threading.Event()
+
+    def hold():
+        with scheduler.slot():
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: scheduler.stats()["queued"] == 1)
+    assert scheduler.saturated()
+
+    with pytest.raises(RenderQueueFull):
+        with scheduler.slot():
+            pass
+
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert not scheduler.saturated()
+
+
+def test_slot_is_released_when_the_render_raises():
+    scheduler = RenderScheduler(slots=1, max_queue=1)
+    with pytest.raises(RuntimeError):
+        with scheduler.slot():
+            raise RuntimeError("render crashed")
+    assert scheduler.idle()
+
+
+def test_background_renders_are_queued_past_the_cap_and_not_counted():
+    scheduler = RenderScheduler(slots=1, max_queue=1)
+    release = threading.Event()
+    ran = []
+
+    def hold(priority):
+        with scheduler.slot(priority):
+            ran.append(priority)
+            release.wait()
+
+    threads = [threading.Thread(target=hold, args=(priority,))
+               for priority in (PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_BACKGROUND)]
+    threads[0].start()
+    _wait_for(lambda: scheduler.stats()["running"] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for(lambda: scheduler.stats()["queued"] == 2)
+    # Only background renders are waiting: a user's render still gets in line
+    assert not scheduler.saturated()
+
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert ran == [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND, PRIORITY_BACKGROUND]
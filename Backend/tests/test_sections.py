@@ -0,0 +1,117 @@
+import ast
+import os
+import subprocess
+import uuid
+
+from Model import langchain as model
+from Model.render import RenderQueueFull, RenderWorkspace
+from Model.sections import section_fingerprint, section_variant, split_sections
+
+
+def _sectioned_scene():
+    # Unique code, so the render cache can't answer
+    return (
+        "from manim import *\n"
+        "\n"
+        "class Demo(Scene):\n"
+        "    def construct(self):\n"
+        "        # Scene 1: Intro\n"
+        f"        title = Text({uuid.uuid4().hex!r})\n"
+        "        self.play(Write(title))\n"
+        "        # Scene 2: Outro\n"
+        "        self.play(FadeOut(title))\n"
+    )
+
+
+def test_full_render_queue_falls_back_to_one_render(monkeypatch):
+    monkeypatch.setattr(model, "RENDER_SECTIONS", True)
+    rendered = []
+
+    def fake_render(file_path, scene_class_name, workspace, output_name, quality_flag, priority, on_output):
+        if os.path.basename(file_path) != RenderWorkspace.SCENE_FILE:
+            raise RenderQueueFull("Render queue is full (0 waiting)")
+        rendered.append(scene_class_name)
+        video = workspace.video_path(output_name, quality_flag)
+        os.makedirs(os.path.dirname(video), exist_ok=True)
+        with open(video, "wb") as f:
+            f.write(b"mp4")
+        return subprocess.CompletedProcess([file_path], 0, "done", ""), 1.0
+
+    monkeypatch.setattr(model, "_render_scene", fake_render)
+    with RenderWorkspace() as workspace:
+        result = model.execute_manim_code(_sectioned_scene(), "Demo", workspace)
+
+    assert result.error is None and result.video_path
+    assert rendered == ["Demo"]
+
+
+SCENE = """from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        title = Text("Intro")
+        # Scene 1: Intro
+        self.play(Write(title))
+        # Scene 2: Middle
+        for i in range(3):
+            # Scene 9: not a marker, it's inside a loop
+            self.wait(0.1)
+        # Scene 3: Outro
+        self.play(FadeOut(title))
+"""
+
+
+def test_split_sections_at_top_level_markers():
+    sections = split_sections(SCENE, "Demo")
+
+    assert [(s.index, s.title, s.start_line, s.end_line) for s in sections] == [
+        (1, "Scene 1: Intro", 5, 7),
+        (2, "Scene 2: Middle", 8, 11),
+        (3, "Scene 3: Outro", 12, 13),
+    ]
+    assert sections[0].source.splitlines()[0].strip() == 'title = Text("Intro")'
+    assert "Scene 9" in sections[1].source
+
+
+def test_split_sections_needs_two_markers_and_valid_code():
+    assert split_sections(SCENE.replace("# Scene 2", "# Part 2").replace("# Scene 3", "# Part 3"), "Demo") == []
+    assert split_sections(SCENE, "Other") == []
+    assert split_sections(SCENE + "    def (", "Demo") == []
+
+
+def test_fingerprint_ignores_later_sections_only():
+    sections = split_sections(SCENE, "Demo")
+    changed_outro = SCENE.replace("FadeOut(title)", "Unwrite(title)")
+    changed_intro = SCENE.replace("Write(title))", "Create(title))")
+
+    assert section_fingerprint(SCENE, sections, 2) == section_fingerprint(changed_outro, sections, 2)
+    assert section_fingerprint(SCENE, sections, 3) != section_fingerprint(changed_outro, sections, 3)
+    assert section_fingerprint(SCENE, sections, 2) != section_fingerprint(changed_intro, sections, 2)
+    assert section_fingerprint(SCENE, sections, 3) == SCENE.rstrip("\n")
+
+
+def test_section_variant_renders_only_its_section_and_keeps_line_numbers():
+    sections = split_sections(SCENE, "Demo")
+    code, variant_class = section_variant(SCENE, "Demo", sections, 2)
+    lines = code.splitlines()
+
+    assert variant_class == "DemoSection2"
+    ast.parse(code)
+    # Section 1 ran with skip_animations from setup(); section 2 renders, section 3 never runs
+    assert "self.next_section('Scene 1: Intro', skip_animations=True)" in code
+    assert lines[7].strip() == "self.next_section('Scene 2: Middle', skip_animations=False)  # Scene 2: Middle"
+    assert lines[11].strip() == "return  # Scene 3: Outro"
+    assert lines[:7] == SCENE.splitlines()[:7]
+    assert "class DemoSection2(Demo):" in code
+
+
+def test_first_and_last_section_variants():
+    sections = split_sections(SCENE, "Demo")
+    first, _ = section_variant(SCENE, "Demo", sections, 1)
+    last, _ = section_variant(SCENE, "Demo", sections, 3)
+
+    assert "self.next_section('Scene 1: Intro', skip_animations=False)" in first
+    assert "return  # Scene 2: Middle" in first
+    assert "return" not in last
+    assert "self.next_section('Scene 2: Middle', skip_animations=True)" in last
+    assert "self.next_section('Scene 3: Outro', skip_animations=False)" in last
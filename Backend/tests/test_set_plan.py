@@ -0,0 +1,20 @@
+import pytest
+
+from auth.dbmodel import User
+from set_plan import set_plan
+
+
+def test_set_plan_updates_the_user(db):
+    db.add(User(id=1, username="ada", email="ada@example.com", hashed_password="x"))
+    db.commit()
+
+    set_plan(db, "ada@example.com", "pro")
+
+    assert db.get(User, 1).plan == "pro"
+
+
+def test_set_plan_rejects_unknown_plans_and_users(db):
+    with pytest.raises(ValueError):
+        set_plan(db, "ada@example.com", "platinum")
+    with pytest.raises(LookupError):
+        set_plan(db, "nobody@example.com", "pro")
@@ -0,0 +1,63 @@
+import pytest
+
+import storage
+from storage import SignedURLCache
+
+
+class _Backend:
+    def __init__(self):
+        self.calls = []
+
+    def signed_urls(self, bucket, file_keys, expires_in):
+        self.calls.append(list(file_keys))
+        return {key: f"https://signed/{bucket}/{key}?n={len(self.calls)}" for key in file_keys}
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = _Backend()
+    monkeypatch.setattr(storage, "backend", fake)
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(storage.time, "time", lambda: now[0])
+    return now
+
+
+def test_misses_are_signed_together_and_then_reused(backend, clock):
+    cache = SignedURLCache("videos", expires_in=3600, refresh_margin=1800, max_entries=10)
+
+    first = cache.get_many(["a", "b", "a"])
+    second = cache.get_many(["a", "b", "c"])
+
+    assert backend.calls == [["a", "b"], ["c"]]
+    assert second["a"] == first["a"] and second["b"] == first["b"]
+    assert cache.stats() == {"hits": 2, "misses": 3, "hit_rate": 0.4, "sign_calls": 2, "entries": 3}
+
+
+def test_urls_are_signed_again_once_the_margin_is_reached(backend, clock):
+    cache = SignedURLCache("videos", expires_in=3600, refresh_margin=1800, max_entries=10)
+    url = cache.get_many(["a"])["a"]
+
+    clock[0] += 1799
+    assert cache.get_many(["a"])["a"] == url
+    clock[0] += 2
+    assert cache.get_many(["a"])["a"] != url
+    assert len(backend.calls) == 2
+
+
+def test_least_recently_used_urls_are_dropped(backend, clock):
+    cache = SignedURLCache("videos", expires_in=3600, refresh_margin=1800, max_entries=2)
+    cache.get_many(["a", "b"])
+    cache.get_many(["a"])
+    cache.get_many(["c"])
+
+    cache.get_many(["a", "b"])
+    assert backend.calls[-1] == ["b"]
+
+
+def test_default_margin_is_half_the_lifetime():
+    assert storage.SIGNED_URL_REFRESH_MARGIN_SECONDS == storage.SIGNED_URL_EXPIRES_SECONDS // 2
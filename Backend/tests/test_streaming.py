@@ -0,0 +1,148 @@
+from Model import langchain as model
+from Model.langchain import (ManimCodeResponse, ManimErrorCorrectionResponse,
+                             ManimExecutionResponse, PartialCodeChecker, ScenePlan)
+from Model.llm_cache import llm_cache_key
+
+
+def _feed_lines(checker, code):
+    for line in code.splitlines(True):
+        checker.feed(line)
+
+
+def test_checker_finds_a_broken_statement_once_the_next_one_starts():
+    checker = PartialCodeChecker("Demo")
+    _feed_lines(checker, "from manim import *\nx = (1 +\nclass Demo(Scene):\n")
+    assert checker.syntax_error is None  # Still inside the open bracket
+
+    checker = PartialCodeChecker("Demo")
+    _feed_lines(checker, "from manim import *\nx = 1 +\nclass Demo(Scene):\n")
+    assert checker.syntax_error.startswith("line 2")
+
+
+def test_checker_ignores_column_zero_lines_inside_strings_and_compound_statements():
+    checker = PartialCodeChecker("Demo")
+    _feed_lines(checker, (
+        'from manim import *\n'
+        'NOTES = """\n'
+        'not python: (\n'
+        '"""\n'
+        'if config.quality == "low":\n'
+        '    SPEED = 2\n'
+        'elif True:\n'
+        '    SPEED = 1\n'
+        'else:\n'
+        '    SPEED = 0\n'
+        'try:\n'
+        '    import numpy\n'
+        'except ImportError:\n'
+        '    numpy = None\n'
+        'finally:\n'
+        '    pass\n'
+        'TOTAL = 1 + \\\n'
+        '2\n'
+        '@staticmethod\n'
+        'def helper():\n'
+        '    return "# not a comment ("\n'
+        'class Demo(Scene):\n'
+        '    def construct(self):\n'
+        '        pass\n'
+    ))
+    checker.feed("\n")
+    assert checker.syntax_error is None
+    assert checker.scene_class_name == "Demo" and not checker.class_mismatch
+
+
+def test_checker_reports_a_renamed_scene_class():
+    checker = PartialCodeChecker("Demo")
+    _feed_lines(checker, "from manim import *\nclass Other(MovingCameraScene):\n")
+    assert checker.scene_class_name == "Other" and checker.class_mismatch
+
+
+def test_streaming_answers_are_cached_under_their_own_key():
+    request = ("model", 0.1, model.CODE_SYSTEM_PROMPT, {"plan": "p"}, ManimCodeResponse)
+    assert llm_cache_key(*request) != llm_cache_key(*request, model.STREAM_CACHE_VARIANT)
+    assert llm_cache_key(*request, "") == llm_cache_key(*request)
+
+
+def test_stream_stops_at_a_syntax_error_and_goes_straight_to_correction(monkeypatch):
+    chunks = ["from manim import *\n", "x = 1 +\n", "class Demo(Scene):\n", "    def construct(self):\n"]
+    sent = []
+
+    def fake_stream(plan, scene_class_name, on_delta, use_cache=True):
+        for chunk in chunks:
+            sent.append(chunk)
+            on_delta(chunk, False)
+        return ManimCodeResponse(code="".join(chunks))
+
+    corrections = []
+
+    def fake_correct(code, error_message, use_cache=True):
+        corrections.append((code, error_message))
+        return ManimErrorCorrectionResponse(fixed_code="fixed", explanation="", changes_made=[])
+
+    rendered = []
+    remembered = []
+    monkeypatch.setattr(model, "stream_generate_code", fake_stream)
+    monkeypatch.setattr(model, "correct_manim_errors", fake_correct)
+    monkeypatch.setattr(model, "validate_manim_code", lambda code, scene: [])
+    monkeypatch.setattr(model, "execute_manim_code", lambda code, *args, **kwargs: (
+        rendered.append(code) or ManimExecutionResponse(output="", video_path="video.mp4")))
+    monkeypatch.setattr(model, "remember_working_code", lambda *source: remembered.append(source))
+
+    result = model.generate_and_execute_with_correction(
+        "topic", plan=ScenePlan(scene="the plan", scene_class_name="Demo"), stream=True)
+    result["workspace"].cleanup()
+
+    assert sent == chunks[:3]  # Nothing read after the error was spotted
+    (code, error), = corrections
+    assert code == "".join(chunks[:3])
+    assert "line 2" in error and "the plan" in error
+    assert rendered == ["fixed"]
+    assert result["correction_attempts"] == 1
+    assert remembered[0][0] == "correction"
+
+
+
+class _FakeChain:
+    def __init__(self, partials):
+        self.partials = partials
+
+    def stream(self, inputs):
+        return iter(self.partials)
+
+
+def test_stream_field_sends_revised_text_as_a_reset():
+    deltas = []
+    chain = _FakeChain([{"code": "x = 1"}, {"code": "x = 12"}, {"code": "y = 12\n"}, {"code": "y = 12\n"}])
+
+    response = model._stream_field(chain, {}, ManimCodeResponse, "code",
+                                   lambda delta, reset: deltas.append((delta, reset)))
+
+    assert deltas == [("x = 1", False), ("2", False), ("y = 12\n", True)]
+    assert response.code == "y = 12\n"
+
+
+def test_revised_code_is_checked_from_scratch(monkeypatch):
+    # Appended to the first version, the revision would read as a broken statement
+    revisions = [("from manim import *\nx = 1 +\n", False),
+                 ("from manim import *\nx = 1\n", True),
+                 ("class Demo(Scene):\n    def construct(self):\n        pass\n", False)]
+
+    def fake_stream(plan, scene_class_name, on_delta, use_cache=True):
+        for delta, reset in revisions:
+            on_delta(delta, reset)
+        return ManimCodeResponse(code="".join(delta for delta, _ in revisions[1:]))
+
+    rendered = []
+    monkeypatch.setattr(model, "stream_generate_code", fake_stream)
+    monkeypatch.setattr(model, "validate_manim_code", lambda code, scene: [])
+    monkeypatch.setattr(model, "execute_manim_code", lambda code, *args, **kwargs: (
+        rendered.append(code) or ManimExecutionResponse(output="", video_path="video.mp4")))
+    monkeypatch.setattr(model, "remember_working_code", lambda *source: None)
+
+    result = model.generate_and_execute_with_correction(
+        "topic", plan=ScenePlan(scene="the plan", scene_class_name="Demo"), stream=True)
+    result["workspace"].cleanup()
+
+    assert result["correction_attempts"] == 0
+    assert rendered == [revisions[1][0] + revisions[2][0]]
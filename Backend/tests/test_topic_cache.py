@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+import pytest
+
+from auth.dbmodel import User, Video
+import jobs
+import topic_cache
+
+NEAR_MISSES = [
+    ("Fibonacci sequence part 1", "Fibonacci sequence part 2"),
+    ("Derivative of x^2", "Derivative of x^3"),
+    ("Newton's first law", "Newton's second law"),
+]
+
+
+def test_normalize_topic_ignores_case_punctuation_and_spacing():
+    assert topic_cache.normalize_topic("  Why is the SKY blue?! ") == "why is the sky blue"
+    assert topic_cache.normalize_topic("why   is the\tsky blue") == "why is the sky blue"
+    assert topic_cache.normalize_topic("Ｆｕｌｌｗｉｄｔｈ") == "fullwidth"
+    assert topic_cache.normalize_topic("?!") == ""
+
+
+@pytest.mark.parametrize("a, b", NEAR_MISSES)
+def test_topics_differing_in_a_number_or_ordinal_are_not_near_duplicates(a, b):
+    key_a, key_b = topic_cache.normalize_topic(a), topic_cache.normalize_topic(b)
+    # Plain string similarity alone would have matched them
+    assert SequenceMatcher(None, key_a, key_b).ratio() >= 0.7
+    assert topic_cache.near_duplicate(key_a, key_b, threshold=0.7) is None
+
+
+def test_rephrased_topics_are_near_duplicates():
+    assert topic_cache.near_duplicate("why is the sky blue", "why is the sky so blue", threshold=0.9)
+    assert topic_cache.near_duplicate("why is the sky blue", "why is the sky blue", threshold=0) is None
+
+
+@pytest.fixture
+def videos(db):
+    db.add(User(id=1, username="ada", email="ada@example.com", hashed_password="x"))
+
+    def add(topic, minutes_ago=0, **fields):
+        fields.setdefault("video_path", f"{topic}.mp4")
+        video = Video(title=topic, topic_key=topic_cache.normalize_topic(topic), user_id=1,
+                      created_at=datetime.utcnow() - timedelta(minutes=minutes_ago), **fields)
+        db.add(video)
+        db.commit()
+        return video
+    return add
+
+
+def test_lookup_serves_only_exact_topic_matches_as_videos(db, videos):
+    video = videos("Why is the sky blue?")
+    assert topic_cache.lookup(db, "why is the sky blue") == (video, True)
+    assert topic_cache.lookup(db, "why is the sky so blue") == (video, False)
+    assert topic_cache.lookup(db, "Photosynthesis") == (None, False)
+    assert topic_cache.lookup(db, "?!") == (None, False)
+
+
+@pytest.mark.parametrize("cached, requested", NEAR_MISSES)
+def test_lookup_never_reuses_a_near_miss(db, videos, monkeypatch, cached, requested):
+    monkeypatch.setattr(topic_cache, "TOPIC_CACHE_FUZZY_THRESHOLD", 0.7)
+    videos(cached)
+    assert topic_cache.lookup(db, requested) == (None, False)
+
+
+def test_lookup_prefers_the_newest_match_and_skips_expired_or_unfinished_videos(db, videos, monkeypatch):
+    monkeypatch.setattr(topic_cache, "TOPIC_CACHE_TTL_HOURS", 1)
+    videos("gravity", minutes_ago=120)
+    newest = videos("gravity", minutes_ago=1)
+    videos("gravity", video_path=None)
+    assert topic_cache.lookup(db, "Gravity") == (newest, True)
+
+    videos("entropy", minutes_ago=120)
+    assert topic_cache.lookup(db, "entropy") == (None, False)
+
+
+def test_reused_copies_do_not_keep_a_topic_fresh(db, videos, monkeypatch):
+    monkeypatch.setattr(topic_cache, "TOPIC_CACHE_TTL_HOURS", 1)
+    source = videos("gravity", minutes_ago=30)
+    job = jobs.record_reused_job(db, 1, "Gravity", source)
+    assert topic_cache.lookup(db, "gravity") == (source, True)
+
+    source.created_at = datetime.utcnow() - timedelta(minutes=120)
+    db.commit()
+    assert db.get(Video, job.video_id).created_at >= datetime.utcnow() - timedelta(minutes=1)
+    assert topic_cache.lookup(db, "gravity") == (None, False)
+
+
+def test_resolve_mode_lets_the_user_opt_out():
+    class Account:
+        topic_cache_opt_out = False
+
+    user = Account()
+    assert topic_cache.resolve_mode(user, "plan") == "plan"
+    assert topic_cache.resolve_mode(user) == topic_cache.TOPIC_CACHE_MODE
+    with pytest.raises(ValueError):
+        topic_cache.resolve_mode(user, "everything")
+    user.topic_cache_opt_out = True
+    assert topic_cache.resolve_mode(user, "video") == "none"
+
+
+def test_scene_class_skips_helper_and_intermediate_classes():
+    code = '''
+from manim import *
+
+class Arrow3(VMobject):
+    pass
+
+class BaseLesson(Scene):
+    pass
+
+class Lesson(BaseLesson):
+    def construct(self):
+        pass
+'''
+    assert topic_cache.scene_class_from_code(code) == "Lesson"
+    assert topic_cache.scene_class_from_code("class Demo(ThreeDScene):\n    pass\n") == "Demo"
+    assert topic_cache.scene_class_from_code("class Helper:\n    pass\n") is None
+    assert topic_cache.scene_class_from_code("class Broken(Scene)") is None
+
+
+def test_stored_scene_class_wins_over_the_code():
+    video = Video(manim_code="class Other(Scene):\n    pass\n", scene_class_name="Lesson")
+    assert topic_cache.scene_class_name(video) == "Lesson"
+    video.scene_class_name = None
+    assert topic_cache.scene_class_name(video) == "Other"
@@ -0,0 +1,93 @@
+import pytest
+
+from Model import validation
+from Model.validation import FALLBACK_SCENE_TYPES, validate_manim_code
+
+SCENE = """
+from manim import *
+
+class Demo(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))
+"""
+
+
+@pytest.fixture
+def manim_names(monkeypatch):
+    """Pretend Manim is importable and exports these names."""
+    exported = frozenset({"Scene", "MovingCameraScene", "Circle", "Create", "Square"})
+    monkeypatch.setattr(validation, "manim_exports",
+                        lambda: (exported, frozenset({"Scene", "MovingCameraScene"})))
+
+
+def test_valid_scene_has_no_problems(manim_names):
+    assert validate_manim_code(SCENE, "Demo") == []
+
+
+def test_syntax_error_is_reported_alone():
+    problems = validate_manim_code("class Demo(Scene):\n    def construct(self)\n        pass\n", "Demo")
+    assert len(problems) == 1
+    assert problems[0].startswith("SyntaxError:") and "line 2" in problems[0]
+
+
+def test_disallowed_imports_and_calls(manim_names):
+    code = SCENE + "import os\nfrom subprocess import run\nopen('x')\neval('1')\n"
+    problems = validate_manim_code(code, "Demo")
+    assert "Disallowed import 'os' (line 8)" in problems
+    assert "Disallowed import 'subprocess' (line 9)" in problems
+    assert "Disallowed call open() (line 10)" in problems
+    assert "Disallowed call eval() (line 11)" in problems
+
+
+def test_missing_or_misnamed_scene_class(manim_names):
+    problems = validate_manim_code(SCENE, "Other")
+    assert problems == ["Scene class 'Other' is not defined at module level (classes found: Demo)"]
+
+
+def test_scene_class_must_inherit_from_a_scene_type(manim_names):
+    code = SCENE.replace("class Demo(Scene)", "class Demo(Circle)")
+    assert validate_manim_code(code, "Demo") == [
+        "Class 'Demo' inherits from Circle, which is not a Manim Scene type"]
+
+
+def test_scene_type_through_a_local_base_class(manim_names):
+    code = SCENE.replace("class Demo(Scene)", "class Base(MovingCameraScene):\n    pass\n\nclass Demo(Base)")
+    assert validate_manim_code(code, "Demo") == []
+
+
+def test_construct_is_required(manim_names):
+    code = "from manim import *\n\nclass Demo(Scene):\n    def setup(self):\n        pass\n"
+    assert validate_manim_code(code, "Demo") == ["Class 'Demo' has no construct() method"]
+
+
+def test_undefined_names_are_reported_once(manim_names):
+    code = SCENE + "        self.play(FadeIn(circle))\n        self.play(FadeIn(Square()))\n"
+    assert validate_manim_code(code, "Demo") == [
+        "NameError: name 'FadeIn' is not defined and not exported by manim (line 8)"]
+
+
+def test_names_bound_anywhere_in_the_module_are_known(manim_names):
+    code = SCENE + (
+        "        for i, (a, b) in enumerate([(1, 2)]):\n"
+        "            total = a + b + i\n"
+        "        try:\n"
+        "            pass\n"
+        "        except Exception as exc:\n"
+        "            print(exc, total, helper)\n"
+        "\n"
+        "def helper(value=len):\n"
+        "    return value\n"
+    )
+    assert validate_manim_code(code, "Demo") == []
+
+
+def test_undefined_names_are_not_checked_without_manim(monkeypatch):
+    monkeypatch.setattr(validation, "manim_exports", lambda: (None, frozenset(FALLBACK_SCENE_TYPES)))
+    assert validate_manim_code(SCENE + "        self.play(Anything())\n", "Demo") == []
+
+
+def test_undefined_names_are_not_checked_behind_other_star_imports(manim_names):
+    code = SCENE.replace("from manim import *", "from manim import *\nfrom numpy import *") \
+        + "        self.wait(pi)\n"
+    assert validate_manim_code(code, "Demo") == []
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from dotenv import load_dotenv
+import ast
+import os
+import re
+import unicodedata
+
+from auth.dbmodel import GenerationJob, Video
+
+load_dotenv()
+
+# "video": reuse a finished video, "plan": reuse only the scene plan,
+# "none": always regenerate
+REUSE_MODES = ("video", "plan", "none")
+# Stage of a job served from an existing video (see jobs.record_reused_job)
+REUSED_JOB_STAGE = "reused"
+
+TOPIC_CACHE_MODE = os.getenv("TOPIC_CACHE_MODE", "video")
+TOPIC_CACHE_TTL_HOURS = int(os.getenv("TOPIC_CACHE_TTL_HOURS", "168"))
+# Similarity (0-1) needed for a near-duplicate match; 0 disables fuzzy lookup.
+# Near-duplicates only ever seed the scene plan, never serve a finished video.
+TOPIC_CACHE_FUZZY_THRESHOLD = float(os.getenv("TOPIC_CACHE_FUZZY_THRESHOLD", "0.9"))
+TOPIC_CACHE_FUZZY_CANDIDATES = int(os.getenv("TOPIC_CACHE_FUZZY_CANDIDATES", "500"))
+
+
+def normalize_topic(topic: str) -> str:
+    """'Why is the sky blue?' and 'why is  the sky blue' both -> 'why is the sky blue'."""
+    text = unicodedata.normalize("NFKC", topic).lower()
+    text = re.sub(r"[^\w\s]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Words that make "part 1" / "first law" a different topic from "part 2" / "second law"
+ORDINAL_WORDS = {
+    "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x",
+}
+
+
+def _distinguishing_tokens(key: str) -> list:
+    return sorted(token for token in key.split()
+                  if token in ORDINAL_WORDS or any(char.isdigit() for char in token))
+
+
+def near_duplicate(key: str, candidate_key: str, threshold: float | None = None) -> float | None:
+    """
+    Similarity of two normalized topics if they are near-duplicates, else None.
+    Topics that differ in a number or ordinal ("x^2" vs "x^3", "part 1" vs
+    "part 2", "first law" vs "second law") are never near-duplicates, however
+    similar the rest of the text is.
+    """
+    if threshold is None:
+        threshold = TOPIC_CACHE_FUZZY_THRESHOLD
+    if threshold <= 0 or not candidate_key or _distinguishing_tokens(key) != _distinguishing_tokens(candidate_key):
+        return None
+    score = SequenceMatcher(None, key, candidate_key).ratio()
+    return score if score >= threshold else None
+
+
+def resolve_mode(user, requested: str | None = None) -> str:
+    """Reuse mode for this request: user opt-out wins, then the request, then the server default."""
+    if user.topic_cache_opt_out:
+        return "none"
+    mode = requested or TOPIC_CACHE_MODE
+    if mode not in REUSE_MODES:
+        raise ValueError(f"reuse must be one of {', '.join(REUSE_MODES)}")
+    return mode
+
+
+def lookup(db, topic: str) -> tuple:
+    """
+    (video, exact): the most recent non-expired video for the same topic, with
+    exact=True, or else for a near-duplicate topic, with exact=False. Only an
+    exact match may be served as a finished video; a near-duplicate is only
+    good for its scene plan. (None, False) if nothing matches.
+
+    Copies handed out by earlier reuses are skipped: their created_at is the
+    time of the copy, so they would keep a popular topic from ever expiring.
+    """
+    key = normalize_topic(topic)
+    if not key:
+        return None, False
+    copies = db.query(GenerationJob.video_id).filter(GenerationJob.stage == REUSED_JOB_STAGE,
+                                                     GenerationJob.video_id.isnot(None))
+    fresh = (
+        db.query(Video)
+        .filter(Video.video_path.isnot(None),
+                Video.created_at >= datetime.utcnow() - timedelta(hours=TOPIC_CACHE_TTL_HOURS),
+                Video.id.notin_(copies))
+    )
+
+    exact = fresh.filter(Video.topic_key == key).order_by(Video.created_at.desc()).first()
+    if exact is not None:
+        return exact, True
+    if TOPIC_CACHE_FUZZY_THRESHOLD <= 0:
+        return None, False
+
+    candidates = (
+        fresh.with_entities(Video.id, Video.topic_key)
+        .order_by(Video.created_at.desc())
+        .limit(TOPIC_CACHE_FUZZY_CANDIDATES)
+        .all()
+    )
+    best_id, best_score = None, 0.0
+    for video_id, candidate_key in candidates:
+        score = near_duplicate(key, candidate_key)
+        if score is not None and score > best_score:
+            best_id, best_score = video_id, score
+    return (db.get(Video, best_id) if best_id is not None else None), False
+
+
+def scene_class_name(video: Video) -> str | None:
+    """Scene class of a stored video; older rows recover it from their Manim code."""
+    return video.scene_class_name or scene_class_from_code(video.manim_code or "")
+
+
+def scene_class_from_code(code: str) -> str | None:
+    """
+    The Scene subclass that no other class in `code` builds on (the last one if
+    several), skipping helper classes and intermediate Scene base classes.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    def base_names(node: ast.ClassDef) -> list:
+        return [base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", "") for base in node.bases]
+
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    scenes = []
+    for node in classes:  # In source order, so bases defined earlier are known
+        if any(name.endswith("Scene") or name in scenes for name in base_names(node)):
+            scenes.append(node.name)
+    bases = {name for node in classes if node.name in scenes for name in base_names(node)}
+    leaves = [name for name in scenes if name not in bases]
+    return leaves[-1] if leaves else None
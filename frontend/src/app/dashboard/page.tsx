@@ -2,25 +2,46 @@
 import { useEffect, useState } from "react";
 import Navbar from "../../components/ui/Navbar";
 
+const API_URL = "http://127.0.0.1:8000/auth";
+const PAGE_SIZE = 12;
+
 interface PastVideo {
+  id: number;
   title: string;
   video_url: string;
+  created_at: string | null;
+  quality: string | null;
+  thumbnail_url: string | null;
+  preview_url: string | null;
+}
+
+interface VideoDetail {
   scene_plan: string;
   manim_code: string;
 }
 
 export default function DashboardPage() {
   const [videos, setVideos] = useState<PastVideo[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [details, setDetails] = useState<{[id: number]: VideoDetail}>({});
   const [error, setError] = useState("");
   const [expandedCard, setExpandedCard] = useState<number | null>(null);
   const [expandedCode, setExpandedCode] = useState<number | null>(null);
   const [videoErrors, setVideoErrors] = useState<{[key: number]: boolean}>({});
+  // Cards show the poster image; the video is only loaded once its card is played
+  const [playing, setPlaying] = useState<{[id: number]: boolean}>({});
+  const [hovered, setHovered] = useState<number | null>(null);
 
-  const fetchVideos = async () => {
+  // Pages come newest first; plan and code are fetched per video when expanded
+  const fetchVideos = async (cursor: string | null = null) => {
     const token = localStorage.getItem("token");
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (cursor) params.set("cursor", cursor);
 
+    setLoadingMore(true);
     try {
-      const res = await fetch("http://127.0.0.1:8000/auth/myvideos", {
+      const res = await fetch(`${API_URL}/myvideos?${params}`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -29,9 +50,29 @@ export default function DashboardPage() {
       if (!res.ok) throw new Error("Failed to fetch videos");
 
       const data = await res.json();
-      setVideos(data.reverse());
+      setVideos(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (err: any) {
       setError(err.message || "Failed to fetch videos.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const fetchDetail = async (id: number) => {
+    if (details[id]) return;
+    const token = localStorage.getItem("token");
+    try {
+      const res = await fetch(`${API_URL}/videos/${id}`, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+      if (!res.ok) throw new Error("Failed to fetch video details");
+      const data = await res.json();
+      setDetails(prev => ({ ...prev, [id]: { scene_plan: data.scene_plan, manim_code: data.manim_code } }));
+    } catch (err: any) {
+      setError(err.message || "Failed to fetch video details.");
     }
   };
 
@@ -40,10 +81,12 @@ export default function DashboardPage() {
   }, []);
 
   const toggleScenePlan = (idx: number) => {
+    if (expandedCard !== idx) fetchDetail(videos[idx].id);
     setExpandedCard(expandedCard === idx ? null : idx);
   };
 
   const toggleCode = (idx: number) => {
+    if (expandedCode !== idx) fetchDetail(videos[idx].id);
     setExpandedCode(expandedCode === idx ? null : idx);
   };
 
@@ -117,7 +160,7 @@ export default function DashboardPage() {
                     <span className="text-emerald-400 font-bold text-sm">{videos.length}</span>
                   </div>
                   <span className="text-gray-300 text-lg">
-                    {videos.length === 1 ? '1 Video' : `${videos.length} Videos`}
+                    {videos.length === 1 ? '1 Video' : `${videos.length}${nextCursor ? '+' : ''} Videos`}
                   </span>
                 </div>
               </div>
@@ -125,16 +168,40 @@ export default function DashboardPage() {
               <div className="grid grid-cols-1 lg:grid-cols-2 xl:grid-cols-3 gap-8">
                 {videos.map((video, idx) => (
                   <div
-                    key={idx}
+                    key={video.id}
                     className="group bg-gray-900/40 backdrop-blur-xl rounded-2xl border border-gray-700/30 hover:border-emerald-400/30 shadow-xl hover:shadow-2xl hover:shadow-emerald-500/10 transition-all duration-500 transform hover:-translate-y-2 overflow-hidden"
                   >
                     {/* Video Section */}
                     <div className="relative group/video">
-                      {!videoErrors[idx] ? (
+                      {video.thumbnail_url && !playing[video.id] ? (
+                        <button
+                          onClick={() => setPlaying(prev => ({ ...prev, [video.id]: true }))}
+                          onMouseEnter={() => setHovered(video.id)}
+                          onMouseLeave={() => setHovered(null)}
+                          className="block w-full"
+                          title="Play video"
+                        >
+                          <img
+                            src={hovered === video.id && video.preview_url ? video.preview_url : video.thumbnail_url}
+                            alt={video.title}
+                            loading="lazy"
+                            className="w-full h-48 object-cover rounded-t-2xl bg-gray-800"
+                          />
+                          <div className="absolute inset-0 bg-gradient-to-t from-gray-900/40 to-transparent rounded-t-2xl flex items-center justify-center pointer-events-none">
+                            <div className="w-16 h-16 bg-emerald-500/20 backdrop-blur-sm rounded-full flex items-center justify-center border border-emerald-400/30">
+                              <svg className="w-8 h-8 text-emerald-300 ml-1" fill="currentColor" viewBox="0 0 24 24">
+                                <path d="M8 5v14l11-7z"/>
+                              </svg>
+                            </div>
+                          </div>
+                        </button>
+                      ) : !videoErrors[idx] ? (
                         <>
                           <video
                             src={video.video_url}
                             controls
+                            autoPlay={playing[video.id]}
+                            poster={video.thumbnail_url ?? undefined}
                             preload="metadata"
                             className="w-full h-48 object-cover rounded-t-2xl bg-gray-800"
                             onError={() => handleVideoError(idx)}
@@ -204,7 +271,7 @@ export default function DashboardPage() {
                         {expandedCard === idx && (
                           <div className="p-4 bg-gray-800/10 border border-gray-700/20 rounded-xl backdrop-blur-sm">
                             <p className="text-gray-300 text-sm leading-relaxed whitespace-pre-wrap">
-                              {video.scene_plan}
+                              {details[video.id]?.scene_plan ?? "Loading..."}
                             </p>
                           </div>
                         )}
@@ -240,11 +307,11 @@ export default function DashboardPage() {
                           <div className="relative">
                             <pre className="bg-gray-900/60 border border-gray-700/40 rounded-xl p-4 overflow-x-auto max-h-64 text-sm backdrop-blur-sm">
                               <code className="text-emerald-200 font-mono whitespace-pre-wrap">
-                                {video.manim_code}
+                                {details[video.id]?.manim_code ?? "Loading..."}
                               </code>
                             </pre>
                             <button
-                              onClick={() => navigator.clipboard.writeText(video.manim_code)}
+                              onClick={() => navigator.clipboard.writeText(details[video.id]?.manim_code ?? "")}
                               className="absolute top-3 right-3 p-2 bg-gray-800/60 hover:bg-gray-700/60 rounded-lg transition-colors duration-300 backdrop-blur-sm border border-gray-600/30"
                               title="Copy code"
                             >
@@ -259,6 +326,18 @@ export default function DashboardPage() {
                   </div>
                 ))}
               </div>
+
+              {nextCursor && (
+                <div className="flex justify-center mt-10">
+                  <button
+                    onClick={() => fetchVideos(nextCursor)}
+                    disabled={loadingMore}
+                    className="px-6 py-3 bg-gray-800/40 border border-gray-700/40 hover:border-emerald-400/30 text-gray-200 rounded-xl transition-all duration-300 disabled:opacity-50"
+                  >
+                    {loadingMore ? "Loading..." : "Load more"}
+                  </button>
+                </div>
+              )}
             </>
           )}
         </main>
@@ -10,18 +10,95 @@ interface PastVideo {
   manim_code: string;
 }
 
+interface VideoSummary {
+  id: number;
+  title: string;
+  video_url: string;
+  created_at: string | null;
+  thumbnail_url: string | null;
+}
+
+interface GenerationJob {
+  id: string;
+  topic: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  stage: string | null;
+  error: string | null;
+  result: PastVideo | null;
+}
+
+interface JobEvent {
+  stage: string;
+  data: {
+    plan?: string;
+    plan_delta?: string;
+    reset?: boolean;
+    percent?: number;
+    attempt?: number;
+    result?: PastVideo;
+    error?: string;
+  };
+}
+
+const STAGE_LABELS: { [stage: string]: string } = {
+  queued: "Waiting in queue...",
+  planning: "Planning scenes...",
+  generating_code: "Writing Manim code...",
+  validating: "Checking generated code...",
+  rendering: "Rendering animation...",
+  correcting: "Fixing render errors...",
+  uploading: "Uploading video...",
+};
+
+// Reads the job's server-sent event stream until the job is done or failed.
+// fetch is used instead of EventSource because the stream needs the auth header.
+async function streamJobEvents(jobId: string, token: string | null, onEvent: (event: JobEvent) => void) {
+  const res = await fetch(`http://localhost:8000/auth/jobs/${jobId}/events`, {
+    headers: {
+      Authorization: `Bearer ${token}`,
+    },
+  });
+  if (!res.ok || !res.body) throw new Error("Failed to follow generation progress");
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const messages = buffer.split("\n\n");
+    buffer = messages.pop() || "";
+    for (const message of messages) {
+      let stage = "";
+      let data = "";
+      for (const line of message.split("\n")) {
+        if (line.startsWith("event: ")) stage = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (stage) onEvent({ stage, data: data ? JSON.parse(data) : {} });
+    }
+  }
+}
+
 export default function GeneratePage() {
   const [topic, setTopic] = useState("");
   const [videoUrl, setVideoUrl] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [stage, setStage] = useState<string | null>(null);
+  const [progress, setProgress] = useState<number | null>(null);
+  const [attempt, setAttempt] = useState(0);
+  const [plan, setPlan] = useState<string | null>(null);
   const [error, setError] = useState("");
-  const [pastVideos, setPastVideos] = useState<PastVideo[]>([]);
+  const [pastVideos, setPastVideos] = useState<VideoSummary[]>([]);
 
   const fetchPastVideos = async () => {
     const token = localStorage.getItem("token");
 
     try {
-      const res = await fetch("http://127.0.0.1:8000/auth/myvideos", {
+      const res = await fetch("http://127.0.0.1:8000/auth/myvideos?limit=6", {
         headers: {
           Authorization: `Bearer ${token}`,
         },
@@ -30,7 +107,7 @@ export default function GeneratePage() {
       if (!res.ok) throw new Error("Failed to load past videos");
 
       const data = await res.json();
-      setPastVideos(data.reverse()); // latest first
+      setPastVideos(data.items); // latest first
     } catch (err: any) {
       console.error("Error fetching past videos:", err.message);
     }
@@ -43,6 +120,9 @@ export default function GeneratePage() {
   const handleGenerate = async () => {
     setError("");
     setVideoUrl(null);
+    setPlan(null);
+    setProgress(null);
+    setAttempt(0);
 
     if (!topic.trim()) {
       setError("Please enter a topic.");
@@ -68,13 +148,36 @@ export default function GeneratePage() {
         throw new Error(err.detail || "Failed to generate video");
       }
 
-      const data = await res.json();
-      setVideoUrl(data.video_url);
+      const job: GenerationJob = await res.json();
+      let result = job.result;
+      let failure = job.error;
+
+      // Generation runs in the background; follow its progress events
+      if (job.status === "queued" || job.status === "running") {
+        setStage(job.stage);
+        await streamJobEvents(job.id, token, ({ stage, data }) => {
+          setStage(stage);
+          // reset: the plan was revised mid-stream and is being sent again from the start
+          if (data.plan_delta !== undefined) setPlan((prev) => (data.reset ? "" : prev || "") + data.plan_delta);
+          if (data.plan) setPlan(data.plan);
+          if (data.attempt !== undefined) setAttempt(data.attempt);
+          setProgress(data.percent ?? null);
+          if (data.result) result = data.result;
+          if (data.error) failure = data.error;
+        });
+      }
+
+      if (!result) {
+        throw new Error(failure || "Failed to generate video");
+      }
+
+      setVideoUrl(result.video_url);
       fetchPastVideos(); // refresh list
     } catch (err: any) {
       setError(err.message || "Something went wrong.");
     } finally {
       setLoading(false);
+      setStage(null);
     }
   };
 
@@ -104,6 +207,28 @@ export default function GeneratePage() {
             >
               {loading ? "Generating..." : "Generate Video"}
             </Button>
+
+            {loading && stage && (
+              <div className="space-y-2">
+                <p className="text-gray-400">
+                  {STAGE_LABELS[stage] || stage}
+                  {stage === "correcting" && ` (attempt ${attempt})`}
+                  {progress !== null && ` ${progress}%`}
+                </p>
+                {progress !== null && (
+                  <div className="w-full h-2 bg-gray-800 rounded-full overflow-hidden">
+                    <div className="h-full bg-blue-500 transition-all" style={{ width: `${progress}%` }} />
+                  </div>
+                )}
+              </div>
+            )}
+
+            {plan && !videoUrl && (
+              <div className="max-h-64 overflow-y-auto rounded-lg bg-gray-900 border border-gray-800 p-4">
+                <h2 className="text-sm font-semibold text-gray-300 mb-2">Scene plan</h2>
+                <p className="text-sm text-gray-400 whitespace-pre-wrap">{plan}</p>
+              </div>
+            )}
           </section>
 
           {/* Right Panel */}
@@ -131,19 +256,23 @@ export default function GeneratePage() {
             <p className="text-gray-400">You haven't generated any videos yet.</p>
           ) : (
             <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-8">
-              {pastVideos.map((video, idx) => (
+              {pastVideos.map((video) => (
                 <div
-                  key={idx}
+                  key={video.id}
                   className="bg-gray-900 border border-gray-800 rounded-xl shadow-md hover:shadow-lg transition transform hover:-translate-y-1"
                 >
                   <video
                     src={video.video_url}
                     controls
+                    poster={video.thumbnail_url ?? undefined}
+                    preload={video.thumbnail_url ? "none" : "metadata"}
                     className="w-full h-48 object-cover rounded-t-xl"
                   />
                   <div className="p-4 space-y-2">
                     <h3 className="text-lg font-semibold truncate">{video.title}</h3>
-                    <p className="text-sm text-gray-400 line-clamp-3">{video.scene_plan}</p>
+                    {video.created_at && (
+                      <p className="text-sm text-gray-400">{new Date(video.created_at).toLocaleDateString()}</p>
+                    )}
                   </div>
                 </div>
               ))}